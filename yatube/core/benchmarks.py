@@ -0,0 +1,345 @@
+"""Нагрузочные замеры view приложения posts через тестовый клиент.
+
+Каждый сценарий - функция, которая по подготовленному контексту
+возвращает (метод, url, данные). Прогон снимает задержку каждого
+запроса, число SQL-запросов и время по шаблонам, а для всего отчёта -
+пиковый RSS процесса; результат сохраняется в JSON, и два файла можно
+сравнить между собой. Пишущие сценарии выполняются в откатываемой
+транзакции, поэтому повторные прогоны идут на тех же данных.
+"""
+import json
+import platform
+import random
+import resource
+import statistics
+import sys
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+import django
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.template import Context, engines
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import feeds, stats
+from posts.models import FeedEntry, Follow, Group, Post, User
+from yatube.settings import PAGE_LIMIT
+
+from . import instrumentation
+
+SCENARIOS = {}
+# сколько самых медленных шаблонов сценария попадает в отчёт
+TEMPLATE_PROFILE_LIMIT = 10
+
+
+def scenario(name, login=False, writes=False):
+    def decorator(func):
+        SCENARIOS[name] = (func, login, writes)
+        return func
+    return decorator
+
+
+@scenario('index')
+def index(context, step):
+    return 'get', reverse('posts:index'), None
+
+
+@scenario('group_posts')
+def group_posts(context, step):
+    slug = context['groups'][step % len(context['groups'])]
+    return 'get', reverse('posts:group_list', args=(slug,)), None
+
+
+@scenario('profile')
+def profile(context, step):
+    username = context['authors'][step % len(context['authors'])]
+    return 'get', reverse('posts:profile', args=(username,)), None
+
+
+@scenario('post_detail')
+def post_detail(context, step):
+    post_id = context['posts'][step % len(context['posts'])]
+    return 'get', reverse('posts:post_detail', args=(post_id,)), None
+
+
+@scenario('follow_index', login=True)
+def follow_index(context, step):
+    return 'get', reverse('posts:follow_index'), None
+
+
+@scenario('post_create', login=True, writes=True)
+def post_create(context, step):
+    return 'post', reverse('posts:post_create'), {
+        'text': f'Пост из бенчмарка {step}'}
+
+
+def percentile(values, share):
+    """Перцентиль по методу ближайшего ранга."""
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(share * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def peak_rss_kb():
+    # в Linux ru_maxrss в килобайтах, в macOS - в байтах
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def build_context(sample=50):
+    """Ключи для URL: самые популярные группы, авторы, свежие посты."""
+    reader = (Follow.objects.values_list('user__username', flat=True)
+              .order_by('user').first())
+    if reader is None:
+        reader = User.objects.values_list('username', flat=True).first()
+    return {
+        'groups': list(Group.objects.values_list(
+            'slug', flat=True)[:sample]),
+        'authors': list(User.objects.filter(posts__isnull=False)
+                        .values_list('username', flat=True)
+                        .distinct()[:sample]),
+        'posts': list(Post.objects.values_list('id', flat=True)[:sample]),
+        'reader': reader,
+    }
+
+
+def run_scenario(name, context, requests=100, warmup=10, cold=False):
+    func, login, writes = SCENARIOS[name]
+    if not writes:
+        return measure(func, login, context, requests, warmup, cold)
+    with transaction.atomic():
+        result = measure(func, login, context, requests, warmup, cold)
+        transaction.set_rollback(True)
+    # поколения и списки в кеше ссылаются на откаченные посты
+    cache.clear()
+    return result
+
+
+def measure(func, login, context, requests, warmup, cold):
+    client = Client()
+    if login:
+        client.force_login(User.objects.get(username=context['reader']))
+    latencies, queries, statuses = [], [], {}
+    instrumentation.install()
+    timer = instrumentation.TemplateTimer()
+    for step in range(warmup + requests):
+        method, url, data = func(context, step)
+        if cold:
+            cache.clear()
+        if step == warmup:
+            timer = instrumentation.TemplateTimer()
+        with CaptureQueriesContext(connection) as captured, timer.record():
+            start = time.perf_counter()
+            response = getattr(client, method)(url, data)
+            elapsed = time.perf_counter() - start
+        if step < warmup:
+            continue
+        latencies.append(elapsed * 1000)
+        queries.append(len(captured))
+        statuses[response.status_code] = (
+            statuses.get(response.status_code, 0) + 1)
+    return {
+        'requests': requests,
+        'p50_ms': round(percentile(latencies, 0.50), 3),
+        'p95_ms': round(percentile(latencies, 0.95), 3),
+        'p99_ms': round(percentile(latencies, 0.99), 3),
+        'mean_ms': round(statistics.mean(latencies), 3),
+        'rps': round(1000 * len(latencies) / sum(latencies), 1),
+        'queries_per_request': round(statistics.mean(queries), 2),
+        'max_queries': max(queries),
+        'statuses': {str(code): count for code, count in statuses.items()},
+        'templates': timer.profile(TEMPLATE_PROFILE_LIMIT),
+    }
+
+
+def run(names=None, requests=100, warmup=10, cold=False):
+    """Прогоняет сценарии и возвращает отчёт, пригодный для JSON."""
+    context = build_context()
+    names = names or list(SCENARIOS)
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        raise KeyError(f'Неизвестные сценарии: {", ".join(sorted(unknown))}')
+    if any(SCENARIOS[name][1] for name in names) and not context['reader']:
+        raise LookupError('В базе нет пользователей: запустите seed')
+    meta = {
+        'started': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'cold_cache': cold,
+        'warmup': warmup,
+        'data': {
+            'users': User.objects.count(),
+            'posts': Post.objects.count(),
+            'follows': Follow.objects.count(),
+            'groups': Group.objects.count(),
+        },
+    }
+    scenarios = {
+        name: run_scenario(name, context, requests, warmup, cold)
+        for name in names
+    }
+    # ru_maxrss - максимум за всю жизнь процесса, а не по сценарию
+    meta['peak_rss_kb'] = peak_rss_kb()
+    return {'meta': meta, 'scenarios': scenarios}
+
+
+def save(report, path):
+    with open(path, 'w', encoding='utf-8') as output:
+        json.dump(report, output, ensure_ascii=False, indent=2)
+
+
+def load(path):
+    with open(path, encoding='utf-8') as source:
+        return json.load(source)
+
+
+def compare(baseline, current, metrics=('p50_ms', 'p95_ms', 'p99_ms',
+                                        'queries_per_request')):
+    """{сценарий: {метрика: (было, стало, изменение в %)}}."""
+    result = {}
+    for name, values in current['scenarios'].items():
+        old = baseline['scenarios'].get(name)
+        if old is None:
+            continue
+        result[name] = {}
+        for metric in metrics:
+            before, after = old[metric], values[metric]
+            change = (after - before) / before * 100 if before else 0.0
+            result[name][metric] = (before, after, round(change, 1))
+    return result
+
+
+# ссылки шапки и карточки поста, как в includes/header.html и
+# posts/includes/card_of_post.html
+URL_PAGE = '''
+{% url 'posts:index' %}{% url 'posts:search' %}{% url 'about:author' %}
+{% url 'about:tech' %}{% url 'posts:post_create' %}
+{% url 'users:password_change' %}{% url 'users:logout' %}
+{% url 'posts:profile' user.username %}{% url 'users:login' %}
+{% url 'users:signup' %}
+{% for post in posts %}
+  {% url 'posts:profile' post.author.username %}
+  {% url 'posts:group_list' post.group.slug %}
+  {% url 'posts:post_detail' post.id %}
+{% endfor %}
+'''
+
+
+def url_benchmark(cards=10, repeat=200):
+    """Время страницы из cards карточек со {% url %} и fast_urls, в мкс."""
+    engine = engines['django'].engine
+    user = SimpleNamespace(username='reader')
+    posts = [
+        SimpleNamespace(
+            id=number + 1,
+            author=SimpleNamespace(username=f'author{number}'),
+            group=SimpleNamespace(slug=f'group-{number}'),
+        )
+        for number in range(cards)
+    ]
+    templates = {
+        'stock': engine.from_string(URL_PAGE),
+        'fast': engine.from_string('{% load fast_urls %}' + URL_PAGE),
+    }
+    rendered = {}
+    result = {}
+    for name, template in templates.items():
+        context = Context({'user': user, 'posts': posts})
+        rendered[name] = template.render(context)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            template.render(context)
+        result[f'{name}_us'] = round(
+            (time.perf_counter() - start) / repeat * 1e6, 1)
+    if rendered['stock'] != rendered['fast']:
+        raise AssertionError('fast_urls дал другие адреса')
+    result['speedup'] = round(result['stock_us'] / result['fast_us'], 2)
+    result['reverses_per_page'] = 10 + 3 * cards
+    return result
+
+
+def skewed_followers(readers, authors, skew, rng):
+    """Пары (читатель, автор) с распределением Ципфа по авторам.
+
+    У автора с рангом r подписчиков readers / r ** skew, поэтому первый
+    автор - знаменитость, а хвост почти никем не читается.
+    """
+    pairs = []
+    for rank, author in enumerate(authors, start=1):
+        size = max(1, min(len(readers), round(len(readers) / rank ** skew)))
+        pairs.extend((reader, author) for reader in rng.sample(readers, size))
+    return pairs
+
+
+def feed_benchmark(readers=2000, authors=50, posts=5, skew=1.2,
+                   threshold=500, reads=50, seed=0):
+    """Публикация и чтение ленты подписок в push и в гибридном режиме.
+
+    Для каждого режима в откатываемой транзакции создаются читатели,
+    авторы и подписки со скошенным распределением, затем каждый автор
+    публикует posts постов, а reads читателей открывают первую страницу
+    ленты. В отчёте - записанные строки FeedEntry, задержки публикации и
+    чтения и число запросов на чтение.
+    """
+    result = {}
+    for mode, mode_threshold in (('push', None), ('hybrid', threshold)):
+        rng = random.Random(seed)
+        cache.clear()
+        with transaction.atomic():
+            User.objects.bulk_create(
+                User(username=f'feed-bench-{kind}-{number}')
+                for kind, count in (('reader', readers), ('author', authors))
+                for number in range(count))
+            reader_ids = list(User.objects.filter(
+                username__startswith='feed-bench-reader-').values_list(
+                'id', flat=True))
+            author_ids = list(User.objects.filter(
+                username__startswith='feed-bench-author-').order_by(
+                'id').values_list('id', flat=True))
+            Follow.objects.bulk_create(
+                Follow(user_id=reader, author_id=author)
+                for reader, author in skewed_followers(
+                    reader_ids, author_ids, skew, rng))
+            stats.reconcile()
+            pulled, _ = feeds.rebalance(mode_threshold)
+            publish = []
+            for number in range(posts):
+                for author_id in author_ids:
+                    start = time.perf_counter()
+                    Post.objects.create(
+                        author_id=author_id, text=f'пост {number}')
+                    publish.append(
+                        (time.perf_counter() - start) * 1000)
+            written = FeedEntry.objects.filter(
+                author_id__in=author_ids).count()
+            latencies, queries = [], []
+            for reader_id in rng.sample(reader_ids, min(reads, readers)):
+                user = User(pk=reader_id)
+                with CaptureQueriesContext(connection) as captured:
+                    start = time.perf_counter()
+                    page = feeds.FeedPaginator(user, PAGE_LIMIT).get_page()
+                    list(page)
+                    latencies.append(
+                        (time.perf_counter() - start) * 1000)
+                queries.append(len(captured))
+            result[mode] = {
+                'follows': Follow.objects.filter(
+                    author_id__in=author_ids).count(),
+                'pull_authors': pulled,
+                'feed_rows_written': written,
+                'publish_p50_ms': round(percentile(publish, 0.50), 3),
+                'publish_max_ms': round(max(publish), 3),
+                'read_p50_ms': round(percentile(latencies, 0.50), 3),
+                'read_p95_ms': round(percentile(latencies, 0.95), 3),
+                'read_queries': round(statistics.mean(queries), 2),
+            }
+            transaction.set_rollback(True)
+    # id откаченных пользователей могут достаться новым: граф и списки
+    # постов в кеше о них больше не верны
+    cache.clear()
+    return result
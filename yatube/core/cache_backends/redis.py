@@ -0,0 +1,205 @@
+"""Кеш на сервере с протоколом Redis (RESP) для боевого окружения.
+
+Клиент минимальный и не тянет зависимостей: одно сокетное соединение на
+поток, команды GET/SET/MGET/DEL/EVAL/SCAN. Целые числа хранятся как есть,
+чтобы INCRBY работал на стороне сервера, остальное - через pickle.
+"""
+import pickle
+import socket
+import threading
+import time
+from urllib.parse import urlparse
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+INCR_IF_EXISTS = (
+    "if redis.call('EXISTS', KEYS[1]) == 1 then "
+    "return redis.call('INCRBY', KEYS[1], ARGV[1]) end "
+    "return nil"
+)
+
+
+class RedisError(Exception):
+    pass
+
+
+def encode_command(*args):
+    parts = [b'*%d\r\n' % len(args)]
+    for arg in args:
+        if not isinstance(arg, bytes):
+            arg = str(arg).encode()
+        parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+    return b''.join(parts)
+
+
+def read_reply(stream):
+    line = stream.readline()
+    if not line:
+        raise ConnectionError('соединение с сервером кеша закрыто')
+    kind, payload = line[:1], line[1:-2]
+    if kind == b'+':
+        return payload
+    if kind == b'-':
+        raise RedisError(payload.decode())
+    if kind == b':':
+        return int(payload)
+    if kind == b'$':
+        length = int(payload)
+        if length == -1:
+            return None
+        data = stream.read(length + 2)
+        return data[:-2]
+    if kind == b'*':
+        length = int(payload)
+        if length == -1:
+            return None
+        return [read_reply(stream) for _ in range(length)]
+    raise RedisError(f'неизвестный ответ {line!r}')
+
+
+def dump_value(value):
+    if isinstance(value, int) and not isinstance(value, bool):
+        return str(value).encode()
+    return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+
+def load_value(data):
+    if data is None:
+        return None
+    if data[:1] == b'\x80':
+        return pickle.loads(data)
+    return int(data)
+
+
+class RedisCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        url = urlparse(location or 'redis://127.0.0.1:6379/0')
+        self.host = url.hostname or '127.0.0.1'
+        self.port = url.port or 6379
+        self.db = int(url.path.lstrip('/') or 0)
+        self.password = url.password
+        options = params.get('OPTIONS', {})
+        self.socket_timeout = options.get('SOCKET_TIMEOUT', 1.0)
+        self._local = threading.local()
+
+    def _connect(self):
+        sock = socket.create_connection(
+            (self.host, self.port), timeout=self.socket_timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        stream = sock.makefile('rb')
+        self._local.connection = (sock, stream)
+        if self.password:
+            self._send('AUTH', self.password)
+        if self.db:
+            self._send('SELECT', self.db)
+        return sock, stream
+
+    def _send(self, *args):
+        sock, stream = self._local.connection
+        sock.sendall(encode_command(*args))
+        return read_reply(stream)
+
+    def execute(self, *args):
+        if getattr(self._local, 'connection', None) is None:
+            self._connect()
+        try:
+            return self._send(*args)
+        except (ConnectionError, socket.timeout, OSError):
+            # одна попытка переподключения: сервер мог закрыть простаивающее
+            self.disconnect()
+            self._connect()
+            return self._send(*args)
+
+    def _ttl_args(self, timeout):
+        expires = self.get_backend_timeout(timeout)
+        if expires is None:
+            return ()
+        milliseconds = int(round((expires - time.time()) * 1000))
+        return ('PX', max(milliseconds, 1))
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        value = load_value(self.execute('GET', key))
+        return default if value is None else value
+
+    def get_many(self, keys, version=None):
+        mapping = {self.make_key(key, version=version): key for key in keys}
+        if not mapping:
+            return {}
+        values = self.execute('MGET', *mapping)
+        return {
+            mapping[key]: load_value(value)
+            for key, value in zip(mapping, values) if value is not None
+        }
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        if timeout == 0:
+            self.execute('DEL', key)
+            return
+        self.execute('SET', key, dump_value(value), *self._ttl_args(timeout))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        if timeout == 0:
+            return False
+        reply = self.execute(
+            'SET', key, dump_value(value), *self._ttl_args(timeout), 'NX')
+        return reply is not None
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        ttl = self._ttl_args(timeout)
+        if not ttl:
+            return self.execute('PERSIST', key) == 1 or self.has_key(key)
+        return self.execute('PEXPIRE', key, ttl[1]) == 1
+
+    def delete(self, key, version=None):
+        self.execute('DEL', self.make_key(key, version=version))
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_key(key, version=version) for key in keys]
+        if keys:
+            self.execute('DEL', *keys)
+
+    def has_key(self, key, version=None):
+        return self.execute(
+            'EXISTS', self.make_key(key, version=version)) == 1
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        try:
+            value = self.execute('EVAL', INCR_IF_EXISTS, 1, key, delta)
+        except RedisError as error:
+            raise ValueError(str(error))
+        if value is None:
+            raise ValueError(f"Key '{key}' not found")
+        return value
+
+    def clear(self):
+        # чистим только свои ключи: база может быть общей
+        pattern = self.make_key('*')
+        cursor = b'0'
+        while True:
+            cursor, keys = self.execute(
+                'SCAN', cursor, 'MATCH', pattern, 'COUNT', 1000)
+            if keys:
+                self.execute('DEL', *keys)
+            if cursor == b'0':
+                break
+
+    def close(self, **kwargs):
+        # Django зовёт close() после каждого запроса; соединение оставляем
+        pass
+
+    def disconnect(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            sock, stream = connection
+            stream.close()
+            sock.close()
+            self._local.connection = None
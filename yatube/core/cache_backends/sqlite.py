@@ -0,0 +1,167 @@
+"""Кеш в файле SQLite, общий для всех воркеров на одной машине.
+
+В отличие от FileBasedCache инкремент атомарен между процессами
+(BEGIN IMMEDIATE), что нужно счётчикам поколений из posts.caching.
+"""
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)'
+)
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.path = location
+        self._local = threading.local()
+
+    @property
+    def _db(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self.path, timeout=30, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def _expires(self, timeout):
+        return self.get_backend_timeout(timeout)
+
+    def _alive(self, expires):
+        return expires is None or expires > time.time()
+
+    def _load(self, key):
+        row = self._db.execute(
+            'SELECT value, expires FROM cache WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None or not self._alive(row[1]):
+            return None
+        return row
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        row = self._load(key)
+        if row is None:
+            return default
+        return pickle.loads(row[0])
+
+    def get_many(self, keys, version=None):
+        mapping = {self.make_key(key, version=version): key for key in keys}
+        if not mapping:
+            return {}
+        placeholders = ','.join('?' * len(mapping))
+        rows = self._db.execute(
+            f'SELECT key, value, expires FROM cache '
+            f'WHERE key IN ({placeholders})',
+            list(mapping),
+        ).fetchall()
+        return {
+            mapping[key]: pickle.loads(value)
+            for key, value, expires in rows if self._alive(expires)
+        }
+
+    def _write(self, key, value, timeout, mode):
+        expires = self._expires(timeout)
+        blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            if mode == 'add' and self._load(key) is not None:
+                db.execute('COMMIT')
+                return False
+            self._cull(db)
+            db.execute(
+                'INSERT OR REPLACE INTO cache (key, value, expires) '
+                'VALUES (?, ?, ?)',
+                (key, blob, expires),
+            )
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        return True
+
+    def _cull(self, db):
+        count = db.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count < self._max_entries:
+            return
+        db.execute('DELETE FROM cache WHERE expires <= ?', (time.time(),))
+        if self._cull_frequency == 0:
+            db.execute('DELETE FROM cache')
+            return
+        db.execute(
+            'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+            'ORDER BY expires IS NULL, expires LIMIT ?)',
+            (count // self._cull_frequency,),
+        )
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._write(key, value, timeout, 'set')
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self._write(key, value, timeout, 'add')
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        cursor = self._db.execute(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self._expires(timeout), key, time.time()),
+        )
+        return cursor.rowcount == 1
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self._db.execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_key(key, version=version) for key in keys]
+        if keys:
+            placeholders = ','.join('?' * len(keys))
+            self._db.execute(
+                f'DELETE FROM cache WHERE key IN ({placeholders})', keys)
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        return self._load(key) is not None
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            row = self._load(key)
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            db.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                (pickle.dumps(value, pickle.HIGHEST_PROTOCOL), key),
+            )
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        return value
+
+    def clear(self):
+        self._db.execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # соединение живёт в потоке и переиспользуется между запросами
+        pass
@@ -0,0 +1,120 @@
+"""Двухуровневый кеш: L1 в памяти процесса, L2 общий для воркеров.
+
+Чтения сначала идут в L1 (LRU из LocMemCache), промахи - в L2 с
+сохранением ответа в L1 на короткое L1_TIMEOUT. Записи и удаления
+проходят через оба уровня, но delete и incr одного воркера не достают
+до L1 других. Поэтому ключи, которые меняются на месте, - с префиксами
+из L1_BYPASS - читаются только из L2: счётчики поколений, время
+изменений, массивы графа подписок, списки лент, счётчики частоты и квоты.
+В L1 остаются записи, которые не сбрасываются, а перестают
+запрашиваться: фрагменты с поколением в ключе и страницы, сверяемые с
+поколениями при чтении.
+"""
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.locmem import LocMemCache
+
+_missing = object()
+
+# префиксы ключей posts и core, которые сбрасываются delete или incr
+BYPASS = (
+    'gen:', 'mtime:', 'graph:', 'feed-recent:', 'feed-pull-authors',
+    'ratelimit:', 'upload-quota:', 'page-stats:',
+)
+
+
+class TwoLevelCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.l2_alias = options.get('L2', 'shared')
+        self.l1_timeout = options.get('L1_TIMEOUT', 5)
+        self.bypass = tuple(options.get('L1_BYPASS', BYPASS))
+        self.l1 = LocMemCache(f'two-level-{location}', {
+            'TIMEOUT': self.l1_timeout,
+            'OPTIONS': {'MAX_ENTRIES': options.get('L1_MAX_ENTRIES', 1000)},
+        })
+
+    @property
+    def l2(self):
+        return caches[self.l2_alias]
+
+    def _local(self, key):
+        return not key.startswith(self.bypass)
+
+    def _l1_timeout(self, timeout):
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return self.l1_timeout
+        return min(timeout, self.l1_timeout)
+
+    def get(self, key, default=None, version=None):
+        if not self._local(key):
+            return self.l2.get(key, default, version=version)
+        value = self.l1.get(key, _missing, version=version)
+        if value is not _missing:
+            return value
+        value = self.l2.get(key, _missing, version=version)
+        if value is _missing:
+            return default
+        self.l1.set(key, value, self.l1_timeout, version=version)
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        misses = []
+        for key in keys:
+            value = (self.l1.get(key, _missing, version=version)
+                     if self._local(key) else _missing)
+            if value is _missing:
+                misses.append(key)
+            else:
+                found[key] = value
+        if misses:
+            shared = self.l2.get_many(misses, version=version)
+            for key, value in shared.items():
+                if self._local(key):
+                    self.l1.set(key, value, self.l1_timeout, version=version)
+            found.update(shared)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.l2.set(key, value, timeout, version=version)
+        if self._local(key):
+            self.l1.set(
+                key, value, self._l1_timeout(timeout), version=version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.l2.add(key, value, timeout, version=version)
+        if added and self._local(key):
+            self.l1.set(
+                key, value, self._l1_timeout(timeout), version=version)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.l2.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        self.l1.delete(key, version=version)
+        self.l2.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        self.l1.delete_many(keys, version=version)
+        self.l2.delete_many(keys, version=version)
+
+    def has_key(self, key, version=None):
+        if self._local(key) and self.l1.has_key(key, version=version):
+            return True
+        return self.l2.has_key(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        self.l1.delete(key, version=version)
+        return self.l2.incr(key, delta, version=version)
+
+    def clear(self):
+        self.l1.clear()
+        self.l2.clear()
+
+    def close(self, **kwargs):
+        self.l2.close(**kwargs)
@@ -0,0 +1,163 @@
+"""Сбор SQL-запросов и времени рендеринга шаблонов за один запрос."""
+import hashlib
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+from django.template import base as template_base
+from django.template.backends import django as django_backend
+
+IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+_state = threading.local()
+
+
+def fingerprint(sql):
+    """Короткий отпечаток запроса без учёта длины списков IN (...)."""
+    normalized = IN_LIST.sub('IN (...)', sql)
+    return hashlib.md5(normalized.encode()).hexdigest()[:12], normalized
+
+
+class QueryRecorder:
+    """execute_wrapper: считает запросы, их время и повторы."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+        self.samples = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            key, normalized = fingerprint(sql)
+            self.fingerprints[key] += 1
+            self.samples.setdefault(key, normalized)
+
+    @property
+    def duplicates(self):
+        """{отпечаток: число выполнений} для повторившихся запросов."""
+        return {
+            key: count for key, count in self.fingerprints.items()
+            if count > 1
+        }
+
+    @contextmanager
+    def record(self):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            yield self
+
+
+class TemplateTimer:
+    """Время рендеринга шаблонов: всего и по каждому шаблону.
+
+    duration - время шаблонов верхнего уровня. templates - {имя:
+    [вызовов, время с вложенными, собственное время]} для каждого
+    шаблона, включая {% include %} и карточки {% post_card %};
+    собственное время не включает вложенные шаблоны.
+    """
+
+    def __init__(self):
+        self.duration = 0.0
+        self.depth = 0
+        self.templates = {}
+        self._children = []
+
+    def profile(self, limit=None):
+        """Шаблоны по убыванию собственного времени, в миллисекундах."""
+        rows = sorted(
+            self.templates.items(), key=lambda item: item[1][2],
+            reverse=True)
+        return {
+            name: {
+                'count': count,
+                'ms': round(total * 1000, 2),
+                'self_ms': round(own * 1000, 2),
+            }
+            for name, (count, total, own) in rows[:limit]
+        }
+
+    @contextmanager
+    def record(self):
+        # таймеры вкладываются: бенчмарк и middleware видят один рендер
+        timers = _active_timers()
+        timers.append(self)
+        try:
+            yield self
+        finally:
+            timers.remove(self)
+
+    def enter(self):
+        self._children.append(0.0)
+
+    def leave(self, name, elapsed):
+        children = self._children.pop()
+        if self._children:
+            self._children[-1] += elapsed
+        stats = self.templates.setdefault(name, [0, 0.0, 0.0])
+        stats[0] += 1
+        stats[1] += elapsed
+        stats[2] += elapsed - children
+
+
+def _active_timers():
+    if not hasattr(_state, 'timers'):
+        _state.timers = []
+    return _state.timers
+
+
+def _timed_render(render):
+    def wrapper(self, context=None, request=None):
+        timers = list(_active_timers())
+        if not timers:
+            return render(self, context, request)
+        for timer in timers:
+            timer.depth += 1
+        start = time.perf_counter()
+        try:
+            return render(self, context, request)
+        finally:
+            elapsed = time.perf_counter() - start
+            for timer in timers:
+                timer.depth -= 1
+                if timer.depth == 0:
+                    timer.duration += elapsed
+    wrapper.instrumented = True
+    return wrapper
+
+
+def _profiled_render(render):
+    def wrapper(self, context):
+        timers = list(_active_timers())
+        if not timers:
+            return render(self, context)
+        for timer in timers:
+            timer.enter()
+        start = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            name = self.origin.template_name or self.origin.name
+            for timer in timers:
+                timer.leave(name, elapsed)
+    wrapper.instrumented = True
+    return wrapper
+
+
+def install():
+    """Оборачивает рендеринг шаблонов Django; повторный вызов безопасен."""
+    template_class = django_backend.Template
+    if not getattr(template_class.render, 'instrumented', False):
+        template_class.render = _timed_render(template_class.render)
+    template_class = template_base.Template
+    if not getattr(template_class.render, 'instrumented', False):
+        template_class.render = _profiled_render(template_class.render)
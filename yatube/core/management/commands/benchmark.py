@@ -0,0 +1,64 @@
+import os
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Замеряет задержку, число запросов и память для view posts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'scenarios', nargs='*',
+            help=f'сценарии: {", ".join(benchmarks.SCENARIOS)}',
+        )
+        parser.add_argument('--requests', type=int, default=100)
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='очищать кеш перед каждым запросом',
+        )
+        parser.add_argument(
+            '--output', default=None,
+            help='файл JSON; по умолчанию benchmarks/<время>.json',
+        )
+        parser.add_argument(
+            '--compare', default=None,
+            help='JSON прошлого прогона для сравнения',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            report = benchmarks.run(
+                options['scenarios'], requests=options['requests'],
+                warmup=options['warmup'], cold=options['cold'],
+            )
+        except (KeyError, LookupError) as error:
+            raise CommandError(error.args[0])
+        path = options['output']
+        if path is None:
+            os.makedirs('benchmarks', exist_ok=True)
+            stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+            path = os.path.join('benchmarks', f'{stamp}.json')
+        benchmarks.save(report, path)
+        for name, result in report['scenarios'].items():
+            self.stdout.write(
+                f'{name:<14} p50 {result["p50_ms"]:>8} мс  '
+                f'p95 {result["p95_ms"]:>8} мс  '
+                f'p99 {result["p99_ms"]:>8} мс  '
+                f'SQL {result["queries_per_request"]:>6}'
+            )
+        self.stdout.write(
+            f'Пиковый RSS процесса: {report["meta"]["peak_rss_kb"]} КБ')
+        if options['compare']:
+            diff = benchmarks.compare(
+                benchmarks.load(options['compare']), report)
+            for name, metrics in diff.items():
+                changes = ', '.join(
+                    f'{metric} {before} -> {after} ({change:+}%)'
+                    for metric, (before, after, change) in metrics.items()
+                )
+                self.stdout.write(f'{name}: {changes}')
+        self.stdout.write(self.style.SUCCESS(f'Результаты: {path}'))
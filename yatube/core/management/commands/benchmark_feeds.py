@@ -0,0 +1,31 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from core import benchmarks
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает push и гибридную ленту подписок на скошенном '
+            'распределении подписчиков (данные откатываются)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=2000)
+        parser.add_argument('--authors', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=5)
+        parser.add_argument(
+            '--skew', type=float, default=1.2,
+            help='показатель Ципфа: чем больше, тем сильнее перекос',
+        )
+        parser.add_argument('--threshold', type=int, default=500)
+        parser.add_argument('--reads', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        result = benchmarks.feed_benchmark(
+            readers=options['readers'], authors=options['authors'],
+            posts=options['posts'], skew=options['skew'],
+            threshold=options['threshold'], reads=options['reads'],
+            seed=options['seed'],
+        )
+        self.stdout.write(json.dumps(result, ensure_ascii=False, indent=2))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from core import benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает {% url %} и fast_urls на странице с карточками'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cards', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def handle(self, *args, **options):
+        result = benchmarks.url_benchmark(
+            options['cards'], options['repeat'])
+        self.stdout.write(
+            '{reverses_per_page} ссылок на странице: {{% url %}} '
+            '{stock_us} мкс, fast_urls {fast_us} мкс, '
+            'быстрее в {speedup} раза'.format(**result))
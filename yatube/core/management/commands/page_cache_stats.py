@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from core import page_cache
+
+
+class Command(BaseCommand):
+    help = 'Попадания и промахи кеша страниц для анонимов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset', action='store_true',
+            help='обнулить счётчики после вывода',
+        )
+
+    def handle(self, *args, **options):
+        stats = page_cache.stats()
+        self.stdout.write(
+            'Попаданий: {hit}, промахов: {miss}, сохранено: {store}, '
+            'доля попаданий: {ratio:.1%}'.format(**stats))
+        if options['reset']:
+            page_cache.reset_stats()
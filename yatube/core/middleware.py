@@ -0,0 +1,76 @@
+import json
+import logging
+
+from django.conf import settings
+
+from . import instrumentation
+
+logger = logging.getLogger('yatube.queries')
+# сколько самых медленных шаблонов попадает в X-Template-Profile
+PROFILE_HEADER_LIMIT = 5
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryInstrumentationMiddleware:
+    """Число и время SQL-запросов, повторы и рендеринг шаблонов по view.
+
+    Данные пишутся строкой JSON в лог yatube.queries и, если включено
+    QUERY_INSTRUMENTATION_HEADERS, в заголовки ответа. Превышение
+    QUERY_BUDGETS для view либо пишется предупреждением, либо (при
+    QUERY_BUDGET_RAISE) поднимает QueryBudgetExceeded, что превращает
+    любой тест через Client в проверку на регрессию N+1.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        instrumentation.install()
+
+    def __call__(self, request):
+        recorder = instrumentation.QueryRecorder()
+        timer = instrumentation.TemplateTimer()
+        with recorder.record(), timer.record():
+            response = self.get_response(request)
+        match = request.resolver_match
+        view_name = match.view_name if match else None
+        duplicates = recorder.duplicates
+        report = {
+            'view': view_name,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': recorder.count,
+            'sql_ms': round(recorder.duration * 1000, 2),
+            'template_ms': round(timer.duration * 1000, 2),
+            'templates': timer.profile(),
+            'duplicates': {
+                key: {'count': count, 'sql': recorder.samples[key][:200]}
+                for key, count in duplicates.items()
+            },
+        }
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps(report, ensure_ascii=False))
+        if getattr(settings, 'QUERY_INSTRUMENTATION_HEADERS', False):
+            response['X-Query-Count'] = str(recorder.count)
+            response['X-Query-Time'] = str(report['sql_ms'])
+            response['X-Query-Duplicates'] = str(
+                sum(duplicates.values()) - len(duplicates))
+            response['X-Template-Time'] = str(report['template_ms'])
+            response['X-Template-Profile'] = ', '.join(
+                f'{name};{row["count"]};{row["self_ms"]}'
+                for name, row in timer.profile(PROFILE_HEADER_LIMIT).items())
+        self.check_budget(view_name, recorder.count)
+        return response
+
+    def check_budget(self, view_name, count):
+        budgets = getattr(settings, 'QUERY_BUDGETS', {})
+        budget = budgets.get(
+            view_name, getattr(settings, 'QUERY_BUDGET_DEFAULT', None))
+        if budget is None or count <= budget:
+            return
+        message = (
+            f'{view_name}: {count} SQL-запросов при бюджете {budget}')
+        if getattr(settings, 'QUERY_BUDGET_RAISE', False):
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
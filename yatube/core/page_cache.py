@@ -0,0 +1,130 @@
+"""Кеш целых страниц для анонимных читателей.
+
+Ответ сохраняется, только если у запроса нет cookie сессии, view есть в
+PAGE_CACHE_TIMEOUTS, а ответ не ставит cookie (значит, в нём нет
+CSRF-токена и данных сессии). Вместе с ответом хранятся его
+суррогатные ключи - артефакты из заголовка Surrogate-Key - и их
+поколения. Когда posts.invalidation сдвигает поколение артефакта, все
+страницы с этим ключом перестают совпадать и при следующем запросе
+строятся заново; остальные страницы не затрагиваются.
+
+Попадания и промахи считаются счётчиками в кеше (см. stats) и
+отмечаются заголовком X-Page-Cache.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from posts import caching
+
+KEY_PREFIX = 'page'
+METRICS = ('hit', 'miss', 'store')
+# заголовки, которые зависят от запроса и не хранятся
+PER_REQUEST_HEADERS = ('X-Query-Count', 'X-Query-Time',
+                       'X-Query-Duplicates', 'X-Template-Time',
+                       'X-Template-Profile')
+
+
+def page_key(request):
+    path = request.get_full_path().encode()
+    return f'{KEY_PREFIX}:{hashlib.md5(path).hexdigest()}'
+
+
+def metric_key(name):
+    return f'{KEY_PREFIX}-stats:{name}'
+
+
+def count(name):
+    key = metric_key(name)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, timeout=None)
+
+
+def stats():
+    """{'hit': n, 'miss': n, 'store': n, 'ratio': доля попаданий}."""
+    values = cache.get_many([metric_key(name) for name in METRICS])
+    result = {name: values.get(metric_key(name), 0) for name in METRICS}
+    requests = result['hit'] + result['miss']
+    result['ratio'] = round(result['hit'] / requests, 4) if requests else 0
+    return result
+
+
+def reset_stats():
+    cache.delete_many([metric_key(name) for name in METRICS])
+
+
+def cacheable_request(request):
+    return (request.method in ('GET', 'HEAD')
+            and settings.SESSION_COOKIE_NAME not in request.COOKIES
+            and bool(getattr(settings, 'PAGE_CACHE_TIMEOUTS', None)))
+
+
+def timeout_for(request, response):
+    """Время хранения ответа или None, если его нельзя кешировать."""
+    match = request.resolver_match
+    if match is None or response.status_code != 200:
+        return None
+    if response.streaming or response.cookies:
+        return None
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return None
+    return settings.PAGE_CACHE_TIMEOUTS.get(match.view_name)
+
+
+def lookup(request):
+    entry = cache.get(page_key(request))
+    if entry is None:
+        return None
+    keys, generations, response = entry
+    if keys and caching.versions(*keys)[0] != generations:
+        return None
+    return response
+
+
+def store(request, response, timeout):
+    keys = caching.parse_surrogate_keys(
+        response.get(caching.SURROGATE_HEADER))
+    generations = caching.versions(*keys)[0] if keys else []
+    if hasattr(response, 'render') and not response.is_rendered:
+        response.render()
+    cached = HttpResponse(response.content, status=response.status_code)
+    for header, value in response.items():
+        if header not in PER_REQUEST_HEADERS:
+            cached[header] = value
+    cache.set(page_key(request), (keys, generations, cached), timeout)
+
+
+class AnonymousPageCacheMiddleware:
+    """Отдаёт анонимам сохранённые страницы до сессии, ORM и шаблонов."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not cacheable_request(request):
+            return self.get_response(request)
+        cached = lookup(request)
+        if cached is not None:
+            count('hit')
+            response = get_conditional_response(
+                request, etag=cached.get('ETag'),
+                last_modified=parse_http_date_safe(
+                    cached.get('Last-Modified', '')),
+                response=cached)
+            response['X-Page-Cache'] = 'hit'
+            return response
+        count('miss')
+        response = self.get_response(request)
+        timeout = timeout_for(request, response)
+        if timeout:
+            store(request, response, timeout)
+            count('store')
+        response['X-Page-Cache'] = 'miss'
+        return response
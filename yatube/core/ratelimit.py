@@ -0,0 +1,63 @@
+"""Ограничение частоты действий: скользящее окно на счётчиках в кеше.
+
+У каждого ключа (например, 'comment:<id пользователя>') допускается
+всплеск до capacity действий, а в среднем - per_minute в минуту. Время
+делится на окна по capacity / per_minute минут. Действие прибавляет
+единицу к счётчику текущего окна атомарным incr, а предыдущее окно
+учитывается с весом оставшейся в нём доли. Отказ возвращает свою
+единицу через decr. Значение никогда не читается и не записывается
+целиком, поэтому одновременные запросы не проходят сверх лимита.
+Состояние хранится в кеше, и всплеск отсекается до любых запросов к
+БД.
+"""
+import time
+
+from django.core.cache import cache
+
+KEY_PREFIX = 'ratelimit'
+
+
+def bucket_key(key, window):
+    return f'{KEY_PREFIX}:{key}:{window}'
+
+
+def _window(capacity, per_minute, now):
+    """Длина окна, его номер и сколько секунд от него прошло."""
+    now = time.time() if now is None else now
+    length = 60 * capacity / per_minute
+    window, elapsed = divmod(now, length)
+    return length, int(window), elapsed
+
+
+def take(key, capacity, per_minute, now=None):
+    """Засчитывает действие; 0, если можно, иначе секунды ожидания."""
+    length, window, elapsed = _window(capacity, per_minute, now)
+    current = bucket_key(key, window)
+    timeout = int(length * 2) + 1
+    cache.add(current, 0, timeout=timeout)
+    try:
+        count = cache.incr(current)
+    except ValueError:
+        # счётчик вытеснили между add и incr
+        cache.add(current, 1, timeout=timeout)
+        count = 1
+    previous = cache.get(bucket_key(key, window - 1), 0)
+    weight = 1 - elapsed / length
+    if previous * weight + count <= capacity:
+        return 0
+    try:
+        cache.decr(current)
+    except ValueError:
+        pass
+    count -= 1
+    if count + 1 > capacity:
+        # не хватит и пустого прошлого окна: ждём, пока это станет
+        # прошлым и его вес упадёт до (capacity - 1) / count
+        return length - elapsed + length * (1 - (capacity - 1) / count)
+    return length * (1 - (capacity - count - 1) / previous) - elapsed
+
+
+def reset(key, capacity, per_minute, now=None):
+    _, window, _ = _window(capacity, per_minute, now)
+    cache.delete_many(
+        [bucket_key(key, window), bucket_key(key, window - 1)])
@@ -0,0 +1,36 @@
+"""{% url %} с запомненными шаблонами адресов (core.url_templates).
+
+После {% load fast_urls %} тег {% url %} в шаблоне заменяется этим,
+синтаксис и поведение с "as переменная" прежние.
+"""
+from django import template
+from django.template import defaulttags
+from django.urls import NoReverseMatch
+from django.utils.html import conditional_escape
+
+from core.url_templates import fast_reverse
+
+register = template.Library()
+
+
+class FastURLNode(defaulttags.URLNode):
+    def render(self, context):
+        args = [arg.resolve(context) for arg in self.args]
+        kwargs = {key: value.resolve(context)
+                  for key, value in self.kwargs.items()}
+        url = ''
+        try:
+            url = fast_reverse(self.view_name.resolve(context), args, kwargs)
+        except NoReverseMatch:
+            if self.asvar is None:
+                raise
+        if self.asvar:
+            context[self.asvar] = url
+            return ''
+        return conditional_escape(url) if context.autoescape else url
+
+
+@register.tag
+def url(parser, token):
+    node = defaulttags.url(parser, token)
+    return FastURLNode(node.view_name, node.args, node.kwargs, node.asvar)
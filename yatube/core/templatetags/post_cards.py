@@ -0,0 +1,27 @@
+from django import template
+
+register = template.Library()
+
+CARD_TEMPLATE = 'posts/includes/card_of_post.html'
+_compiled = {}
+
+
+def compiled(engine, name):
+    """Шаблон, разобранный один раз на процесс; в отладке - каждый раз."""
+    if engine.debug:
+        return engine.get_template(name)
+    if (engine, name) not in _compiled:
+        _compiled[engine, name] = engine.get_template(name)
+    return _compiled[engine, name]
+
+
+@register.simple_tag(takes_context=True)
+def post_card(context, post, **flags):
+    """Карточка поста, как {% include %} card_of_post.html с with.
+
+    Шаблон не ищется загрузчиками на каждую карточку, а рендер идёт в
+    текущем контексте без его копирования.
+    """
+    card = compiled(context.template.engine, CARD_TEMPLATE)
+    with context.push(post=post, **flags):
+        return card.render(context)
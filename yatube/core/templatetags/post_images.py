@@ -0,0 +1,35 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from posts.thumbnails import MIME_TYPES
+
+register = template.Library()
+
+CARD_SIZES = '(max-width: 992px) 100vw, 960px'
+
+
+def srcset(urls):
+    return ', '.join(f'{url} {width}w' for width, url in urls)
+
+
+@register.simple_tag
+def post_picture(post, css='card-img my-2', sizes=CARD_SIZES):
+    """<picture> с WebP и JPEG нужной ширины; без копий - исходный файл."""
+    if not post.image:
+        return ''
+    renditions = post.renditions
+    if not renditions:
+        return format_html(
+            '<img class="{}" src="{}" loading="lazy">',
+            css, post.image_card or post.image.url)
+    sources = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}">', (
+            (MIME_TYPES[fmt], srcset(urls), sizes)
+            for fmt, urls in renditions.items() if fmt != 'jpeg'
+        ))
+    jpeg = renditions.get('jpeg', [])
+    return format_html(
+        '<picture>{}<img class="{}" src="{}" srcset="{}" sizes="{}" '
+        'loading="lazy"></picture>',
+        sources, css, post.image_card, srcset(jpeg), sizes,
+    )
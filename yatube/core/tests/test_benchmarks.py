@@ -0,0 +1,99 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+
+from core import benchmarks
+from posts.models import (
+    Comment, FeedEntry, Follow, Post, User, UserStats)
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class BenchmarkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            'seed', users=5, groups=2, posts=30, follows=10, comments=20,
+            tags=5, images=0.5, seed=7, stdout=StringIO(),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_seed(self):
+        """seed создаёт данные и пересобирает производные таблицы"""
+        self.assertEqual(User.objects.count(), 5)
+        self.assertEqual(Post.objects.count(), 30)
+        self.assertTrue(Follow.objects.exists())
+        self.assertEqual(UserStats.objects.count(), 5)
+        self.assertTrue(Post.objects.exclude(image='').exists())
+        self.assertEqual(
+            Post.objects.aggregate(total=Sum('comment_count'))['total'],
+            Comment.objects.count())
+
+    @override_settings(FEED_PULL_THRESHOLD=5)
+    def test_seed_popular_authors_pulled(self):
+        """Популярные по Ципфу авторы не раскладываются по лентам"""
+        call_command(
+            'seed', users=10, groups=1, posts=20, follows=60, comments=0,
+            tags=0, images=0, seed=3, stdout=StringIO(),
+        )
+        pull = UserStats.objects.filter(pull_feed=True)
+        self.assertTrue(pull.exists())
+        self.assertFalse(FeedEntry.objects.filter(
+            author_id__in=pull.values('user_id')).exists())
+
+    def test_percentile(self):
+        """Перцентиль по ближайшему рангу"""
+        values = list(range(1, 101))
+        self.assertEqual(benchmarks.percentile(values, 0.5), 50)
+        self.assertEqual(benchmarks.percentile(values, 0.99), 99)
+        self.assertEqual(benchmarks.percentile([3], 0.95), 3)
+
+    def test_benchmark_command(self):
+        """Все сценарии отрабатывают, сохраняются в JSON и не пишут в БД"""
+        posts = Post.objects.count()
+        path = os.path.join(TEMP_MEDIA_ROOT, 'result.json')
+        call_command(
+            'benchmark', requests=3, warmup=1, output=path,
+            stdout=StringIO(),
+        )
+        with open(path, encoding='utf-8') as source:
+            report = json.load(source)
+        self.assertEqual(set(report['scenarios']), set(benchmarks.SCENARIOS))
+        for name, result in report['scenarios'].items():
+            with self.subTest(scenario=name):
+                self.assertEqual(result['requests'], 3)
+                if name != 'index':
+                    # повторы одной анонимной страницы отдаёт кеш страниц
+                    self.assertGreater(result['queries_per_request'], 0)
+                self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+                self.assertNotIn('500', result['statuses'])
+        self.assertEqual(Post.objects.count(), posts)
+        self.assertGreater(report['meta']['peak_rss_kb'], 0)
+        diff = benchmarks.compare(report, report)
+        self.assertEqual(diff['index']['p50_ms'][2], 0.0)
+
+    def test_feed_benchmark(self):
+        """Гибридная лента пишет меньше строк и ничего не оставляет в БД"""
+        users = User.objects.count()
+        result = benchmarks.feed_benchmark(
+            readers=30, authors=5, posts=2, threshold=10, reads=5)
+        self.assertEqual(result['push']['pull_authors'], 0)
+        self.assertGreater(result['hybrid']['pull_authors'], 0)
+        self.assertEqual(
+            result['push']['feed_rows_written'],
+            2 * result['push']['follows'])
+        self.assertLess(
+            result['hybrid']['feed_rows_written'],
+            result['push']['feed_rows_written'])
+        self.assertEqual(User.objects.count(), users)
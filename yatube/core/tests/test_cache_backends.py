@@ -0,0 +1,132 @@
+import io
+import os
+import shutil
+import tempfile
+import time
+
+from django.test import SimpleTestCase, override_settings
+
+from core.cache_backends.redis import (
+    dump_value, encode_command, load_value, read_reply)
+from core.cache_backends.sqlite import SQLiteCache
+from core.cache_backends.tiered import TwoLevelCache
+
+TEMP_DIR = tempfile.mkdtemp()
+SHARED_PATH = os.path.join(TEMP_DIR, 'shared.sqlite3')
+SHARED = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'core.cache_backends.sqlite.SQLiteCache',
+        'LOCATION': SHARED_PATH,
+    },
+}
+
+
+def tearDownModule():
+    shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = SQLiteCache(SHARED_PATH, {})
+        self.cache.clear()
+
+    def test_set_get_delete(self):
+        """Значения переживают pickle и удаляются"""
+        self.cache.set('ключ', {'a': [1, 2]})
+        self.assertEqual(self.cache.get('ключ'), {'a': [1, 2]})
+        self.cache.delete('ключ')
+        self.assertIsNone(self.cache.get('ключ'))
+
+    def test_add_and_incr(self):
+        """add не перезаписывает, incr атомарен и требует ключ"""
+        self.assertTrue(self.cache.add('счётчик', 1))
+        self.assertFalse(self.cache.add('счётчик', 100))
+        self.assertEqual(self.cache.incr('счётчик'), 2)
+        with self.assertRaises(ValueError):
+            self.cache.incr('нет такого')
+
+    def test_shared_between_instances(self):
+        """Второе подключение к файлу видит те же данные"""
+        other = SQLiteCache(SHARED_PATH, {})
+        self.cache.set_many({'a': 1, 'b': 2})
+        self.assertEqual(other.get_many(['a', 'b', 'c']), {'a': 1, 'b': 2})
+
+    def test_expiry(self):
+        """Просроченные записи не читаются"""
+        self.cache.set('коротко', 1, timeout=0.05)
+        time.sleep(0.1)
+        self.assertFalse(self.cache.has_key('коротко'))
+
+
+@override_settings(CACHES=SHARED)
+class TwoLevelCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.worker_1 = TwoLevelCache('one', {'OPTIONS': {'L2': 'shared'}})
+        self.worker_2 = TwoLevelCache('two', {'OPTIONS': {'L2': 'shared'}})
+        self.worker_1.clear()
+        self.worker_2.clear()
+
+    def test_read_through(self):
+        """Запись одного воркера видна другому через L2"""
+        self.worker_1.set('фрагмент', 'html')
+        self.assertEqual(self.worker_2.get('фрагмент'), 'html')
+        self.assertEqual(self.worker_2.l1.get('фрагмент'), 'html')
+
+    def test_generations_bypass_l1(self):
+        """Счётчики поколений всегда читаются из L2"""
+        self.worker_1.add('gen:index', 1)
+        self.assertEqual(self.worker_2.get('gen:index'), 1)
+        self.worker_1.incr('gen:index')
+        self.assertEqual(self.worker_2.get('gen:index'), 2)
+        self.assertIsNone(self.worker_2.l1.get('gen:index'))
+
+    def test_deleted_keys_bypass_l1(self):
+        """Удаление в одном воркере сразу видно другому"""
+        keys = ('graph:followers:1', 'feed-recent:1', 'feed-pull-authors',
+                'mtime:index', 'ratelimit:comment:1', 'upload-quota:1:x')
+        for key in keys:
+            with self.subTest(key=key):
+                self.worker_1.set(key, b'old')
+                self.assertEqual(self.worker_2.get(key), b'old')
+                self.assertEqual(
+                    self.worker_2.get_many([key]), {key: b'old'})
+                self.worker_1.delete(key)
+                self.assertIsNone(self.worker_2.get(key))
+                self.assertEqual(self.worker_2.get_many([key]), {})
+                self.assertFalse(self.worker_2.has_key(key))
+
+    def test_delete_reaches_both_levels(self):
+        """Удаление чистит L1 своего воркера и L2"""
+        self.worker_1.set('ключ', 1)
+        self.worker_1.delete('ключ')
+        self.assertIsNone(self.worker_1.get('ключ'))
+        self.assertIsNone(self.worker_2.get('ключ'))
+
+
+class RespProtocolTests(SimpleTestCase):
+    def test_encode_command(self):
+        """Команда кодируется массивом bulk-строк"""
+        self.assertEqual(
+            encode_command('SET', 'k', b'v'),
+            b'*3\r\n$3\r\nSET\r\n$1\r\nk\r\n$1\r\nv\r\n',
+        )
+
+    def test_read_reply(self):
+        """Разбираются все типы ответов RESP"""
+        stream = io.BytesIO(
+            b'+OK\r\n:5\r\n$3\r\nabc\r\n$-1\r\n*2\r\n$1\r\na\r\n:1\r\n')
+        self.assertEqual(read_reply(stream), b'OK')
+        self.assertEqual(read_reply(stream), 5)
+        self.assertEqual(read_reply(stream), b'abc')
+        self.assertIsNone(read_reply(stream))
+        self.assertEqual(read_reply(stream), [b'a', 1])
+
+    def test_values_roundtrip(self):
+        """Целые хранятся числом для INCRBY, прочее - через pickle"""
+        self.assertEqual(dump_value(42), b'42')
+        for value in (42, 'строка', {'a': 1}, True):
+            with self.subTest(value=value):
+                self.assertEqual(load_value(dump_value(value)), value)
@@ -0,0 +1,60 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.instrumentation import fingerprint
+from core.middleware import QueryBudgetExceeded
+from posts.models import Post, User
+
+
+class QueryInstrumentationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user('author')
+        Post.objects.create(author=cls.user, text='пост')
+
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(QUERY_INSTRUMENTATION_HEADERS=True)
+    def test_headers(self):
+        """Число запросов и время попадают в заголовки ответа"""
+        response = self.client.get(reverse('posts:index'))
+        # страница постов и теги к ним
+        self.assertEqual(response['X-Query-Count'], '2')
+        self.assertEqual(response['X-Query-Duplicates'], '0')
+        self.assertIn('X-Query-Time', response)
+        self.assertIn('X-Template-Time', response)
+
+    @override_settings(QUERY_INSTRUMENTATION_HEADERS=True)
+    def test_template_profile(self):
+        """Время раскладывается по шаблонам, включая карточки постов"""
+        response = self.client.get(reverse('posts:index'))
+        rows = {
+            row.split(';')[0]: row.split(';')[1:]
+            for row in response['X-Template-Profile'].split(', ')
+        }
+        self.assertEqual(rows['posts/includes/card_of_post.html'][0], '1')
+        self.assertIn('posts/index.html', rows)
+
+    @override_settings(
+        QUERY_BUDGETS={'posts:index': 0}, QUERY_BUDGET_RAISE=True)
+    def test_budget_raises(self):
+        """Превышение бюджета поднимает исключение"""
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get(reverse('posts:index'))
+
+    @override_settings(
+        QUERY_BUDGETS={'posts:index': 0}, QUERY_BUDGET_RAISE=False)
+    def test_budget_logs(self):
+        """Без QUERY_BUDGET_RAISE превышение только пишется в лог"""
+        with self.assertLogs('yatube.queries', 'WARNING'):
+            response = self.client.get(reverse('posts:index'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_fingerprint_ignores_in_list_length(self):
+        """Отпечаток не зависит от длины IN (...)"""
+        short, _ = fingerprint('SELECT 1 WHERE id IN (%s, %s)')
+        long, _ = fingerprint('SELECT 1 WHERE id IN (%s, %s, %s)')
+        self.assertEqual(short, long)
@@ -0,0 +1,85 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core import page_cache
+from posts.models import Comment, Group, Post, User
+
+
+class AnonymousPageCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост')
+        cls.other = Post.objects.create(author=cls.author, text='Другой')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_hit_without_queries(self):
+        """Повторный анонимный запрос отдаётся из кеша без SQL"""
+        url = reverse('posts:index')
+        first = self.client.get(url)
+        self.assertEqual(first['X-Page-Cache'], 'miss')
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(second['X-Page-Cache'], 'hit')
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(
+            page_cache.stats(),
+            {'hit': 1, 'miss': 1, 'store': 1, 'ratio': 0.5})
+
+    def test_surrogate_keys_purge_exact_pages(self):
+        """Комментарий сбрасывает только страницу своего поста"""
+        post_url = reverse('posts:post_detail', args=[self.post.pk])
+        other_url = reverse('posts:post_detail', args=[self.other.pk])
+        response = self.client.get(post_url)
+        self.assertIn(f'post:{self.post.pk}', response['Surrogate-Key'])
+        self.client.get(other_url)
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Свежий комментарий')
+        response = self.client.get(post_url)
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(response, 'Свежий комментарий')
+        self.assertEqual(self.client.get(other_url)['X-Page-Cache'], 'hit')
+
+    def test_group_edit_purges_group_page(self):
+        """Правка поста группы сбрасывает страницу группы"""
+        url = reverse('posts:group_list', args=['group'])
+        self.client.get(url)
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Исправленный текст'
+        post.save()
+        self.assertContains(self.client.get(url), 'Исправленный текст')
+
+    def test_logged_in_bypass(self):
+        """Пользователь с сессией получает страницу мимо кеша"""
+        url = reverse('posts:index')
+        self.client.get(url)
+        client = Client()
+        client.force_login(self.author)
+        response = client.get(url)
+        self.assertNotIn('X-Page-Cache', response)
+        self.assertContains(response, 'Новая запись')
+
+    def test_cookie_setting_pages_not_stored(self):
+        """Страницы, ставящие cookie (CSRF-формы), не сохраняются"""
+        url = reverse('users:signup')
+        self.client.get(url)
+        self.assertEqual(page_cache.stats()['store'], 0)
+
+    def test_stats_command(self):
+        """Команда выводит счётчики и умеет их сбрасывать"""
+        self.client.get(reverse('about:author'))
+        self.client.get(reverse('about:author'))
+        out = StringIO()
+        call_command('page_cache_stats', reset=True, stdout=out)
+        self.assertIn('Попаданий: 1', out.getvalue())
+        self.assertEqual(page_cache.stats()['hit'], 0)
@@ -0,0 +1,42 @@
+from django.template import Context, Template
+from django.test import TestCase
+
+from posts.models import Group, Post, User
+
+
+class PostCardTagTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username='author')
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.post = Post.objects.create(
+            author=author, group=group, text='Пост')
+
+    def render(self, source):
+        return Template(source).render(Context({'post': self.post}))
+
+    def test_same_as_include(self):
+        """{% post_card %} выводит то же, что {% include %} карточки"""
+        cases = (
+            ('', ''),
+            (' group_need_post=True', ' with group_need_post=True'),
+            (' profile_need_post=True', ' with profile_need_post=True'),
+        )
+        for flags, include_flags in cases:
+            with self.subTest(flags=flags):
+                self.assertHTMLEqual(
+                    self.render(
+                        '{% load post_cards %}{% post_card post' + flags
+                        + ' %}'),
+                    self.render(
+                        "{% include 'posts/includes/card_of_post.html'"
+                        + include_flags + ' %}'),
+                )
+
+    def test_context_restored(self):
+        """Флаги карточки не протекают в окружающий шаблон"""
+        output = self.render(
+            '{% load post_cards %}{% post_card post group_need_post=True %}'
+            '[{{ group_need_post }}]')
+        self.assertTrue(output.endswith('[]'))
@@ -0,0 +1,43 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from core import ratelimit
+
+
+class SlidingWindowTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_burst_then_refill(self):
+        """Всплеск до capacity, дальше - по мере ухода прошлого окна"""
+        # окно 30 секунд, запросы на его 10-й секунде
+        now = 1000.0
+        for _ in range(3):
+            self.assertEqual(ratelimit.take('k', 3, 6, now=now), 0)
+        wait = ratelimit.take('k', 3, 6, now=now)
+        self.assertAlmostEqual(wait, 30.0)
+        self.assertGreater(ratelimit.take('k', 3, 6, now=now + 25), 0)
+        self.assertEqual(ratelimit.take('k', 3, 6, now=now + wait), 0)
+
+    def test_refused_not_counted(self):
+        """Отказ не тратит лимит следующего окна"""
+        for _ in range(5):
+            ratelimit.take('k', 1, 1, now=0)
+        self.assertEqual(ratelimit.take('k', 1, 1, now=120), 0)
+
+    def test_concurrent_takes(self):
+        """Одновременные запросы не проходят сверх capacity"""
+        with ThreadPoolExecutor(8) as pool:
+            waits = list(pool.map(
+                lambda _: ratelimit.take('k', 5, 1, now=10), range(40)))
+        self.assertEqual(waits.count(0), 5)
+
+    def test_keys_are_separate(self):
+        """У каждого ключа своё окно; reset его опустошает"""
+        ratelimit.take('a', 1, 1, now=0)
+        self.assertGreater(ratelimit.take('a', 1, 1, now=0), 0)
+        self.assertEqual(ratelimit.take('b', 1, 1, now=0), 0)
+        ratelimit.reset('a', 1, 1, now=0)
+        self.assertEqual(ratelimit.take('a', 1, 1, now=0), 0)
@@ -0,0 +1,67 @@
+from django.template import Context, Template
+from django.test import SimpleTestCase
+from django.urls import NoReverseMatch, reverse
+
+from core import benchmarks
+from core.url_templates import fast_reverse
+
+
+class FastReverseTests(SimpleTestCase):
+    def test_same_as_reverse(self):
+        """Адреса совпадают с reverse()"""
+        cases = (
+            ('posts:index', (), {}),
+            ('posts:profile', ('author',), {}),
+            ('posts:profile', ('Вася Пупкин',), {}),
+            ('posts:group_list', ('cats-2',), {}),
+            ('posts:profile', ('100% кот',), {}),
+            ('posts:post_detail', (15,), {}),
+            ('posts:post_detail', (), {'post_id': 15}),
+            ('posts:tag_posts', ('котики дня',), {}),
+            ('api:comment-detail', (), {'post_id': 3, 'pk': 7}),
+        )
+        for viewname, args, kwargs in cases:
+            with self.subTest(viewname=viewname, args=args, kwargs=kwargs):
+                self.assertEqual(
+                    fast_reverse(viewname, args, kwargs),
+                    reverse(viewname, args=args or None,
+                            kwargs=kwargs or None))
+
+    def test_errors_kept(self):
+        """Недопустимые значения дают NoReverseMatch, как reverse()"""
+        cases = (
+            ('posts:post_detail', ('abc',)),
+            ('posts:post_detail', ('',)),
+            ('posts:profile', ('a/b',)),
+            ('posts:group_list', ('a.b',)),
+            ('posts:group_list', ('a b',)),
+            ('posts:group_list', ('котики',)),
+            ('posts:group_list', ('100%',)),
+            ('api:comment-detail', (3, 'a.b')),
+            ('posts:profile', ()),
+            ('posts:nope', ()),
+        )
+        for viewname, args in cases:
+            with self.subTest(viewname=viewname, args=args):
+                with self.assertRaises(NoReverseMatch):
+                    fast_reverse(viewname, args)
+
+    def test_slash_in_path_route(self):
+        """Слеш допустим там, где его допускает маршрут"""
+        self.assertEqual(
+            fast_reverse('posts:tag_posts', ('a/b',)),
+            reverse('posts:tag_posts', args=('a/b',)))
+
+    def test_template_tag(self):
+        """{% url %} из fast_urls - замена встроенного, включая as"""
+        output = Template(
+            '{% load fast_urls %}{% url "posts:profile" name %}|'
+            '{% url "posts:nope" as missing %}[{{ missing }}]'
+        ).render(Context({'name': 'a&b'}))
+        self.assertEqual(output, '/profile/a&amp;b/|[]')
+
+    def test_benchmark(self):
+        """Бенчмарк сравнивает одинаковые страницы"""
+        result = benchmarks.url_benchmark(cards=2, repeat=2)
+        self.assertEqual(result['reverses_per_page'], 16)
+        self.assertGreater(result['stock_us'], 0)
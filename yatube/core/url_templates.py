@@ -0,0 +1,141 @@
+"""Запомненные шаблоны URL для частых reverse().
+
+Для пары (имя маршрута, набор аргументов) reverse() вызывается один раз
+с числами-заглушками; получившийся адрес режется по ним на куски, и
+дальше URL собирается склейкой строк. Вместе с кусками запоминаются
+регулярное выражение маршрута и его конвертеры: склеенный адрес
+проверяется тем же выражением, что и в reverse(), а не подошедшие
+значения уходят в обычный reverse(), поэтому ошибки остаются прежними -
+NoReverseMatch.
+"""
+import re
+from urllib.parse import quote
+
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.urls import (
+    get_ns_resolver, get_resolver, get_script_prefix, get_urlconf, reverse)
+from django.urls.exceptions import NoReverseMatch
+from django.utils.http import RFC3986_SUBDELIMS
+
+SENTINEL = 7391820465
+SAFE = RFC3986_SUBDELIMS + '/~:@'
+_templates = {}
+
+
+def _split(url, sentinels):
+    """['/posts/', 0, '/'] для '/posts/<s0>/'; None, если заглушки нет."""
+    pieces = []
+    positions = sorted(
+        (url.find(sentinel), index) for index, sentinel in
+        enumerate(sentinels))
+    if any(position < 0 for position, _ in positions):
+        return None
+    offset = 0
+    for position, index in positions:
+        pieces.append(url[offset:position])
+        pieces.append(index)
+        offset = position + len(sentinels[index])
+    pieces.append(url[offset:])
+    return pieces
+
+
+def _resolver(viewname):
+    """Резолвер пространства имён и имя маршрута в нём, как в reverse().
+
+    current_app не учитывается: берётся экземпляр по умолчанию.
+    """
+    resolver = get_resolver(get_urlconf())
+    *namespaces, view = viewname.split(':')
+    ns_pattern, ns_converters = '', {}
+    for namespace in namespaces:
+        instances = resolver.app_dict.get(namespace)
+        if instances and namespace not in instances:
+            namespace = instances[0]
+        extra, resolver = resolver.namespace_dict[namespace]
+        ns_pattern += extra
+        ns_converters.update(resolver.pattern.converters)
+    if ns_pattern:
+        resolver = get_ns_resolver(
+            ns_pattern, resolver, tuple(ns_converters.items()))
+    return resolver, view
+
+
+def _route(viewname, arity, names):
+    """(выражение, конвертеры по местам значений) единственного маршрута.
+
+    None, если маршрутов под этот набор аргументов несколько или у него
+    есть defaults: тогда выбор лучше оставить самому reverse().
+    """
+    try:
+        resolver, view = _resolver(viewname)
+    except KeyError:
+        return None
+    found = []
+    for possibility, pattern, defaults, converters in (
+            resolver.reverse_dict.getlist(view)):
+        for _, params in possibility:
+            if arity:
+                fits = len(params) == arity
+                order = params
+            else:
+                fits = set(params) == set(names)
+                order = names
+            if fits:
+                found.append((pattern, defaults, converters, order))
+    if len(found) != 1 or found[0][1]:
+        return None
+    pattern, _, converters, order = found[0]
+    prefix = get_script_prefix()
+    regex = re.compile(f'^{re.escape(prefix)}{pattern}')
+    return regex, [converters.get(param) for param in order]
+
+
+def url_template(viewname, arity=0, names=()):
+    """(куски, (выражение, конвертеры)) маршрута или None, если не вышло."""
+    key = (get_urlconf(), get_script_prefix(), viewname, arity, names)
+    if key not in _templates:
+        sentinels = [str(SENTINEL + index)
+                     for index in range(arity + len(names))]
+        try:
+            url = reverse(viewname, args=sentinels[:arity] or None,
+                          kwargs=dict(zip(names, sentinels[arity:])) or None)
+        except NoReverseMatch:
+            # неверное число аргументов: пусть reverse() сам объяснит
+            _templates[key] = None
+            return None
+        pieces = _split(url, sentinels)
+        route = _route(viewname, arity, names)
+        _templates[key] = pieces and route and (pieces, route)
+    return _templates[key]
+
+
+def fast_reverse(viewname, args=(), kwargs=None):
+    """То же, что reverse(viewname, args=..., kwargs=...), но дешевле."""
+    kwargs = kwargs or {}
+    names = tuple(sorted(kwargs))
+    template = url_template(viewname, len(args), names)
+    if template is None:
+        return reverse(viewname, args=args or None, kwargs=kwargs or None)
+    pieces, (regex, converters) = template
+    values = [*args, *(kwargs[name] for name in names)]
+    try:
+        values = [
+            str(value) if converter is None else converter.to_url(value)
+            for value, converter in zip(values, converters)]
+    except ValueError:
+        values = None
+    # проверка та же, что в reverse(): по незакодированному адресу
+    if values is None or not regex.search(''.join(
+            piece if isinstance(piece, str) else values[piece]
+            for piece in pieces)):
+        return reverse(viewname, args=args or None, kwargs=kwargs or None)
+    return ''.join(
+        piece if isinstance(piece, str) else quote(values[piece], safe=SAFE)
+        for piece in pieces)
+
+
+@receiver(setting_changed)
+def clear(setting=None, **kwargs):
+    if setting in (None, 'ROOT_URLCONF'):
+        _templates.clear()
@@ -1,6 +1,7 @@
 from django.contrib import admin
 
-from .models import Group, Post
+from . import comments, search
+from .models import Comment, Group, Post
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -10,11 +11,21 @@ class PostAdmin(admin.ModelAdmin):
         'created',
         'author',
         'group',
+        'comment_count',
     )
     list_editable = ('group',)
     search_fields = ('text',)
     list_filter = ('created',)
     empty_value_display = '-пусто-'
+    search_limit = 1000
+
+    def get_search_results(self, request, queryset, search_term):
+        # вместо LIKE '%...%' - поисковый индекс, лучшие search_limit
+        if not search_term:
+            return queryset, False
+        hits = search.get_backend().search(
+            search_term, limit=self.search_limit)
+        return queryset.filter(pk__in=[hit.id for hit in hits]), False
 
 
 class GroupAdmin(admin.ModelAdmin):
@@ -24,18 +35,49 @@ class GroupAdmin(admin.ModelAdmin):
 
 class CommentAdmin(admin.ModelAdmin):
     list_display = (
+        'pk',
         'post',
         'author',
         'text',
-        'created'
+        'created',
+        'is_hidden',
     )
-    list_editable = ('text')
+    list_editable = ('text',)
+    list_select_related = ('post', 'author')
     search_fields = (
         'text',
-        'post'
+        'author__username',
     )
-    list_filter = ('created')
+    list_filter = ('created', 'is_hidden')
+    # без COUNT(*) по всей таблице на каждой странице
+    show_full_result_count = False
+    actions = ('hide_comments', 'unhide_comments', 'delete_comments')
+
+    def get_actions(self, request):
+        # штатное удаление грузит каждый объект и шлёт сигналы по одному
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+    def hide_comments(self, request, queryset):
+        hidden = comments.hide(queryset)
+        self.message_user(request, f'Скрыто комментариев: {hidden}')
+    hide_comments.short_description = 'Скрыть выбранные комментарии'
+    hide_comments.allowed_permissions = ('change',)
+
+    def unhide_comments(self, request, queryset):
+        shown = comments.unhide(queryset)
+        self.message_user(request, f'Показано комментариев: {shown}')
+    unhide_comments.short_description = 'Показать выбранные комментарии'
+    unhide_comments.allowed_permissions = ('change',)
+
+    def delete_comments(self, request, queryset):
+        deleted = comments.delete(queryset)
+        self.message_user(request, f'Удалено комментариев: {deleted}')
+    delete_comments.short_description = 'Удалить выбранные комментарии'
+    delete_comments.allowed_permissions = ('delete',)
 
 
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group, GroupAdmin)
+admin.site.register(Comment, CommentAdmin)
@@ -0,0 +1,199 @@
+"""REST API постов, групп, комментариев и подписок.
+
+Списки листаются тем же курсором, что и HTML-ленты (posts.pagination),
+и собирают авторов, группы и теги заранее, поэтому число запросов не
+зависит от размера страницы. ?fields= сужает ответ и заодно убирает
+ненужные prefetch. Ответы на GET получают ETag, по If-None-Match
+возвращается 304 без тела; у постов, комментариев и подписок - по
+поколениям кеша, до запросов к БД.
+"""
+from django.shortcuts import get_object_or_404
+from django.utils.cache import (
+    get_conditional_response, patch_cache_control, patch_vary_headers,
+    set_response_etag,
+)
+from django.utils.http import quote_etag
+from rest_framework import (
+    exceptions, mixins, permissions, status, viewsets,
+)
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from . import comments, follows, graph
+from .conditional import validators
+from .models import Follow, Group, Post
+from .serializers import (
+    BulkFollowSerializer, CommentSerializer, FollowSerializer,
+    GroupSerializer, PostSerializer, requested_fields,
+)
+
+
+class IsAuthorOrReadOnly(permissions.BasePermission):
+    def has_object_permission(self, request, view, obj):
+        return (request.method in permissions.SAFE_METHODS
+                or obj.author == request.user)
+
+
+class NotModified(Exception):
+    """Ответ клиента не изменился: отдать 304 без выборки."""
+
+
+class ConditionalMixin:
+    """ETag и 304 на совпавший If-None-Match для GET.
+
+    Если view перечисляет артефакты ответа (artifacts()), ETag считается
+    по их поколениям, как у HTML-страниц (posts.conditional), и 304
+    отдаётся до запросов к БД и сериализации. Иначе ETag - хеш тела.
+    """
+
+    def artifacts(self):
+        return None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.etag = None
+        if request.method not in ('GET', 'HEAD'):
+            return
+        etag, _ = validators(request, lambda request: self.artifacts())
+        if etag is None:
+            return
+        self.etag = quote_etag(f'{etag}-{request.accepted_renderer.format}')
+        if get_conditional_response(request, etag=self.etag) is not None:
+            raise NotModified
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return Response(status=status.HTTP_304_NOT_MODIFIED)
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs)
+        if request.method not in ('GET', 'HEAD'):
+            return response
+        if response.status_code not in (200, 304):
+            return response
+        etag = getattr(self, 'etag', None)
+        if etag is None:
+            response.render()
+            set_response_etag(response)
+        else:
+            response['ETag'] = etag
+        patch_vary_headers(response, ('Accept', 'Cookie', 'Authorization'))
+        # кешировать можно, но перед использованием - сверить ETag
+        patch_cache_control(response, private=True, no_cache=True)
+        if etag is not None:
+            return response
+        return get_conditional_response(
+            request, etag=response['ETag'], response=response)
+
+
+class PostViewSet(ConditionalMixin, viewsets.ModelViewSet):
+    serializer_class = PostSerializer
+    permission_classes = (
+        permissions.IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly)
+
+    def get_queryset(self):
+        queryset = Post.objects.select_related('author', 'group')
+        fields = requested_fields(self.request)
+        if fields is None or 'tag' in fields:
+            queryset = queryset.prefetch_related('tag')
+        return queryset
+
+    def artifacts(self):
+        if self.action == 'list':
+            # ('comments',) - из-за comment_count в каждом посте
+            return [('index',), ('comments',)]
+        if self.action == 'retrieve':
+            return [('post', self.kwargs['pk'])]
+        return None
+
+    def perform_create(self, serializer):
+        serializer.save(author=self.request.user)
+
+
+class GroupViewSet(ConditionalMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = Group.objects.all()
+    serializer_class = GroupSerializer
+    cursor_keys = ('slug', 'id')
+
+
+class CommentViewSet(ConditionalMixin, viewsets.ModelViewSet):
+    serializer_class = CommentSerializer
+    permission_classes = (
+        permissions.IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly)
+
+    def get_post(self):
+        return get_object_or_404(Post, pk=self.kwargs['post_id'])
+
+    def get_queryset(self):
+        return self.get_post().comments.filter(
+            is_hidden=False).select_related('author')
+
+    def artifacts(self):
+        if self.action in ('list', 'retrieve'):
+            return [('post', self.kwargs['post_id'])]
+        return None
+
+    def perform_create(self, serializer):
+        # тот же лимит, что у формы комментария, и так же только для
+        # прошедших проверку данных
+        wait = comments.throttle(self.request.user)
+        if wait:
+            raise exceptions.Throttled(wait)
+        serializer.save(author=self.request.user, post=self.get_post())
+
+
+class FollowViewSet(ConditionalMixin, mixins.ListModelMixin,
+                    mixins.CreateModelMixin, mixins.DestroyModelMixin,
+                    viewsets.GenericViewSet):
+    """Подписки текущего пользователя."""
+    serializer_class = FollowSerializer
+    permission_classes = (permissions.IsAuthenticated,)
+    # порядок по unique_author_user_following, без сортировки
+    cursor_keys = ('author_id', 'id')
+
+    def get_queryset(self):
+        return Follow.objects.filter(
+            user=self.request.user).select_related('user', 'author')
+
+    def artifacts(self):
+        if self.action == 'list':
+            return [('follow', self.request.user.pk)]
+        return None
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+    @action(detail=False, methods=['post'],
+            serializer_class=BulkFollowSerializer)
+    def bulk(self, request):
+        """Подписка на список авторов пачками; неизвестные пропускаются."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        created = follows.follow_many(
+            request.user, serializer.validated_data['following'])
+        return Response({'created': created}, status=status.HTTP_200_OK)
+
+    @action(detail=False)
+    def mutual(self, request):
+        """Взаимные подписки текущего пользователя, курсором."""
+        users = self.paginator.paginate_ids(
+            graph.mutual(request.user.pk), request)
+        return self.paginator.get_paginated_response(
+            [user.username for user in users])
+
+    @action(detail=False)
+    def suggestions(self, request):
+        """Авторы, на которых подписаны те, на кого подписан пользователь."""
+        try:
+            limit = min(int(request.query_params.get('limit', 10)), 50)
+        except ValueError:
+            limit = 10
+        scored = graph.suggestions(request.user.pk, limit=max(limit, 1))
+        users = {user.pk: user for user in graph.users(
+            [author_id for author_id, _ in scored])}
+        return Response([
+            {'username': users[author_id].username, 'followed_by': score}
+            for author_id, score in scored if author_id in users
+        ])
@@ -0,0 +1,19 @@
+"""URL REST API для приложения posts."""
+from django.urls import include, path
+from rest_framework.routers import DefaultRouter
+
+from . import api
+
+app_name = 'api'
+
+router = DefaultRouter()
+router.register('posts', api.PostViewSet, basename='post')
+router.register('groups', api.GroupViewSet, basename='group')
+router.register(
+    r'posts/(?P<post_id>\d+)/comments', api.CommentViewSet,
+    basename='comment')
+router.register('follow', api.FollowViewSet, basename='follow')
+
+urlpatterns = [
+    path('v1/', include(router.urls)),
+]
@@ -0,0 +1,132 @@
+"""Версионированные ключи кеша для лент.
+
+У каждой ленты есть счётчик поколения в кеше. Ключ фрагмента включает
+текущее поколение, поэтому после bump() старые фрагменты просто
+перестают запрашиваться и доживают свой TTL незаметно для читателей.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+
+GENERATION_PREFIX = 'gen'
+MTIME_PREFIX = 'mtime'
+SURROGATE_HEADER = 'Surrogate-Key'
+PAGE_PARAMS = ('cursor', 'page')
+
+
+def generation_key(tag):
+    return ':'.join([GENERATION_PREFIX] + [str(part) for part in tag])
+
+
+def mtime_key(tag):
+    return ':'.join([MTIME_PREFIX] + [str(part) for part in tag])
+
+
+def surrogate_keys(tags):
+    """Артефакты в виде значения заголовка: 'index post:5 group:cats'."""
+    return ' '.join(':'.join(str(part) for part in tag) for tag in tags)
+
+
+def parse_surrogate_keys(value):
+    return [tuple(key.split(':')) for key in (value or '').split()]
+
+
+def _initial_generation():
+    # если счётчик вытеснили из кеша, новый не должен совпасть со старым
+    return int(time.time() * 1000)
+
+
+def generation(*tag):
+    """Текущее поколение артефакта, например generation('group', slug)."""
+    key = generation_key(tag)
+    value = cache.get(key)
+    if value is None:
+        cache.add(key, _initial_generation(), timeout=None)
+        value = cache.get(key)
+    return value
+
+
+def generations(*tags):
+    """Поколения многих артефактов одним get_many, в порядке tags."""
+    keys = [generation_key(tag) for tag in tags]
+    values = cache.get_many(keys)
+    return [
+        values[key] if values.get(key) is not None else generation(*tag)
+        for tag, key in zip(tags, keys)
+    ]
+
+
+def bump(*tags):
+    """Сдвигает поколения перечисленных артефактов."""
+    now = time.time()
+    for tag in tags:
+        key = generation_key(tag)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _initial_generation(), timeout=None)
+    cache.set_many({mtime_key(tag): now for tag in tags}, timeout=None)
+
+
+def versions(*tags):
+    """Поколения артефактов и время последнего изменения любого из них.
+
+    Всё читается одним get_many; время, вытесненное из кеша или ещё не
+    записанное, считается текущим - это лишь лишний полный ответ.
+    """
+    keys = {tag: (generation_key(tag), mtime_key(tag)) for tag in tags}
+    values = cache.get_many([key for pair in keys.values() for key in pair])
+    generations = []
+    mtime = None
+    for tag, (key, time_key) in keys.items():
+        value = values.get(key)
+        generations.append(generation(*tag) if value is None else value)
+        changed = values.get(time_key)
+        if changed is None:
+            changed = time.time()
+            cache.add(time_key, changed, timeout=None)
+        mtime = changed if mtime is None else max(mtime, changed)
+    return generations, mtime
+
+
+def feed_tag(feed, ident=None):
+    return (feed,) if ident is None else (feed, ident)
+
+
+def feed_cache(request, feed, ident=None, extra=()):
+    """Параметры {% cache %} для ленты: время жизни и ключ фрагмента.
+
+    Ключ зависит от ленты, её поколения, страницы или курсора и
+    пользователя, которому отдаётся страница, и его подписок; extra -
+    другие артефакты, из которых собрана лента (например, pull-авторы
+    ленты подписок - авторы, на которых подписан читатель).
+    """
+    page = '-'.join(request.GET.get(param, '') for param in PAGE_PARAMS)
+    viewer = request.user.pk if request.user.is_authenticated else 'anon'
+    if request.user.is_authenticated:
+        # карточки показывают, подписан ли зритель на автора
+        extra = (*extra, ('follow', viewer))
+    key = ':'.join(str(part) for part in (
+        feed,
+        ident if ident is not None else '',
+        generation(*feed_tag(feed, ident)),
+        '.'.join(str(value) for value in generations(*extra)),
+        page,
+        viewer,
+    ))
+    return {
+        'ttl': settings.FEED_CACHE_TIMEOUTS.get(feed, 0),
+        'key': key,
+    }
+
+
+def fragment_cached(params):
+    """Есть ли в кеше фрагмент {% cache params.ttl feed params.key %}.
+
+    Проверка - has_key, без чтения самого фрагмента; view по ней
+    откладывает выборку ленты, которую шаблон не будет рендерить.
+    """
+    return cache.has_key(
+        make_template_fragment_key('feed', [params['key']]))
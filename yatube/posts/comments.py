@@ -0,0 +1,137 @@
+"""Комментарии: запись с ограничением частоты, счётчик, модерация пачками.
+
+add() сначала сдвигает Post.comment_count одним UPDATE - он же проверяет,
+что пост существует, - и только потом пишет комментарий, так что пост
+целиком не читается. Частоту ограничивает скользящее окно из
+core.ratelimit (COMMENT_RATE_LIMIT): лимит тратит уже проверенный
+комментарий, но до любых обращений к БД.
+
+hide, unhide и delete работают с querysets из админки пачками по
+batch_size: на пачку - одна выборка id, один UPDATE или DELETE, сдвиг
+счётчиков постов и авторов, правка поискового индекса пачкой и инвалидация
+страниц постов, без сигналов на каждую строку.
+"""
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from core import ratelimit
+
+from . import invalidation, search, stats
+from .models import Comment, Post
+
+BATCH_SIZE = 1000
+
+
+def throttle(user):
+    """0, если пользователь может комментировать, иначе секунды ожидания."""
+    limit = getattr(settings, 'COMMENT_RATE_LIMIT', None)
+    if not limit:
+        return 0
+    return ratelimit.take(
+        f'comment:{user.pk}', limit['capacity'], limit['per_minute'])
+
+
+@transaction.atomic
+def add(author, post_id, text):
+    """Новый комментарий или None, если поста нет."""
+    if not Post.objects.filter(pk=post_id).update(
+            comment_count=F('comment_count') + 1):
+        return None
+    comment = Comment(post_id=post_id, author=author, text=text)
+    # счётчик уже сдвинут, сигналу его трогать не нужно
+    comment._counted = True
+    comment.save()
+    return comment
+
+
+def shift_counts(deltas):
+    """Сдвигает comment_count постов: {id поста: сдвиг}."""
+    by_delta = {}
+    for post_id, delta in deltas.items():
+        if delta:
+            by_delta.setdefault(delta, []).append(post_id)
+    for delta, post_ids in by_delta.items():
+        Post.objects.filter(pk__in=post_ids).update(
+            comment_count=Greatest(F('comment_count') + delta, 0))
+
+
+def recount(dry_run=False):
+    """Сверяет comment_count с комментариями; число расхождений."""
+    visible = Comment.objects.filter(
+        post=OuterRef('pk'), is_hidden=False,
+    ).order_by().values('post').annotate(n=Count('id')).values('n')
+    actual = Coalesce(Subquery(visible), 0)
+    wrong = Post.objects.annotate(actual=actual).exclude(
+        comment_count=F('actual'))
+    if dry_run:
+        return wrong.count()
+    return wrong.update(comment_count=actual)
+
+
+def _batches(queryset, batch_size):
+    # id выбираются заранее: пачки меняют ту же таблицу
+    rows = list(queryset.order_by('pk').values_list(
+        'pk', 'post_id', 'author_id', 'is_hidden'))
+    for start in range(0, len(rows), batch_size):
+        yield rows[start:start + batch_size]
+
+
+def _set_hidden(queryset, hidden, batch_size):
+    total = 0
+    for batch in _batches(
+            queryset.filter(is_hidden=not hidden), batch_size):
+        ids = [pk for pk, _, _, _ in batch]
+        with transaction.atomic():
+            Comment.objects.filter(pk__in=ids).update(is_hidden=hidden)
+            posts = Counter(post_id for _, post_id, _, _ in batch)
+            shift = -1 if hidden else 1
+            shift_counts(
+                {post_id: shift * n for post_id, n in posts.items()})
+            if hidden:
+                search.remove_comments(ids)
+            else:
+                search.index_comments(Comment.objects.filter(pk__in=ids))
+        invalidation.invalidate(
+            ('comments',), *(('post', post_id) for post_id in posts))
+        total += len(ids)
+    return total
+
+
+def hide(queryset, batch_size=BATCH_SIZE):
+    """Скрывает комментарии; возвращает число скрытых."""
+    return _set_hidden(queryset, True, batch_size)
+
+
+def unhide(queryset, batch_size=BATCH_SIZE):
+    return _set_hidden(queryset, False, batch_size)
+
+
+def delete(queryset, batch_size=BATCH_SIZE):
+    """Удаляет комментарии пачками DELETE; возвращает число удалённых."""
+    table = connection.ops.quote_name(Comment._meta.db_table)
+    total = 0
+    for batch in _batches(queryset, batch_size):
+        ids = [pk for pk, _, _, _ in batch]
+        posts = Counter(
+            post_id for _, post_id, _, hidden in batch if not hidden)
+        authors = Counter(author_id for _, _, author_id, _ in batch)
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'DELETE FROM {table} WHERE id IN '
+                    f'({", ".join(["%s"] * len(ids))})', ids)
+            shift_counts({post_id: -n for post_id, n in posts.items()})
+            stats.change_many('comments', {
+                author_id: -n for author_id, n in authors.items()})
+            search.remove_comments(ids)
+        invalidation.invalidate(
+            ('comments',),
+            *dict.fromkeys(('post', post_id) for _, post_id, _, _ in batch),
+            *(('counters', author_id) for author_id in authors),
+        )
+        total += len(ids)
+    return total
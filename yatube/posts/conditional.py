@@ -0,0 +1,64 @@
+"""Условные GET для лент и страницы поста.
+
+ETag - хеш поколений артефактов страницы (posts.caching), пути с
+курсором, зрителя и его CSRF-cookie; Last-Modified - время последнего
+сдвига этих поколений. Валидаторы читаются из кеша, поэтому 304
+отдаётся до запросов к лентам и рендеринга шаблона. Те же артефакты
+уходят в заголовок Surrogate-Key для кеша страниц (core.page_cache).
+"""
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.conf import settings
+from django.views.decorators.http import condition
+
+from . import caching
+
+
+def validators(request, page_tags, *args, **kwargs):
+    """(ETag, Last-Modified) страницы; считаются один раз на запрос."""
+    if not hasattr(request, '_validators'):
+        request._validators = None, None
+        tags = request._page_tags = page_tags(request, *args, **kwargs)
+        if tags is not None:
+            generations, mtime = caching.versions(*tags)
+            viewer = (request.user.pk if request.user.is_authenticated
+                      else 'anon')
+            parts = [
+                *map(str, generations),
+                request.get_full_path(),
+                str(viewer),
+                # в формах страницы лежит CSRF-токен
+                request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+            ]
+            etag = hashlib.md5('|'.join(parts).encode()).hexdigest()
+            request._validators = (
+                etag, datetime.fromtimestamp(mtime, tz=timezone.utc))
+    return request._validators
+
+
+def conditional(page_tags):
+    """Декоратор view: 304 по артефактам, которые вернёт page_tags.
+
+    page_tags(request, *args, **kwargs) перечисляет артефакты страницы
+    или возвращает None, если валидаторов нет (например, объекта нет).
+    """
+    def etag(request, *args, **kwargs):
+        return validators(request, page_tags, *args, **kwargs)[0]
+
+    def last_modified(request, *args, **kwargs):
+        return validators(request, page_tags, *args, **kwargs)[1]
+
+    def decorator(view):
+        @wraps(view)
+        def tagged(request, *args, **kwargs):
+            response = view(request, *args, **kwargs)
+            tags = getattr(request, '_page_tags', None)
+            if tags:
+                response[caching.SURROGATE_HEADER] = caching.surrogate_keys(
+                    tags)
+            return response
+        return condition(
+            etag_func=etag, last_modified_func=last_modified)(tagged)
+    return decorator
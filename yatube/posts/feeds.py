@@ -0,0 +1,362 @@
+"""Лента подписок: раскладка при записи и чтение при показе.
+
+Посты обычных авторов раскладываются по лентам всех подписчиков (push):
+подписка дозаполняет ленту постами автора, отписка их вычищает, а
+чтение сводится к диапазонному просмотру индекса (user, created, post).
+
+Автор, у которого подписчиков не меньше FEED_PULL_THRESHOLD, переводится
+в режим pull (UserStats.pull_feed, см. rebalance): его посты в ленты не
+пишутся, а при показе берутся из закешированного списка его последних
+постов и сливаются с материализованной частью ленты через heapq.merge
+по (created, id). Обратно в push автор возвращается, когда подписчиков
+становится меньше половины порога, чтобы режим не дребезжал.
+"""
+import heapq
+from collections import namedtuple
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F, Q, Window, prefetch_related_objects
+from django.db.models.functions import RowNumber
+
+from . import graph
+from .models import FeedEntry, Follow, Post, UserStats
+from .utils import CursorPaginator
+
+PULL_AUTHORS_KEY = 'feed-pull-authors'
+RECENT_PREFIX = 'feed-recent'
+# подписок на один запрос последних постов при пересборке лент
+BATCH_SIZE = 1000
+# запись ленты pull-автора; поля как у FeedEntry, чтобы сливать их вместе
+PulledEntry = namedtuple('PulledEntry', 'created post_id author_id')
+
+
+def pull_authors():
+    """Множество id авторов в режиме pull; хранится в кеше."""
+    ids = cache.get(PULL_AUTHORS_KEY)
+    if ids is None:
+        ids = frozenset(UserStats.objects.filter(
+            pull_feed=True).values_list('user_id', flat=True))
+        cache.set(PULL_AUTHORS_KEY, ids, timeout=None)
+    return ids
+
+
+def is_pull(author_id):
+    return author_id in pull_authors()
+
+
+def followed_pull_authors(user_id):
+    """Авторы в режиме pull, на которых подписан читатель."""
+    authors = pull_authors()
+    if not authors:
+        return []
+    following = graph.following(user_id)
+    return sorted(
+        author_id for author_id in authors
+        if graph.contains(following, author_id))
+
+
+def recent_key(author_id):
+    return f'{RECENT_PREFIX}:{author_id}'
+
+
+def recent_posts(author_ids):
+    """{автор: [(created, id), ...]} последних постов, новые первыми.
+
+    Списки лежат в кеше и сбрасываются при новом или удалённом посте
+    автора; в каждом не больше FEED_BACKFILL_LIMIT постов. Списки всех
+    отсутствующих в кеше авторов читаются одним запросом.
+    """
+    keys = {author_id: recent_key(author_id) for author_id in author_ids}
+    cached = cache.get_many(list(keys.values()))
+    result = {}
+    missing = []
+    for author_id, key in keys.items():
+        if key in cached:
+            result[author_id] = cached[key]
+        else:
+            missing.append(author_id)
+    if missing:
+        loaded = _load_recent(missing, settings.FEED_BACKFILL_LIMIT)
+        cache.set_many(
+            {keys[author_id]: rows for author_id, rows in loaded.items()},
+            timeout=None)
+        result.update(loaded)
+    return result
+
+
+def _load_recent(author_ids, limit):
+    """Последние limit постов каждого автора: ROW_NUMBER() по автору."""
+    ranked = Post.objects.filter(author_id__in=author_ids).annotate(
+        place=Window(
+            RowNumber(),
+            partition_by=[F('author_id')],
+            order_by=[F('created').desc(), F('id').desc()],
+        ),
+    ).values('author_id', 'created', 'id', 'place')
+    # окно нельзя фильтровать в том же запросе: оно уходит в подзапрос
+    sql, params = ranked.query.sql_with_params()
+    table = connection.ops.quote_name(Post._meta.db_table)
+    rows = Post.objects.extra(
+        where=[f'{table}.id IN (SELECT id FROM ({sql}) ranked '
+               'WHERE place <= %s)'],
+        params=[*params, limit],
+    ).order_by('-created', '-id').values_list('author_id', 'created', 'id')
+    result = {author_id: [] for author_id in author_ids}
+    for author_id, created, post_id in rows:
+        result[author_id].append((created, post_id))
+    return result
+
+
+def forget_recent(author_id):
+    cache.delete(recent_key(author_id))
+
+
+def _bulk_insert(entries):
+    # размер пачки выбирает бэкенд: SQLite не примет больше 500 строк
+    FeedEntry.objects.bulk_create(entries, ignore_conflicts=True)
+
+
+def fan_out(post):
+    """Кладёт пост в ленты всех подписчиков автора (в режиме push)."""
+    if is_pull(post.author_id):
+        forget_recent(post.author_id)
+        return
+    follower_ids = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    _bulk_insert(
+        FeedEntry(
+            user_id=user_id,
+            post_id=post.id,
+            author_id=post.author_id,
+            created=post.created,
+        )
+        for user_id in follower_ids.iterator()
+    )
+
+
+def backfill(user_id, author_id, limit=None):
+    """Дозаполняет ленту читателя последними постами автора."""
+    if is_pull(author_id):
+        return
+    if limit is None:
+        limit = settings.FEED_BACKFILL_LIMIT
+    posts = Post.objects.filter(author_id=author_id).order_by(
+        '-created', '-id'
+    ).values_list('id', 'created')[:limit]
+    _bulk_insert(
+        FeedEntry(
+            user_id=user_id,
+            post_id=post_id,
+            author_id=author_id,
+            created=created,
+        )
+        for post_id, created in posts
+    )
+
+
+def backfill_many(pairs, limit=None):
+    """backfill() для многих подписок (читатель, автор) сразу.
+
+    Последние посты всех авторов читаются одним запросом, записи лент
+    вставляются пачками.
+    """
+    if limit is None:
+        limit = settings.FEED_BACKFILL_LIMIT
+    pull = pull_authors()
+    pairs = [(user_id, author_id) for user_id, author_id in pairs
+             if author_id not in pull]
+    if not pairs or not limit:
+        return
+    recent = _load_recent({author_id for _, author_id in pairs}, limit)
+    _bulk_insert(
+        FeedEntry(
+            user_id=user_id,
+            post_id=post_id,
+            author_id=author_id,
+            created=created,
+        )
+        for user_id, author_id in pairs
+        for created, post_id in recent[author_id]
+    )
+
+
+def _backfill_stream(follows, limit=None, batch_size=BATCH_SIZE):
+    """backfill_many() по пачкам пар из queryset; число подписок."""
+    pairs = follows.values_list('user_id', 'author_id').iterator(
+        chunk_size=batch_size)
+    total = 0
+    while True:
+        batch = list(islice(pairs, batch_size))
+        if not batch:
+            return total
+        backfill_many(batch, limit=limit)
+        total += len(batch)
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты читателя все посты автора."""
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def rebuild(limit=None):
+    """Пересобирает все ленты с нуля; возвращает число подписок."""
+    with transaction.atomic():
+        FeedEntry.objects.all().delete()
+        return _backfill_stream(Follow.objects.all(), limit=limit)
+
+
+def rebalance(threshold=None):
+    """Переводит авторов между push и pull по числу подписчиков.
+
+    Новым pull-авторам ленты вычищаются, вернувшимся в push -
+    дозаполняются. Возвращает (число переведённых в pull, в push).
+    threshold=None берёт FEED_PULL_THRESHOLD; если и он None, все
+    авторы возвращаются в push.
+    """
+    if threshold is None:
+        threshold = settings.FEED_PULL_THRESHOLD
+    stats = UserStats.objects.all()
+    if threshold is None:
+        to_pull = []
+        to_push = list(stats.filter(pull_feed=True).values_list(
+            'user_id', flat=True))
+    else:
+        to_pull = list(stats.filter(
+            pull_feed=False, followers__gte=threshold,
+        ).values_list('user_id', flat=True))
+        to_push = list(stats.filter(
+            pull_feed=True, followers__lt=threshold // 2,
+        ).values_list('user_id', flat=True))
+    with transaction.atomic():
+        UserStats.objects.filter(user_id__in=to_pull).update(pull_feed=True)
+        FeedEntry.objects.filter(author_id__in=to_pull).delete()
+        UserStats.objects.filter(user_id__in=to_push).update(
+            pull_feed=False)
+        cache.delete(PULL_AUTHORS_KEY)
+        _backfill_stream(Follow.objects.filter(author_id__in=to_push))
+    for author_id in to_pull + to_push:
+        forget_recent(author_id)
+    return len(to_pull), len(to_push)
+
+
+def timeline(user):
+    """Материализованная часть ленты читателя: queryset FeedEntry."""
+    return FeedEntry.objects.filter(user=user).select_related(
+        'post__author', 'post__group')
+
+
+def entries_to_posts(entries):
+    """Посты записей ленты: материализованные уже выбраны, остальные -
+    одним запросом; теги всех постов - ещё одним."""
+    pulled = [entry.post_id for entry in entries
+              if isinstance(entry, PulledEntry)]
+    found = Post.objects.select_related('author', 'group').in_bulk(
+        pulled) if pulled else {}
+    posts = [
+        found.get(entry.post_id) if isinstance(entry, PulledEntry)
+        else entry.post
+        for entry in entries
+    ]
+    posts = [post for post in posts if post is not None]
+    prefetch_related_objects(posts, 'tag')
+    return posts
+
+
+def _sort_key(entry):
+    return entry.created, entry.post_id
+
+
+class FeedPaginator(CursorPaginator):
+    """Курсорные страницы ленты подписок с постами pull-авторов.
+
+    Материализованная часть выбирается обычным keyset-запросом, списки
+    pull-авторов режутся по тому же курсору, и все кандидаты сливаются
+    heapq.merge; повторы (пост, оставшийся в ленте после перевода
+    автора в pull) отбрасываются.
+    """
+
+    def __init__(self, user, per_page, **kwargs):
+        super().__init__(
+            timeline(user), per_page, keys=('created', 'post_id'),
+            transform=entries_to_posts, **kwargs)
+        self.pull = followed_pull_authors(user.pk)
+
+    def fetch(self, position):
+        if not self.pull:
+            return super().fetch(position)
+        direction = self.NEXT if position is None else position[1]
+        newer = direction == self.PREVIOUS
+        bound = None if position is None else tuple(position[0])
+        candidates = [list(self.queryset(position))]
+        fallback = {}
+        for author_id, recent in recent_posts(self.pull).items():
+            rows, missing = self.pulled(recent, bound, newer)
+            candidates.append([
+                PulledEntry(created, post_id, author_id)
+                for created, post_id in rows])
+            if missing is not False:
+                fallback[author_id] = missing
+        if fallback:
+            candidates.append(self.posts(fallback, newer))
+        merged = heapq.merge(*candidates, key=_sort_key, reverse=not newer)
+        rows, seen = [], set()
+        for entry in merged:
+            if entry.post_id in seen:
+                continue
+            seen.add(entry.post_id)
+            rows.append(entry)
+            if len(rows) > self.per_page:
+                break
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if newer:
+            rows.reverse()
+        return rows, has_more, direction
+
+    def pulled(self, recent, bound, newer):
+        """Кандидаты автора из списка и граница для чтения из БД.
+
+        Возвращает ([(created, id)] в порядке слияния, позицию, за которой
+        читать остальное из БД, или False, если списка хватило).
+        """
+        wanted = self.per_page + 1
+        # список неполный - в нём все посты автора; иначе за его
+        # последним постом (и рядом с курсором за ним) читаем из БД
+        complete = len(recent) < settings.FEED_BACKFILL_LIMIT
+        if newer:
+            if not complete and (not recent or bound < recent[-1]):
+                return [], bound
+            # новее курсора; нужны ближайшие к нему, по возрастанию
+            return [row for row in recent if row > bound][::-1][:wanted], False
+        rows = [row for row in recent
+                if bound is None or row < bound][:wanted]
+        if len(rows) < wanted and not complete:
+            return rows, rows[-1] if rows else bound
+        return rows, False
+
+    def posts(self, bounds, newer=False):
+        """Записи pull-авторов за их границами, одним запросом из БД.
+
+        bounds - {автор: (created, id) или None}. Слиянию нужно не больше
+        страницы, поэтому общий LIMIT один на всех авторов.
+        """
+        condition = Q()
+        for author_id, bound in bounds.items():
+            part = Q(author_id=author_id)
+            if bound is not None:
+                created, post_id = bound
+                if newer:
+                    part &= Q(created__gt=created) | Q(
+                        created=created, id__gt=post_id)
+                else:
+                    part &= Q(created__lt=created) | Q(
+                        created=created, id__lt=post_id)
+            condition |= part
+        order = ('created', 'id') if newer else ('-created', '-id')
+        rows = Post.objects.filter(condition).order_by(*order).values_list(
+            'created', 'id', 'author_id')[:self.per_page + 1]
+        return [PulledEntry(*row) for row in rows]
@@ -0,0 +1,178 @@
+"""Подписки: одна инструкция на подписку и отписку, пачки для импорта.
+
+follow и unfollow выполняют один INSERT ... SELECT ... ON CONFLICT DO
+NOTHING или DELETE с RETURNING: гонка с unique_author_user_following
+невозможна, а неизвестное имя просто ничего не меняет. Сигналы
+post_save/post_delete (ленты, счётчики, кеш) отправляются вручную по
+возвращённым строкам. Где RETURNING нет, работает обычный путь через
+ORM.
+
+bulk_follow пишет тысячи подписок пачками INSERT ... ON CONFLICT DO
+NOTHING RETURNING и применяет последствия (ленты, счётчики, граф в кеше)
+сразу ко всей пачке и только для строк, которые вставились на деле.
+"""
+import sqlite3
+from collections import Counter
+from itertools import islice
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models.signals import post_delete, post_save
+
+from . import feeds, graph, invalidation, stats
+from .models import Follow, User
+
+BATCH_SIZE = 1000
+
+
+def supports_returning():
+    if connection.vendor == 'postgresql':
+        return True
+    return (connection.vendor == 'sqlite'
+            and sqlite3.sqlite_version_info >= (3, 35))
+
+
+def _tables():
+    quote = connection.ops.quote_name
+    return quote(Follow._meta.db_table), quote(User._meta.db_table)
+
+
+def _send(signal, user_id, rows, **kwargs):
+    follows = [
+        Follow(id=follow_id, user_id=user_id, author_id=author_id)
+        for follow_id, author_id in rows
+    ]
+    for follow in follows:
+        signal.send(sender=Follow, instance=follow, using=connection.alias,
+                    **kwargs)
+    return follows[0] if follows else None
+
+
+@transaction.atomic
+def follow(user, username):
+    """Подписывает user на автора username; Follow, если она новая."""
+    if not supports_returning():
+        author = User.objects.filter(username=username).exclude(
+            pk=user.pk).first()
+        if author is None:
+            return None
+        follow, created = Follow.objects.get_or_create(
+            user=user, author=author)
+        return follow if created else None
+    follows, users = _tables()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {follows} (user_id, author_id) '
+            f'SELECT %s, id FROM {users} WHERE username = %s AND id <> %s '
+            'ON CONFLICT DO NOTHING RETURNING id, author_id',
+            [user.pk, username, user.pk],
+        )
+        rows = cursor.fetchall()
+    return _send(post_save, user.pk, rows, created=True, raw=False,
+                 update_fields=None)
+
+
+@transaction.atomic
+def unfollow(user, username):
+    """Отписывает user от автора username; удалённая Follow или None."""
+    if not supports_returning():
+        follow = Follow.objects.filter(
+            user=user, author__username=username).first()
+        if follow is not None:
+            follow.delete()
+        return follow
+    follows, users = _tables()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {follows} WHERE user_id = %s AND author_id = '
+            f'(SELECT id FROM {users} WHERE username = %s) '
+            'RETURNING id, author_id',
+            [user.pk, username],
+        )
+        rows = cursor.fetchall()
+    return _send(post_delete, user.pk, rows)
+
+
+def resolve_usernames(usernames):
+    """{имя: id} одним запросом IN; неизвестные имена пропускаются."""
+    return dict(User.objects.filter(
+        username__in=set(usernames)).values_list('username', 'id'))
+
+
+def _insert(pairs):
+    """Вставляет подписки; возвращает пары, которые вставились на деле.
+
+    С RETURNING - один INSERT ... ON CONFLICT DO NOTHING на пачку, какие
+    пары уже были, решает сама таблица. Без него - по строке в своей
+    точке сохранения.
+    """
+    if not supports_returning():
+        created = []
+        for user_id, author_id in pairs:
+            try:
+                with transaction.atomic():
+                    Follow.objects.bulk_create(
+                        [Follow(user_id=user_id, author_id=author_id)])
+            except IntegrityError:
+                continue
+            created.append((user_id, author_id))
+        return created
+    follows, _ = _tables()
+    size = connection.ops.bulk_batch_size(
+        ['user_id', 'author_id'], pairs) or len(pairs)
+    created = []
+    with connection.cursor() as cursor:
+        for start in range(0, len(pairs), size):
+            chunk = pairs[start:start + size]
+            cursor.execute(
+                f'INSERT INTO {follows} (user_id, author_id) VALUES '
+                + ', '.join(['(%s, %s)'] * len(chunk))
+                + ' ON CONFLICT DO NOTHING RETURNING user_id, author_id',
+                [value for pair in chunk for value in pair],
+            )
+            created.extend(map(tuple, cursor.fetchall()))
+    return created
+
+
+def _apply(pairs):
+    """Ленты, счётчики и кеш для новых подписок пачки."""
+    following = Counter(user_id for user_id, _ in pairs)
+    followers = Counter(author_id for _, author_id in pairs)
+    stats.change_many('following', following)
+    stats.change_many('followers', followers)
+    feeds.backfill_many(pairs)
+    graph.update(added=pairs)
+    invalidation.invalidate(
+        *(('follow', user_id) for user_id in following),
+        *(('counters', user_id) for user_id in following),
+        *(('counters', author_id) for author_id in followers),
+    )
+
+
+def bulk_follow(pairs, batch_size=BATCH_SIZE):
+    """Создаёт подписки из пар (id читателя, id автора) пачками.
+
+    Подписки на себя и уже существующие пропускаются. Возвращает число
+    созданных подписок.
+    """
+    pairs = ((user_id, author_id) for user_id, author_id in pairs
+             if user_id != author_id)
+    created = 0
+    while True:
+        batch = list(dict.fromkeys(islice(pairs, batch_size)))
+        if not batch:
+            return created
+        with transaction.atomic():
+            new = _insert(batch)
+            _apply(new)
+        created += len(new)
+
+
+def follow_many(user, usernames, batch_size=BATCH_SIZE):
+    """Подписывает user на всех авторов из списка имён."""
+    usernames = list(usernames)
+    author_ids = []
+    for start in range(0, len(usernames), batch_size):
+        author_ids.extend(resolve_usernames(
+            usernames[start:start + batch_size]).values())
+    return bulk_follow(
+        ((user.pk, author_id) for author_id in author_ids), batch_size)
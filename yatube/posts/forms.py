@@ -1,8 +1,50 @@
 from django import forms
+
+from django.core.files.uploadedfile import UploadedFile
+
+from . import tasks, thumbnails, uploads
 from .models import Post, Comment
 
 
 class PostForm(forms.ModelForm):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.oversize_image = None
+        image = self.files.get('image')
+        if getattr(image, 'oversize', False):
+            # обрезанный файл не должен доходить до проверки Pillow
+            self.files = self.files.copy()
+            del self.files['image']
+            self.oversize_image = image
+
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if self.oversize_image is not None:
+            raise forms.ValidationError(uploads.check(self.oversize_image))
+        if not isinstance(image, UploadedFile):
+            return image
+        error = uploads.check(image)
+        if error:
+            raise forms.ValidationError(error)
+        image = uploads.downsample(image)
+        author_id = self.instance.author_id
+        if author_id and image.size > uploads.quota_left(author_id):
+            raise forms.ValidationError(
+                'Превышен суточный лимит загрузки картинок')
+        return image
+
+    def save(self, commit=True):
+        image_changed = 'image' in self.changed_data
+        if image_changed:
+            # файлы копий общие для одинаковых картинок, их чистит prune
+            self.instance.image_card = ''
+            self.instance.image_renditions = ''
+        post = super().save(commit)
+        if commit and image_changed and post.image:
+            uploads.charge(post.author_id, post.image.size)
+            tasks.enqueue(thumbnails.build_renditions, post.pk)
+        return post
+
     class Meta:
         model = Post
         fields = ('text', 'group', 'image',)
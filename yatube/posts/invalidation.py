@@ -0,0 +1,116 @@
+"""Инвалидация кеша по событиям моделей.
+
+Для каждой модели зарегистрирована функция, которая по изменённому
+объекту перечисляет затронутые артефакты (ленты, страницы поста,
+счётчики). На post_save/post_delete их поколения сдвигаются через
+posts.caching.bump, поэтому закешированное по старым поколениям больше
+не читается.
+
+Артефакты:
+    ('index',)               главная лента
+    ('group', slug)          лента группы
+    ('profile', author_id)   лента автора
+    ('follow', user_id)      подписки читателя (состав его ленты)
+    ('author', author_id)    посты автора в лентах его подписчиков
+    ('tag', tag_id)          лента тега
+    ('post', post_id)        страница поста с комментариями
+    ('comments',)            любой комментарий (comment_count в API)
+    ('counters', user_id)    счётчики пользователя
+"""
+from django.db.models.signals import post_delete, post_init, post_save
+
+from . import caching
+from .models import Comment, Follow, Group, Post, TagPost
+
+_resolvers = {}
+
+
+def register(model):
+    """Декоратор: регистрирует функцию, перечисляющую артефакты модели."""
+    def decorator(resolver):
+        _resolvers[model] = resolver
+        post_save.connect(
+            _on_change, sender=model, dispatch_uid=f'invalidate-{model}')
+        post_delete.connect(
+            _on_change, sender=model, dispatch_uid=f'invalidate-{model}')
+        return resolver
+    return decorator
+
+
+def tags_for(instance):
+    resolver = _resolvers.get(type(instance))
+    if resolver is None:
+        return []
+    return list(dict.fromkeys(resolver(instance)))
+
+
+def invalidate(*tags):
+    caching.bump(*tags)
+
+
+def _on_change(sender, instance, **kwargs):
+    invalidate(*tags_for(instance))
+
+
+def _remember_group(sender, instance, **kwargs):
+    instance._loaded_group_id = instance.group_id
+
+
+post_init.connect(_remember_group, sender=Post)
+
+
+def post_feed_tags(post):
+    """Все ленты, в которых показывается пост."""
+    yield ('index',)
+    yield ('profile', post.author_id)
+    group_ids = {post.group_id, getattr(post, '_loaded_group_id', None)}
+    group_ids.discard(None)
+    if group_ids:
+        slugs = Group.objects.filter(
+            id__in=group_ids).values_list('slug', flat=True)
+        for slug in slugs:
+            yield ('group', slug)
+    # ленты подписок зависят от поколений своих авторов: один сдвиг
+    # вместо сдвига на каждого подписчика
+    yield ('author', post.author_id)
+    if post.pk is not None:
+        tag_ids = TagPost.objects.filter(post_id=post.pk).values_list(
+            'tag_id', flat=True)
+        for tag_id in tag_ids:
+            yield ('tag', tag_id)
+
+
+@register(Post)
+def post_tags(post):
+    yield from post_feed_tags(post)
+    yield ('post', post.pk)
+    yield ('counters', post.author_id)
+    post._loaded_group_id = post.group_id
+
+
+@register(Group)
+def group_tags(group):
+    yield ('group', group.slug)
+
+
+@register(Comment)
+def comment_tags(comment):
+    yield ('post', comment.post_id)
+    yield ('comments',)
+    yield ('counters', comment.author_id)
+
+
+@register(Follow)
+def follow_tags(follow):
+    yield ('follow', follow.user_id)
+    yield ('counters', follow.user_id)
+    yield ('counters', follow.author_id)
+
+
+@register(TagPost)
+def tagpost_tags(tagpost):
+    yield ('post', tagpost.post_id)
+    yield ('tag', tagpost.tag_id)
+    post = Post.objects.filter(pk=tagpost.post_id).first()
+    if post is not None:
+        yield from post_feed_tags(post)
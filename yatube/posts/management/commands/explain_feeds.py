@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import query_plans
+
+
+class Command(BaseCommand):
+    help = 'Проверяет через EXPLAIN, что ленты читаются по индексам'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verbose-plans', action='store_true',
+            help='печатать планы всех запросов, а не только плохих',
+        )
+
+    def handle(self, *args, **options):
+        failed = []
+        for name, (plan, problems) in query_plans.check().items():
+            if problems:
+                failed.append(name)
+                self.stdout.write(self.style.ERROR(name))
+            elif options['verbose_plans']:
+                self.stdout.write(self.style.SUCCESS(name))
+            else:
+                continue
+            self.stdout.write(plan)
+        if failed:
+            raise CommandError(
+                'Полный просмотр или сортировка в: ' + ', '.join(failed))
+        self.stdout.write(self.style.SUCCESS('Все ленты читаются по индексам'))
@@ -0,0 +1,56 @@
+import csv
+import sys
+
+from django.core.management.base import BaseCommand
+
+from posts import follows
+
+
+class Command(BaseCommand):
+    help = ('Импортирует подписки из CSV со строками "читатель,автор" '
+            '(имена пользователей) пачками bulk_create')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='CSV-файл; "-" или без аргумента - stdin',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=follows.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if options['path'] == '-':
+            created, skipped = self.import_rows(
+                csv.reader(sys.stdin), batch_size)
+        else:
+            with open(options['path'], newline='') as source:
+                created, skipped = self.import_rows(
+                    csv.reader(source), batch_size)
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано подписок: {created}, пропущено строк: {skipped}'))
+
+    def import_rows(self, rows, batch_size):
+        created = skipped = 0
+        batch = []
+        for row in rows:
+            if len(row) < 2:
+                skipped += 1
+                continue
+            batch.append((row[0].strip(), row[1].strip()))
+            if len(batch) >= batch_size:
+                created, skipped = self.flush(batch, created, skipped)
+        if batch:
+            created, skipped = self.flush(batch, created, skipped)
+        return created, skipped
+
+    def flush(self, batch, created, skipped):
+        """Имена пачки - одним запросом IN, подписки - bulk_follow."""
+        ids = follows.resolve_usernames(
+            name for pair in batch for name in pair)
+        pairs = [(ids[user], ids[author]) for user, author in batch
+                 if user in ids and author in ids]
+        skipped += len(batch) - len(pairs)
+        created += follows.bulk_follow(pairs, len(batch))
+        batch.clear()
+        return created, skipped
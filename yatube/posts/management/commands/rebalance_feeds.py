@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from posts import feeds
+
+
+class Command(BaseCommand):
+    help = ('Переводит авторов между раскладкой постов по лентам (push) и '
+            'чтением при показе (pull) по числу подписчиков')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threshold', type=int, default=None,
+            help='порог подписчиков; по умолчанию FEED_PULL_THRESHOLD',
+        )
+
+    def handle(self, *args, **options):
+        to_pull, to_push = feeds.rebalance(options['threshold'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Переведено в pull: {to_pull}, в push: {to_push}'))
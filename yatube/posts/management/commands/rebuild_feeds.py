@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from posts import feeds
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает материализованные ленты подписок с нуля'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit', type=int, default=None,
+            help='сколько последних постов автора класть в каждую ленту',
+        )
+
+    def handle(self, *args, **options):
+        total = feeds.rebuild(limit=options['limit'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Пересобрано лент по {total} подпискам')
+        )
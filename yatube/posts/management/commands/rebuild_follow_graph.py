@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts import graph
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает граф подписок в кеше из таблицы Follow'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        total = graph.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'В граф загружено подписок: {total}')
+        )
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from posts import comments, stats
+
+
+class Command(BaseCommand):
+    help = ('Сверяет счётчики UserStats и Post.comment_count с таблицами и '
+            'чинит расхождения')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='только посчитать расхождения, ничего не записывая',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        fixed = stats.reconcile(
+            dry_run=options['dry_run'], batch_size=options['batch_size'])
+        posts = comments.recount(dry_run=options['dry_run'])
+        verb = 'Найдено' if options['dry_run'] else 'Исправлено'
+        self.stdout.write(self.style.SUCCESS(f'{verb} строк: {fixed}'))
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} счётчиков комментариев: {posts}'))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Параллельно пересобирает копии картинок всех постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='число потоков; по умолчанию по числу ядер',
+        )
+        parser.add_argument(
+            '--missing-only', action='store_true',
+            help='только посты, у которых карточки ещё нет',
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='перерезать даже уже существующие файлы',
+        )
+        parser.add_argument(
+            '--prune', action='store_true',
+            help='удалить копии, на которые не ссылается ни один пост',
+        )
+
+    def handle(self, *args, **options):
+        built = thumbnails.regenerate(
+            workers=options['workers'],
+            missing_only=options['missing_only'],
+            force=options['force'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'Готово постов: {built}'))
+        if options['prune']:
+            removed = thumbnails.prune()
+            self.stdout.write(self.style.SUCCESS(f'Удалено файлов: {removed}'))
@@ -0,0 +1,168 @@
+import io
+import json
+import random
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from PIL import Image
+
+from posts import comments, feeds, search, stats, thumbnails
+from posts.models import (
+    Comment, Follow, Group, Post, Tag, TagPost, User)
+
+SCALES = {
+    # posts: (users, groups, follows, comments, tags)
+    '10k': (10_000, (1_000, 20, 10_000, 20_000, 200)),
+    '100k': (100_000, (10_000, 100, 100_000, 200_000, 1_000)),
+    '1m': (1_000_000, (50_000, 500, 1_000_000, 2_000_000, 5_000)),
+}
+CHUNK_SIZE = 5000
+SEED_PREFIX = 'seed_'
+
+
+class Command(BaseCommand):
+    help = 'Заполняет базу синтетическими данными для бенчмарков'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=SCALES, default=None)
+        parser.add_argument('--posts', type=int, default=1000)
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--groups', type=int, default=10)
+        parser.add_argument('--follows', type=int, default=1000)
+        parser.add_argument('--comments', type=int, default=2000)
+        parser.add_argument('--tags', type=int, default=50)
+        parser.add_argument(
+            '--images', type=float, default=0.2,
+            help='доля постов с картинкой',
+        )
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        if options['scale']:
+            posts, rest = SCALES[options['scale']]
+            options['posts'] = posts
+            (options['users'], options['groups'], options['follows'],
+             options['comments'], options['tags']) = rest
+        self.random = random.Random(options['seed'])
+        with transaction.atomic():
+            users = self.seed_users(options['users'])
+            groups = self.seed_groups(options['groups'])
+            posts = self.seed_posts(
+                options['posts'], users, groups, options['images'])
+            self.seed_follows(options['follows'], users)
+            self.seed_comments(options['comments'], users, list(posts))
+            self.seed_tags(options['tags'], posts)
+        # массовые вставки обходят сигналы: пересобираем производные данные.
+        # Счётчики подписчиков нужны rebalance, чтобы популярные авторы
+        # стали pull-авторами до раскладки лент
+        stats.reconcile()
+        comments.recount()
+        feeds.rebalance()
+        feeds.rebuild()
+        search.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            'Создано: {users} пользователей, {posts} постов, '
+            '{follows} подписок, {comments} комментариев'.format(**options)
+        ))
+
+    def bulk(self, model, objects):
+        # генератор режется на куски, чтобы 1M объектов не жили в памяти
+        objects = iter(objects)
+        while True:
+            chunk = list(islice(objects, CHUNK_SIZE))
+            if not chunk:
+                break
+            model.objects.bulk_create(chunk, ignore_conflicts=True)
+
+    def seed_users(self, count):
+        start = User.objects.count()
+        password = make_password('benchmark')
+        self.bulk(User, (
+            User(username=f'{SEED_PREFIX}{start + number}', password=password)
+            for number in range(count)
+        ))
+        return list(User.objects.filter(
+            username__startswith=SEED_PREFIX).values_list('id', flat=True))
+
+    def seed_groups(self, count):
+        self.bulk(Group, (
+            Group(
+                title=f'Группа {number}',
+                slug=f'{SEED_PREFIX}{number}',
+                description='Сгенерированная группа',
+            )
+            for number in range(count)
+        ))
+        return list(Group.objects.filter(
+            slug__startswith=SEED_PREFIX).values_list('id', flat=True))
+
+    def seed_image(self):
+        """Одна картинка и одни копии на все сгенерированные посты."""
+        buffer = io.BytesIO()
+        Image.new('RGB', (1200, 800), (120, 160, 200)).save(
+            buffer, 'JPEG', quality=80)
+        image = default_storage.save(
+            'posts/seed.jpg', ContentFile(buffer.getvalue()))
+        renditions = thumbnails.render(buffer.getvalue())
+        return {
+            'image': image,
+            'image_card': renditions['jpeg'][-1][1],
+            'image_renditions': json.dumps(renditions),
+        }
+
+    def seed_posts(self, count, users, groups, image_share):
+        image = self.seed_image() if image_share else {}
+        choice, rand = self.random.choice, self.random.random
+        words = ('пост', 'текст', 'новости', 'лента', 'автор', 'группа',
+                 'подписка', 'комментарий', 'картинка', 'день')
+        self.bulk(Post, (
+            Post(
+                author_id=choice(users),
+                group_id=choice(groups) if groups and rand() < 0.7 else None,
+                text=' '.join(self.random.choices(words, k=12)),
+                **(image if rand() < image_share else {}),
+            )
+            for _ in range(count)
+        ))
+        # {id: created}: дата поста копируется в связи с тегами
+        return dict(Post.objects.filter(
+            author_id__in=users).values_list('id', 'created'))
+
+    def seed_follows(self, count, users):
+        # популярность авторов распределена по Ципфу, как в живых сетях
+        authors = sorted(users)
+        weights = [1 / (rank + 1) for rank in range(len(authors))]
+        readers = self.random.choices(users, k=count)
+        chosen = self.random.choices(authors, weights=weights, k=count)
+        self.bulk(Follow, (
+            Follow(user_id=reader, author_id=author)
+            for reader, author in zip(readers, chosen) if reader != author
+        ))
+
+    def seed_comments(self, count, users, post_ids):
+        if not post_ids:
+            return
+        choice = self.random.choice
+        self.bulk(Comment, (
+            Comment(post_id=choice(post_ids), author_id=choice(users),
+                    text='Сгенерированный комментарий')
+            for _ in range(count)
+        ))
+
+    def seed_tags(self, count, posts):
+        self.bulk(Tag, (
+            Tag(name=f'{SEED_PREFIX}{number}') for number in range(count)))
+        tag_ids = list(Tag.objects.filter(
+            name__startswith=SEED_PREFIX).values_list('id', flat=True))
+        if not tag_ids:
+            return
+        self.bulk(TagPost, (
+            TagPost(tag_id=tag_id, post_id=post_id, created=created)
+            for post_id, created in posts.items()
+            for tag_id in self.random.sample(
+                tag_ids, k=min(len(tag_ids), self.random.randint(0, 3)))
+        ))
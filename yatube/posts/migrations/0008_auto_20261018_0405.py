@@ -0,0 +1,55 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0007_follow'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=32)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TagPost',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ],
+        ),
+        migrations.AlterModelOptions(
+            name='post',
+            options={'default_related_name': 'posts', 'ordering': ('-created', '-id'), 'verbose_name': 'пост', 'verbose_name_plural': 'Посты'},
+        ),
+        migrations.AlterField(
+            model_name='comment',
+            name='text',
+            field=models.TextField(help_text='Введите текст', verbose_name='комментарий'),
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_author_user_following'),
+        ),
+        migrations.AddField(
+            model_name='tagpost',
+            name='post',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='posts.Post'),
+        ),
+        migrations.AddField(
+            model_name='tagpost',
+            name='tag',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='posts.Tag'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='tag',
+            field=models.ManyToManyField(related_name='posts', through='posts.TagPost', to='posts.Tag'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:11
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_stats(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Post = apps.get_model('posts', 'Post')
+    Follow = apps.get_model('posts', 'Follow')
+    Comment = apps.get_model('posts', 'Comment')
+    UserStats = apps.get_model('posts', 'UserStats')
+    sources = (
+        ('posts', Post, 'author'),
+        ('followers', Follow, 'author'),
+        ('following', Follow, 'user'),
+        ('comments', Comment, 'author'),
+    )
+    values = {user_id: {} for user_id in User.objects.values_list(
+        'id', flat=True)}
+    for field, model, key in sources:
+        rows = model.objects.values(key).annotate(
+            n=models.Count('id')).order_by()
+        for row in rows:
+            values[row[key]][field] = row['n']
+    UserStats.objects.bulk_create(
+        (UserStats(user_id=user_id, **counters)
+         for user_id, counters in values.items()),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0009_feedentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('posts', models.PositiveIntegerField(default=0, verbose_name='постов')),
+                ('followers', models.PositiveIntegerField(default=0, verbose_name='подписчиков')),
+                ('following', models.PositiveIntegerField(default=0, verbose_name='подписок')),
+                ('comments', models.PositiveIntegerField(default=0, verbose_name='комментариев')),
+            ],
+            options={
+                'verbose_name': 'статистика пользователя',
+                'verbose_name_plural': 'Статистика пользователей',
+            },
+        ),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+    ]
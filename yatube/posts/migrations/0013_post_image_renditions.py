@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_post_image_card'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_renditions',
+            field=models.TextField(blank=True, editable=False, verbose_name='Копии картинки'),
+        ),
+    ]
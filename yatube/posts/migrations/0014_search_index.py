@@ -0,0 +1,27 @@
+from django.db import migrations
+
+
+def create_index(apps, schema_editor):
+    from posts import search
+    search.get_backend(schema_editor.connection).create_schema()
+    search.rebuild(
+        apps.get_model('posts', 'Post'),
+        apps.get_model('posts', 'Comment'),
+        db=schema_editor.connection,
+    )
+
+
+def drop_index(apps, schema_editor):
+    from posts import search
+    search.get_backend(schema_editor.connection).drop_schema()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_post_image_renditions'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def merge_tags(apps, schema_editor):
+    """Приводит имена к нормальной форме и сливает совпавшие теги."""
+    import re
+    Tag = apps.get_model('posts', 'Tag')
+    TagPost = apps.get_model('posts', 'TagPost')
+    max_length = Tag._meta.get_field('name').max_length
+    kept = {}
+    for tag in Tag.objects.order_by('id'):
+        name = re.sub(r'\s+', ' ', tag.name.strip().lstrip('#').strip())
+        name = name.lower()[:max_length]
+        if name not in kept:
+            kept[name] = tag
+            if tag.name != name:
+                tag.name = name
+                tag.save(update_fields=['name'])
+            continue
+        target = kept[name]
+        linked = set(TagPost.objects.filter(tag=target).values_list(
+            'post_id', flat=True))
+        links = TagPost.objects.filter(tag=tag)
+        links.filter(post_id__in=linked).delete()
+        links.update(tag=target)
+        tag.delete()
+    # повторные связи одного тега с одним постом
+    seen = set()
+    for link in TagPost.objects.order_by('id'):
+        if (link.tag_id, link.post_id) in seen:
+            link.delete()
+        seen.add((link.tag_id, link.post_id))
+
+
+def fill_created(apps, schema_editor):
+    TagPost = apps.get_model('posts', 'TagPost')
+    links = TagPost.objects.select_related('post')
+    for link in links.iterator():
+        link.created = link.post.created
+        link.save(update_fields=['created'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_tags, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='tagpost',
+            name='created',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_created, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='tag',
+            name='name',
+            field=models.CharField(max_length=32, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='tagpost',
+            name='tag',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='posts.Tag'),
+        ),
+        migrations.AddIndex(
+            model_name='tagpost',
+            index=models.Index(fields=['tag', '-created', '-post'], name='tagpost_tag_created_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='tagpost',
+            constraint=models.UniqueConstraint(fields=('tag', 'post'), name='unique_tag_post'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_tag_feeds'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='pull_feed',
+            field=models.BooleanField(default=False, verbose_name='лента по чтению'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:55
+
+from django.db import migrations, models
+
+
+def fill_comment_count(apps, schema_editor):
+    """Считает комментарии всех постов одним UPDATE с подзапросом."""
+    from django.db.models import Count, OuterRef, Subquery
+    from django.db.models.functions import Coalesce
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    counts = Comment.objects.filter(post=OuterRef('pk')).order_by().values(
+        'post').annotate(n=Count('id')).values('n')
+    Post.objects.update(comment_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_userstats_pull_feed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='is_hidden',
+            field=models.BooleanField(default=False, verbose_name='скрыт модератором'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Комментариев'),
+        ),
+        migrations.RunPython(fill_comment_count, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,27 @@
-from django.db import models
+import json
+
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
 
+class CountedModel(models.Model):
+    """Модель, запись которой сдвигает счётчики UserStats в сигналах.
+
+    post_save Django шлёт после своей транзакции save(), поэтому save()
+    обёрнут в общую: сдвиг счётчика фиксируется или откатывается вместе
+    с записью. post_delete и так приходит внутри транзакции удаления.
+    """
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+
 class Group(models.Model):
     title = models.CharField(
         max_length=200,
@@ -26,13 +44,19 @@ class Group(models.Model):
 
 
 class Tag(models.Model):
-    name = models.CharField(max_length=32)
+    # хранится в нормальной форме posts.tags.normalize
+    name = models.CharField(max_length=32, unique=True)
+
+    def save(self, *args, **kwargs):
+        from .tags import normalize
+        self.name = normalize(self.name)
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.name
 
 
-class Post(models.Model):
+class Post(CountedModel):
     text = models.TextField(
         verbose_name='Текст поста',
         help_text='Введите текст поста',
@@ -44,12 +68,15 @@ class Post(models.Model):
         on_delete=models.CASCADE,
         verbose_name='автор',
         related_name='posts',
+        # покрыт составным post_author_created_idx
+        db_index=False,
     )
     group = models.ForeignKey(
         Group,
         on_delete=models.SET_NULL,
         blank=True, null=True,
         related_name='posts',
+        db_index=False,
         verbose_name='Группа',
         help_text='Группа, к которой будет относиться пост'
     )
@@ -59,6 +86,25 @@ class Post(models.Model):
         blank=True,
         help_text='вы можете вставить картинку'
     )
+    # URL карточки 960x339 и JSON адаптивных копий {формат: [[ширина,
+    # URL], ...]}; их режет posts.thumbnails в фоне
+    image_card = models.CharField(
+        'Карточка картинки',
+        max_length=255,
+        blank=True,
+        editable=False,
+    )
+    image_renditions = models.TextField(
+        'Копии картинки',
+        blank=True,
+        editable=False,
+    )
+    # видимые комментарии; ведут posts.comments и сигналы
+    comment_count = models.PositiveIntegerField(
+        'Комментариев',
+        default=0,
+        editable=False,
+    )
     created = models.DateTimeField(
         'Дата создания',
         auto_now_add=True
@@ -69,7 +115,18 @@ class Post(models.Model):
     )
 
     class Meta:
-        ordering = ('-created',)
+        ordering = ('-created', '-id')
+        # индексы под ленты: фильтр по префиксу и порядок без сортировки
+        indexes = [
+            models.Index(
+                fields=['-created', '-id'], name='post_created_idx'),
+            models.Index(
+                fields=['group', '-created', '-id'],
+                name='post_group_created_idx'),
+            models.Index(
+                fields=['author', '-created', '-id'],
+                name='post_author_created_idx'),
+        ]
         default_related_name = 'posts'
         verbose_name = 'пост'
         verbose_name_plural = 'Посты'
@@ -77,13 +134,34 @@ class Post(models.Model):
     def __str__(self):
         return f'{self.text[:15]}'
 
+    def save(self, *args, **kwargs):
+        # правка поста не пишет comment_count: его сдвигают UPDATE из
+        # posts.comments, и устаревший экземпляр их бы затёр
+        if (not self._state.adding and kwargs.get('update_fields') is None
+                and not kwargs.get('force_insert')):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'comment_count'
+            ]
+        super().save(*args, **kwargs)
+
+    @property
+    def renditions(self):
+        try:
+            renditions = json.loads(self.image_renditions or '{}')
+        except ValueError:
+            renditions = None
+        # битое значение: шаблон откатится к исходному файлу
+        return renditions if isinstance(renditions, dict) else {}
 
-class Comment(models.Model):
+
+class Comment(CountedModel):
     post = models.ForeignKey(
         Post,
         on_delete=models.CASCADE,
         verbose_name='комментарии',
         related_name='comments',
+        db_index=False,
     )
     author = models.ForeignKey(
         User,
@@ -101,9 +179,17 @@ class Comment(models.Model):
         'Дата создания',
         auto_now_add=True
     )
+    is_hidden = models.BooleanField('скрыт модератором', default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['post', '-created', '-id'],
+                name='comment_post_created_idx'),
+        ]
 
 
-class Follow(models.Model):
+class Follow(CountedModel):
     user = models.ForeignKey(
         User, on_delete=models.CASCADE,
         related_name="follower",
@@ -122,8 +208,96 @@ class Follow(models.Model):
 
 
 class TagPost(models.Model):
-    tag = models.ForeignKey(Tag, on_delete=models.CASCADE)
+    tag = models.ForeignKey(
+        Tag, on_delete=models.CASCADE,
+        # покрыт unique_tag_post и tagpost_tag_created_idx
+        db_index=False,
+    )
     post = models.ForeignKey(Post, on_delete=models.CASCADE)
+    # копия Post.created: лента тега читается по одному индексу
+    created = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['tag', 'post'], name='unique_tag_post'),
+        ]
+        indexes = [
+            models.Index(
+                fields=['tag', '-created', '-post'],
+                name='tagpost_tag_created_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.created is None:
+            self.created = self.post.created
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f'{self.tag} {self.post}'
+
+
+class FeedEntry(models.Model):
+    """Строка материализованной ленты подписок одного читателя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        db_index=False,
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        db_index=False,
+    )
+    created = models.DateTimeField('Дата создания поста')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_feed_entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-created', '-post'],
+                name='feed_user_created_idx',
+            ),
+            models.Index(
+                fields=['user', 'author'], name='feed_user_author_idx'
+            ),
+        ]
+
+
+class UserStats(models.Model):
+    """Денормализованные счётчики пользователя.
+
+    Обновляются сигналами вместе с изменением Post, Follow и Comment;
+    расхождения чинит команда reconcile_stats.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+    )
+    posts = models.PositiveIntegerField('постов', default=0)
+    followers = models.PositiveIntegerField('подписчиков', default=0)
+    following = models.PositiveIntegerField('подписок', default=0)
+    comments = models.PositiveIntegerField('комментариев', default=0)
+    # посты автора не раскладываются по лентам, а читаются при показе
+    # (posts.feeds); переключает feeds.rebalance
+    pull_feed = models.BooleanField('лента по чтению', default=False)
+
+    class Meta:
+        verbose_name = 'статистика пользователя'
+        verbose_name_plural = 'Статистика пользователей'
+
+    def __str__(self):
+        return f'{self.user_id}: {self.posts}/{self.followers}'
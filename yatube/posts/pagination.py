@@ -0,0 +1,48 @@
+"""Курсорная пагинация REST API поверх posts.utils.CursorPaginator."""
+from collections import OrderedDict
+
+from rest_framework import pagination
+from rest_framework.response import Response
+
+from yatube.settings import PAGE_LIMIT
+
+from . import graph
+from .utils import CURSOR_PARAM, CursorPaginator
+
+
+class CursorPagination(pagination.BasePagination):
+    """Обёртка DRF над CursorPaginator; ключи берутся из view.cursor_keys."""
+    page_size = PAGE_LIMIT
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        paginator = CursorPaginator(
+            queryset, self.page_size,
+            keys=getattr(view, 'cursor_keys', ('created', 'id')),
+            query=request.query_params,
+        )
+        self.page = paginator.get_page(
+            request.query_params.get(CURSOR_PARAM))
+        return list(self.page)
+
+    def paginate_ids(self, ids, request):
+        """Страница пользователей из отсортированного массива id графа."""
+        self.request = request
+        self.page = graph.GraphPaginator(
+            ids, self.page_size, query=request.query_params,
+            transform=graph.users,
+        ).get_page(request.query_params.get(CURSOR_PARAM))
+        return list(self.page)
+
+    def link(self, cursor, link):
+        if cursor is None:
+            return None
+        return self.request.build_absolute_uri(link)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict((
+            ('next', self.link(self.page.next_cursor, self.page.next_link)),
+            ('previous', self.link(
+                self.page.previous_cursor, self.page.previous_link)),
+            ('results', data),
+        )))
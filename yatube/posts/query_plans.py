@@ -0,0 +1,95 @@
+"""Проверка планов запросов лент через EXPLAIN.
+
+Берутся те же запросы, что выполняют view: первая страница и страница
+после курсора. План не должен читать таблицу целиком или досортировывать
+строки во временном B-дереве - иначе на большой таблице лента
+деградирует до filesort.
+"""
+import re
+
+from django.db import connection
+from django.utils import timezone
+
+from yatube.settings import COMMENTS_PAGE_LIMIT, PAGE_LIMIT
+
+from . import feeds, tags
+from .models import Comment, FeedEntry, Post, TagPost
+from .utils import CursorPaginator
+
+# строки плана, которые считаются проблемой, по вендору БД
+BAD_PLANS = {
+    'sqlite': (
+        re.compile(r'\bSCAN\b(?!.*\bUSING (COVERING )?INDEX\b)'),
+        re.compile(r'USE TEMP B-TREE'),
+    ),
+    'postgresql': (
+        re.compile(r'Seq Scan'),
+        re.compile(r'^\s*(->\s*)?Sort\b', re.MULTILINE),
+    ),
+    'mysql': (
+        re.compile(r'\bALL\b'),
+        re.compile(r'Using filesort'),
+    ),
+}
+
+
+def _sample(queryset, keys):
+    """Ключи реальной строки для страницы после курсора."""
+    return queryset.order_by().values_list(*keys).first()
+
+
+def feed_queries():
+    """{имя: queryset} для всех лент в том виде, как их строят view."""
+    post = Post.objects.order_by().values('author_id', 'group_id').filter(
+        group__isnull=False).first() or {'author_id': 0, 'group_id': 0}
+    user_id = (FeedEntry.objects.order_by().values_list(
+        'user_id', flat=True).first() or 0)
+    tag_id = (TagPost.objects.order_by().values_list(
+        'tag_id', flat=True).first() or 0)
+    post_id = (Comment.objects.order_by().values_list(
+        'post_id', flat=True).first() or 0)
+    feeds_by_name = {
+        'index': (Post.objects.select_related('group', 'author'),
+                  ('created', 'id'), PAGE_LIMIT),
+        'group': (Post.objects.filter(group_id=post['group_id'])
+                  .select_related('group', 'author'),
+                  ('created', 'id'), PAGE_LIMIT),
+        'profile': (Post.objects.filter(author_id=post['author_id'])
+                    .select_related('group'),
+                    ('created', 'id'), PAGE_LIMIT),
+        'follow': (feeds.timeline(user_id),
+                   ('created', 'post_id'), PAGE_LIMIT),
+        'tag': (tags.timeline(tag_id),
+                ('created', 'post_id'), PAGE_LIMIT),
+        'comments': (Comment.objects.filter(post_id=post_id)
+                     .select_related('author'),
+                     ('created', 'id'), COMMENTS_PAGE_LIMIT),
+    }
+    queries = {}
+    for name, (queryset, keys, limit) in feeds_by_name.items():
+        pages = CursorPaginator(queryset, limit, keys=keys)
+        queries[name] = pages.queryset(None)
+        position = _sample(queryset, keys) or (timezone.now(), 0)
+        queries[f'{name}:next'] = pages.queryset(
+            (position, CursorPaginator.NEXT))
+        queries[f'{name}:previous'] = pages.queryset(
+            (position, CursorPaginator.PREVIOUS))
+    return queries
+
+
+def problems(plan, vendor=None):
+    """Строки плана, совпавшие с запрещёнными шаблонами."""
+    patterns = BAD_PLANS.get(vendor or connection.vendor, ())
+    return [
+        line.strip() for line in plan.splitlines()
+        if any(pattern.search(line) for pattern in patterns)
+    ]
+
+
+def check():
+    """{имя ленты: (план, проблемы)} по всем запросам лент."""
+    report = {}
+    for name, queryset in feed_queries().items():
+        plan = queryset.explain()
+        report[name] = (plan, problems(plan))
+    return report
@@ -0,0 +1,119 @@
+"""Полнотекстовый поиск по постам и комментариям.
+
+Бэкенд выбирается по СУБД (SEARCH_BACKENDS: vendor -> путь к классу):
+SQLite - FTS5 с русским стеммером, PostgreSQL - tsvector. Индекс
+обновляется сигналами на сохранение и удаление Post и Comment, целиком
+пересобирается командой rebuild_search_index.
+"""
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection
+from django.utils.module_loading import import_string
+
+from ..models import Comment, Post
+from ..utils import CursorPaginator
+from .base import COMMENT, POST, NullBackend
+
+DEFAULT_BACKENDS = {
+    'sqlite': 'posts.search.sqlite.SQLiteSearch',
+    'postgresql': 'posts.search.postgres.PostgresSearch',
+}
+# документов на одну запись в индекс при пересборке; SQLite старше 3.32
+# не примет в remove_many больше 999 параметров
+BATCH_SIZE = 500
+
+
+def get_backend(db=None):
+    db = db or connection
+    backends = getattr(settings, 'SEARCH_BACKENDS', DEFAULT_BACKENDS)
+    path = backends.get(db.vendor)
+    return import_string(path)(db) if path else NullBackend(db)
+
+
+def index_post(post):
+    get_backend().index(POST, post.pk, post.pk, post.text)
+
+
+def index_comment(comment):
+    get_backend().index(COMMENT, comment.pk, comment.post_id, comment.text)
+
+
+def index_comments(comments):
+    """index_comment() для пачки комментариев, одной записью в индекс."""
+    docs = [(comment.pk, comment.post_id, comment.text)
+            for comment in comments]
+    if docs:
+        get_backend().index_many(COMMENT, docs)
+
+
+def remove_post(post_id):
+    get_backend().remove(POST, post_id)
+
+
+def remove_comment(comment_id):
+    get_backend().remove(COMMENT, comment_id)
+
+
+def remove_comments(comment_ids):
+    if comment_ids:
+        get_backend().remove_many(COMMENT, comment_ids)
+
+
+def _index_stream(backend, kind, docs, batch_size):
+    """index_many() по пачкам документов из итератора; их число."""
+    total = 0
+    while True:
+        batch = list(islice(docs, batch_size))
+        if not batch:
+            return total
+        backend.index_many(kind, batch)
+        total += len(batch)
+
+
+def rebuild(post_model=Post, comment_model=Comment, db=None,
+            batch_size=BATCH_SIZE):
+    """Индексирует всё заново; модели можно передать из миграции."""
+    backend = get_backend(db)
+    backend.clear()
+    posts = post_model.objects.values_list('pk', 'pk', 'text')
+    comments = comment_model.objects.values_list('pk', 'post_id', 'text')
+    return (
+        _index_stream(backend, POST, posts.iterator(batch_size), batch_size)
+        + _index_stream(
+            backend, COMMENT, comments.iterator(batch_size), batch_size)
+    )
+
+
+class SearchPaginator(CursorPaginator):
+    """Курсор по (rank, id) поверх выдачи бэкенда."""
+    key_types = ((int, float), int)
+
+    def __init__(self, text, per_page, filters=None, **kwargs):
+        super().__init__(
+            text, per_page, keys=('rank', 'id'),
+            transform=self.load_posts, **kwargs)
+        self.filters = filters or {}
+
+    def fetch(self, position):
+        direction = self.NEXT if position is None else position[1]
+        rows = get_backend().search(
+            self.object_list, self.filters, position, self.per_page + 1)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == self.PREVIOUS:
+            rows.reverse()
+        return rows, has_more, direction
+
+    @staticmethod
+    def load_posts(hits):
+        posts = Post.objects.select_related(
+            'author', 'group').prefetch_related('tag').in_bulk(
+            [hit.id for hit in hits])
+        result = []
+        for hit in hits:
+            post = posts.get(hit.id)
+            if post is not None:
+                post.rank = hit.rank
+                result.append(post)
+        return result
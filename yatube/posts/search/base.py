@@ -0,0 +1,123 @@
+from collections import namedtuple
+
+from django.conf import settings
+
+POST = 'p'
+COMMENT = 'c'
+
+# строка выдачи: релевантность (больше - лучше) и id поста
+Hit = namedtuple('Hit', ('rank', 'id'))
+
+
+def rowid(kind, pk):
+    """Постоянный rowid документа: чётные - посты, нечётные - комментарии."""
+    return pk * 2 + (kind == COMMENT)
+
+
+class SearchBackend:
+    """Обратный индекс по текстам постов и комментариев.
+
+    Документ - пост или комментарий; выдача - посты, каждый с лучшей
+    релевантностью среди своих документов (комментарии весят
+    SEARCH_COMMENT_WEIGHT). Выдача упорядочена по (rank, id) по убыванию,
+    чтобы по ней работал курсор из posts.utils.
+    """
+    NEXT = 'n'
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    @property
+    def comment_weight(self):
+        return getattr(settings, 'SEARCH_COMMENT_WEIGHT', 0.5)
+
+    def create_schema(self):
+        raise NotImplementedError
+
+    def drop_schema(self):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def index(self, kind, pk, post_id, text):
+        raise NotImplementedError
+
+    def index_many(self, kind, docs):
+        """index() для многих документов: docs - (pk, post_id, text)."""
+        raise NotImplementedError
+
+    def remove(self, kind, pk):
+        raise NotImplementedError
+
+    def remove_many(self, kind, pks):
+        raise NotImplementedError
+
+    def match(self, query):
+        """Запрос на языке бэкенда или None, если искать нечего."""
+        raise NotImplementedError
+
+    def search(self, query, filters=None, position=None, limit=10):
+        """Список Hit; position - ((rank, id), направление) курсора."""
+        match = self.match(query)
+        if match is None:
+            return []
+        hits_sql, params = self.hits_sql(match)
+        sql = [
+            f'SELECT h.rank, h.post_id FROM ({hits_sql}) h '
+            'JOIN posts_post p ON p.id = h.post_id WHERE 1 = 1'
+        ]
+        filters = filters or {}
+        if filters.get('group_id'):
+            sql.append('AND p.group_id = %s')
+            params.append(filters['group_id'])
+        if filters.get('author_id'):
+            sql.append('AND p.author_id = %s')
+            params.append(filters['author_id'])
+        if filters.get('tag_id'):
+            sql.append(
+                'AND EXISTS (SELECT 1 FROM posts_tagpost t '
+                'WHERE t.post_id = p.id AND t.tag_id = %s)')
+            params.append(filters['tag_id'])
+        forward = position is None or position[1] == self.NEXT
+        if position is not None:
+            (rank, post_id), _ = position
+            sign = '<' if forward else '>'
+            sql.append(
+                f'AND (h.rank {sign} %s '
+                f'OR (h.rank = %s AND h.post_id {sign} %s))')
+            params.extend((rank, rank, post_id))
+        order = 'DESC' if forward else 'ASC'
+        sql.append(f'ORDER BY h.rank {order}, h.post_id {order} LIMIT %s')
+        params.append(limit)
+        with self.connection.cursor() as cursor:
+            cursor.execute(' '.join(sql), params)
+            return [Hit(rank, post_id) for rank, post_id in cursor.fetchall()]
+
+    def hits_sql(self, match):
+        """SQL (post_id, rank) по совпавшим документам и его параметры."""
+        raise NotImplementedError
+
+
+class NullBackend(SearchBackend):
+    """Для СУБД без поддержки: индекс не ведётся, выдача пуста."""
+
+    def create_schema(self):
+        pass
+
+    drop_schema = clear = create_schema
+
+    def index(self, kind, pk, post_id, text):
+        pass
+
+    def index_many(self, kind, docs):
+        pass
+
+    def remove(self, kind, pk):
+        pass
+
+    def remove_many(self, kind, pks):
+        pass
+
+    def match(self, query):
+        return None
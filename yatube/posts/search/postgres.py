@@ -0,0 +1,79 @@
+"""Поиск на PostgreSQL: tsvector со словарём SEARCH_CONFIG и GIN."""
+from django.conf import settings
+
+from .base import SearchBackend, rowid
+
+TABLE = 'posts_search'
+
+
+class PostgresSearch(SearchBackend):
+    @property
+    def config(self):
+        return getattr(settings, 'SEARCH_CONFIG', 'russian')
+
+    def create_schema(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TABLE IF NOT EXISTS {TABLE} ('
+                'rowid bigint PRIMARY KEY, post_id integer NOT NULL, '
+                'kind char(1) NOT NULL, body tsvector NOT NULL)'
+            )
+            cursor.execute(
+                f'CREATE INDEX IF NOT EXISTS {TABLE}_body '
+                f'ON {TABLE} USING GIN (body)')
+
+    def drop_schema(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {TABLE}')
+
+    def clear(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'TRUNCATE {TABLE}')
+
+    def index(self, kind, pk, post_id, text):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {TABLE} (rowid, post_id, kind, body) '
+                'VALUES (%s, %s, %s, to_tsvector(%s::regconfig, %s)) '
+                'ON CONFLICT (rowid) DO UPDATE SET body = EXCLUDED.body',
+                [rowid(kind, pk), post_id, kind, self.config, text],
+            )
+
+    def index_many(self, kind, docs):
+        params = []
+        for pk, post_id, text in docs:
+            params.extend((rowid(kind, pk), post_id, kind, self.config, text))
+        values = ', '.join(
+            ['(%s, %s, %s, to_tsvector(%s::regconfig, %s))'] * len(docs))
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {TABLE} (rowid, post_id, kind, body) '
+                f'VALUES {values} '
+                'ON CONFLICT (rowid) DO UPDATE SET body = EXCLUDED.body',
+                params,
+            )
+
+    def remove(self, kind, pk):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {TABLE} WHERE rowid = %s', [rowid(kind, pk)])
+
+    def remove_many(self, kind, pks):
+        rowids = [rowid(kind, pk) for pk in pks]
+        placeholders = ', '.join(['%s'] * len(rowids))
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {TABLE} WHERE rowid IN ({placeholders})',
+                rowids)
+
+    def match(self, query):
+        return query.strip() or None
+
+    def hits_sql(self, match):
+        query = 'plainto_tsquery(%s::regconfig, %s)'
+        return (
+            f'SELECT post_id, MAX(ts_rank_cd(body, {query}) * '
+            "CASE kind WHEN 'c' THEN %s ELSE 1.0 END) AS rank "
+            f'FROM {TABLE} WHERE body @@ {query} GROUP BY post_id',
+            [self.config, match, self.comment_weight, self.config, match],
+        )
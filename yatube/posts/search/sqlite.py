@@ -0,0 +1,80 @@
+"""Поиск на SQLite FTS5 с морфологией из posts.search.stemmer."""
+from .base import SearchBackend, rowid
+from .stemmer import tokens
+
+TABLE = 'posts_search'
+
+
+class SQLiteSearch(SearchBackend):
+    def create_schema(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5('
+                'body, post_id UNINDEXED, kind UNINDEXED, '
+                "tokenize = 'unicode61 remove_diacritics 2')"
+            )
+
+    def drop_schema(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {TABLE}')
+
+    def clear(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABLE}')
+
+    def index(self, kind, pk, post_id, text):
+        # в индекс попадают основы слов, а не словоформы
+        body = ' '.join(tokens(text))
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {TABLE} WHERE rowid = %s', [rowid(kind, pk)])
+            cursor.execute(
+                f'INSERT INTO {TABLE} (rowid, body, post_id, kind) '
+                'VALUES (%s, %s, %s, %s)',
+                [rowid(kind, pk), body, post_id, kind],
+            )
+
+    def index_many(self, kind, docs):
+        rows = [(rowid(kind, pk), ' '.join(tokens(text)), post_id, kind)
+                for pk, post_id, text in docs]
+        self.remove_many(kind, [pk for pk, _, _ in docs])
+        # executemany готовит INSERT один раз на всю пачку
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {TABLE} (rowid, body, post_id, kind) '
+                'VALUES (%s, %s, %s, %s)', rows)
+
+    def remove(self, kind, pk):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {TABLE} WHERE rowid = %s', [rowid(kind, pk)])
+
+    def remove_many(self, kind, pks):
+        rowids = [rowid(kind, pk) for pk in pks]
+        placeholders = ', '.join(['%s'] * len(rowids))
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {TABLE} WHERE rowid IN ({placeholders})',
+                rowids)
+
+    def match(self, query):
+        words = tokens(query)
+        if not words:
+            return None
+        # слова уже без кавычек и операторов; последнее - префиксом,
+        # чтобы находилось недопечатанное
+        terms = [f'"{word}"' for word in words]
+        terms[-1] += '*'
+        return ' AND '.join(terms)
+
+    def hits_sql(self, match):
+        # bm25 тем меньше, чем документ релевантнее. В агрегате его
+        # вызывать нельзя, а LIMIT не даёт SQLite развернуть подзапрос
+        return (
+            'SELECT post_id, MAX(score) AS rank FROM ('
+            f'SELECT post_id, -bm25({TABLE}) * '
+            "CASE kind WHEN 'c' THEN %s ELSE 1.0 END AS score "
+            f'FROM {TABLE} WHERE {TABLE} MATCH %s LIMIT -1'
+            ') GROUP BY post_id',
+            [self.comment_weight, match],
+        )
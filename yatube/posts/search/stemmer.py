@@ -0,0 +1,111 @@
+"""Стеммер Snowball для русского языка и разбиение текста на слова.
+
+FTS5 умеет только unicode61 без морфологии, поэтому слова приводятся к
+основе до записи в индекс и так же - в запросе. Латиница только
+переводится в нижний регистр.
+"""
+import re
+
+WORD = re.compile(r'\w+', re.UNICODE)
+VOWELS = 'аеиоуыэюя'
+
+PERFECTIVE_GERUND = (
+    ('в', 'вши', 'вшись'),
+    ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'),
+)
+REFLEXIVE = ((), ('ся', 'сь'))
+ADJECTIVE = ((), (
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+    'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю',
+    'ая', 'яя', 'ою', 'ею',
+))
+PARTICIPLE = (
+    ('ем', 'нн', 'вш', 'ющ', 'щ'),
+    ('ивш', 'ывш', 'ующ'),
+)
+VERB = (
+    ('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет',
+     'ют', 'ны', 'ть', 'ешь', 'нно'),
+    ('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй',
+     'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят', 'ует', 'уют',
+     'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю'),
+)
+NOUN = ((), (
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии', 'и',
+    'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам', 'ом', 'о',
+    'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия', 'ья', 'я',
+))
+SUPERLATIVE = ((), ('ейше', 'ейш'))
+DERIVATIONAL = ((), ('ость', 'ости'))
+
+
+def _regions(word):
+    """Начала областей RV и R2 по правилам Snowball."""
+    rv = r1 = r2 = len(word)
+    for index, char in enumerate(word):
+        if char in VOWELS:
+            rv = index + 1
+            break
+    for index in range(1, len(word)):
+        if word[index - 1] in VOWELS and word[index] not in VOWELS:
+            r1 = index + 1
+            break
+    for index in range(r1 + 1, len(word)):
+        if word[index - 1] in VOWELS and word[index] not in VOWELS:
+            r2 = index + 1
+            break
+    return rv, r2
+
+
+def _strip(word, start, groups):
+    """Срезает самое длинное окончание из групп внутри области start.
+
+    Окончания первой группы срезаются, только если перед ними а или я.
+    """
+    best = None
+    for need_a, endings in zip((True, False), groups):
+        for ending in endings:
+            cut = len(word) - len(ending)
+            if cut < start or not word.endswith(ending):
+                continue
+            if need_a and (cut - 1 < start or word[cut - 1] not in 'ая'):
+                continue
+            if best is None or cut < best:
+                best = cut
+    return None if best is None else word[:best]
+
+
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    if not any(char in VOWELS for char in word):
+        return word
+    rv, r2 = _regions(word)
+    stripped = _strip(word, rv, PERFECTIVE_GERUND)
+    if stripped is None:
+        word = _strip(word, rv, REFLEXIVE) or word
+        stripped = _strip(word, rv, ADJECTIVE)
+        if stripped is not None:
+            stripped = _strip(stripped, rv, PARTICIPLE) or stripped
+        else:
+            stripped = (_strip(word, rv, VERB)
+                        or _strip(word, rv, NOUN))
+    word = stripped if stripped is not None else word
+    if word.endswith('и') and len(word) - 1 >= rv:
+        word = word[:-1]
+    word = _strip(word, r2, DERIVATIONAL) or word
+    if word.endswith('нн') and len(word) - 2 >= rv:
+        return word[:-1]
+    superlative = _strip(word, rv, SUPERLATIVE)
+    if superlative is not None:
+        word = superlative
+        if word.endswith('нн') and len(word) - 2 >= rv:
+            word = word[:-1]
+        return word
+    if word.endswith('ь') and len(word) - 1 >= rv:
+        word = word[:-1]
+    return word
+
+
+def tokens(text):
+    """Основы слов текста в исходном порядке."""
+    return [stem(word) for word in WORD.findall(text or '')]
@@ -1,33 +1,137 @@
 from rest_framework import serializers
 
-from .models import Group, Post, Tag, TagPost
+from . import tags, tasks, thumbnails, uploads
+from .models import Comment, Follow, Group, Post, Tag, User
+
+BULK_FOLLOW_LIMIT = 5000
+
+
+class SparseFieldsMixin:
+    """?fields=id,text оставляет в ответе только перечисленные поля."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = requested_fields(self.context.get('request'))
+        if requested:
+            for name in set(self.fields) - requested:
+                self.fields.pop(name)
+
+
+def requested_fields(request):
+    """Множество полей из ?fields= или None, если параметра нет."""
+    if request is None or request.method != 'GET':
+        return None
+    value = request.query_params.get('fields')
+    if not value:
+        return None
+    return {name.strip() for name in value.split(',') if name.strip()}
 
 
 class TagSerializer(serializers.ModelSerializer):
+    # без UniqueValidator: существующие теги привязываются, а не отвергаются
+    name = serializers.CharField(max_length=32)
+
     class Meta:
         fields = ('name', )
         model = Tag
 
 
-class PostSerializer(serializers.ModelSerializer):
+class GroupSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        fields = ('id', 'title', 'slug', 'description')
+        model = Group
+
+
+class PostSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    author = serializers.SlugRelatedField(
+        slug_field='username', read_only=True)
     group = serializers.SlugRelatedField(
-        slug_field='slug', queryset=Group.objects.all(), required=False)
+        slug_field='slug', queryset=Group.objects.all(), required=False,
+        allow_null=True)
     tag = TagSerializer(required=False, many=True)
 
     class Meta:
-        fields = ('id', 'text', 'author', 'image', 'pub_date', 'group', 'tag')
+        fields = ('id', 'text', 'author', 'image', 'created', 'group', 'tag',
+                  'comment_count')
+        read_only_fields = ('created', 'comment_count')
         model = Post
 
+    def validate_image(self, image):
+        # те же ограничения, что у PostForm.clean_image
+        if not image:
+            return image
+        error = uploads.check(image)
+        if error:
+            raise serializers.ValidationError(error)
+        image = uploads.downsample(image)
+        if image.size > uploads.quota_left(self.context['request'].user.pk):
+            raise serializers.ValidationError(
+                'Превышен суточный лимит загрузки картинок')
+        return image
+
     def create(self, validated_data):
-        if 'tag' not in self.initial_data:
-            # tags=validated_data.pop('tag')
-            post = Post.objects.create(**validated_data)
-            return post
-        else:
-            tag = validated_data.pop('tag')
-            post = Post.objects.create(**validated_data)
-
-            for one_tag in tag:
-                current_tag, status = Tag.objects.get_or_create(**one_tag)
-                TagPost.objects.create(tag=current_tag, post=post)
-            return post
+        tag = validated_data.pop('tag', None)
+        post = Post.objects.create(**validated_data)
+        self.image_saved(post, 'image' in validated_data)
+        if tag:
+            tags.attach(post, [one_tag['name'] for one_tag in tag])
+        return post
+
+    def update(self, instance, validated_data):
+        tag = validated_data.pop('tag', None)
+        image_changed = 'image' in validated_data
+        if image_changed:
+            instance.image_card = ''
+            instance.image_renditions = ''
+        post = super().update(instance, validated_data)
+        self.image_saved(post, image_changed)
+        if tag is not None:
+            # список тегов заменяется целиком
+            tags.replace(post, [one_tag['name'] for one_tag in tag])
+            if hasattr(post, '_prefetched_objects_cache'):
+                post._prefetched_objects_cache.pop('tag', None)
+        return post
+
+    @staticmethod
+    def image_saved(post, image_changed):
+        if image_changed and post.image:
+            uploads.charge(post.author_id, post.image.size)
+            tasks.enqueue(thumbnails.build_renditions, post.pk)
+
+
+class CommentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    author = serializers.SlugRelatedField(
+        slug_field='username', read_only=True)
+
+    class Meta:
+        fields = ('id', 'post', 'author', 'text', 'created')
+        read_only_fields = ('post', 'created')
+        model = Comment
+
+
+class FollowSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    user = serializers.SlugRelatedField(
+        slug_field='username', read_only=True)
+    following = serializers.SlugRelatedField(
+        source='author', slug_field='username',
+        queryset=User.objects.all())
+
+    class Meta:
+        fields = ('id', 'user', 'following')
+        model = Follow
+
+    def validate_following(self, author):
+        user = self.context['request'].user
+        if author == user:
+            raise serializers.ValidationError(
+                'Нельзя подписаться на самого себя')
+        if Follow.objects.filter(user=user, author=author).exists():
+            raise serializers.ValidationError('Подписка уже оформлена')
+        return author
+
+
+class BulkFollowSerializer(serializers.Serializer):
+    """Список имён авторов для массовой подписки."""
+    following = serializers.ListField(
+        child=serializers.CharField(max_length=150),
+        allow_empty=False, max_length=BULK_FOLLOW_LIMIT)
@@ -0,0 +1,69 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from . import comments, feeds, graph, search, stats
+from .models import Comment, Follow, Post
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        feeds.fan_out(instance)
+        stats.change(instance.author_id, 'posts', 1)
+    if update_fields is None or 'text' in update_fields:
+        search.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    if feeds.is_pull(instance.author_id):
+        feeds.forget_recent(instance.author_id)
+    stats.change(instance.author_id, 'posts', -1)
+    search.remove_post(instance.pk)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    if created:
+        feeds.backfill(instance.user_id, instance.author_id)
+        stats.change(instance.author_id, 'followers', 1)
+        stats.change(instance.user_id, 'following', 1)
+        graph.update(added=[(instance.user_id, instance.author_id)])
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    feeds.prune(instance.user_id, instance.author_id)
+    stats.change(instance.author_id, 'followers', -1)
+    stats.change(instance.user_id, 'following', -1)
+    graph.update(removed=[(instance.user_id, instance.author_id)])
+
+
+@receiver(post_init, sender=Comment)
+def comment_loaded(sender, instance, **kwargs):
+    instance._loaded_hidden = instance.is_hidden
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        stats.change(instance.author_id, 'comments', 1)
+        if not instance.is_hidden and not getattr(
+                instance, '_counted', False):
+            comments.shift_counts({instance.post_id: 1})
+    elif instance.is_hidden != instance._loaded_hidden:
+        comments.shift_counts(
+            {instance.post_id: -1 if instance.is_hidden else 1})
+    instance._loaded_hidden = instance.is_hidden
+    if instance.is_hidden:
+        search.remove_comment(instance.pk)
+    elif update_fields is None or 'text' in update_fields:
+        search.index_comment(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    stats.change(instance.author_id, 'comments', -1)
+    if not instance.is_hidden:
+        comments.shift_counts({instance.post_id: -1})
+    search.remove_comment(instance.pk)
@@ -0,0 +1,110 @@
+"""Счётчики пользователя в таблице UserStats.
+
+Счётчики денормализованы и сдвигаются в той же транзакции, что и
+запись, которую они считают: сигналы Post, Comment и Follow работают
+внутри неё (см. models.CountedModel), пакетные пути вызывают
+change_many() сами. reconcile() - инструмент починки после ручных правок
+и массовых вставок в обход сигналов.
+"""
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+
+from .models import Comment, Follow, Post, User, UserStats
+
+FIELDS = ('posts', 'followers', 'following', 'comments')
+
+
+def _sources():
+    """Для каждого счётчика - запрос (id пользователя, значение)."""
+    return {
+        'posts': Post.objects.values('author').annotate(n=Count('id')),
+        'followers': Follow.objects.values('author').annotate(n=Count('id')),
+        'following': Follow.objects.values('user').annotate(n=Count('id')),
+        'comments': Comment.objects.values('author').annotate(n=Count('id')),
+    }
+
+
+def count_for(user_id):
+    return {
+        'posts': Post.objects.filter(author_id=user_id).count(),
+        'followers': Follow.objects.filter(author_id=user_id).count(),
+        'following': Follow.objects.filter(user_id=user_id).count(),
+        'comments': Comment.objects.filter(author_id=user_id).count(),
+    }
+
+
+def change(user_id, field, delta):
+    """Сдвигает счётчик одним UPDATE в транзакции вызывающего.
+
+    Вызывается из сигналов post_save/post_delete внутри транзакции
+    записи: сбой здесь откатывает и саму запись.
+    """
+    with transaction.atomic():
+        updated = UserStats.objects.filter(user_id=user_id).update(
+            **{field: Greatest(F(field) + delta, 0)})
+        if not updated and delta > 0:
+            # строки ещё нет: считаем всё честно, включая это изменение
+            UserStats.objects.get_or_create(
+                user_id=user_id, defaults=count_for(user_id))
+
+
+def change_many(field, deltas):
+    """change() для многих пользователей: {id пользователя: сдвиг}."""
+    by_delta = {}
+    for user_id, delta in deltas.items():
+        by_delta.setdefault(delta, []).append(user_id)
+    with transaction.atomic():
+        existing = set(UserStats.objects.filter(
+            user_id__in=list(deltas)).values_list('user_id', flat=True))
+        for delta, user_ids in by_delta.items():
+            UserStats.objects.filter(user_id__in=user_ids).update(
+                **{field: Greatest(F(field) + delta, 0)})
+        missing = [user_id for user_id, delta in deltas.items()
+                   if user_id not in existing and delta > 0]
+        UserStats.objects.bulk_create(
+            [UserStats(user_id=user_id, **count_for(user_id))
+             for user_id in missing],
+            ignore_conflicts=True,
+        )
+
+
+def for_user(user):
+    """Статистика пользователя; отсутствующая строка создаётся пересчётом."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        stats, _ = UserStats.objects.get_or_create(
+            user_id=user.pk, defaults=count_for(user.pk))
+        return stats
+
+
+def reconcile(dry_run=False, batch_size=1000):
+    """Сверяет все счётчики с таблицами и чинит расхождения.
+
+    Возвращает число исправленных (или найденных при dry_run) строк.
+    """
+    actual = {}
+    for field, rows in _sources().items():
+        key = 'user' if field == 'following' else 'author'
+        for row in rows.order_by():
+            actual.setdefault(row[key], dict.fromkeys(FIELDS, 0))
+            actual[row[key]][field] = row['n']
+    stored = UserStats.objects.in_bulk()
+    to_update, to_create = [], []
+    for user_id in User.objects.values_list('id', flat=True).iterator():
+        values = actual.get(user_id, dict.fromkeys(FIELDS, 0))
+        stats = stored.get(user_id)
+        if stats is None:
+            to_create.append(UserStats(user_id=user_id, **values))
+            continue
+        if any(getattr(stats, field) != values[field] for field in FIELDS):
+            for field in FIELDS:
+                setattr(stats, field, values[field])
+            to_update.append(stats)
+    if not dry_run:
+        with transaction.atomic():
+            UserStats.objects.bulk_create(to_create, ignore_conflicts=True)
+            UserStats.objects.bulk_update(
+                to_update, FIELDS, batch_size=batch_size)
+    return len(to_create) + len(to_update)
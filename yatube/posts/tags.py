@@ -0,0 +1,116 @@
+"""Теги постов: нормализация имён, пакетная привязка и лента тега.
+
+Имя тега хранится в нормальной форме (см. normalize), поэтому поиск
+по нему - точное совпадение по уникальному индексу. Лента тега, как и
+лента подписок, читается по индексу (tag, created, post) таблицы
+TagPost, куда при привязке копируется дата поста.
+"""
+import re
+
+from django.db import connection
+
+from . import invalidation
+from .models import Tag, TagPost
+
+SPACES = re.compile(r'\s+')
+
+
+def normalize(name):
+    """'  #Котики  Дня ' -> 'котики дня'."""
+    name = SPACES.sub(' ', (name or '').strip().lstrip('#').strip())
+    return name.lower()[:Tag._meta.get_field('name').max_length]
+
+
+def resolve(names):
+    """{имя: Tag} для всех имён; недостающие теги создаются пачкой.
+
+    Один запрос IN, и ещё два только если каких-то тегов не было.
+    """
+    names = list(dict.fromkeys(filter(None, map(normalize, names))))
+    if not names:
+        return {}
+    found = {tag.name: tag for tag in Tag.objects.filter(name__in=names)}
+    missing = [name for name in names if name not in found]
+    if missing:
+        Tag.objects.bulk_create(
+            [Tag(name=name) for name in missing], ignore_conflicts=True)
+        # id созданных строк SQLite не возвращает, перечитываем
+        found.update(
+            (tag.name, tag) for tag in Tag.objects.filter(name__in=missing))
+    return found
+
+
+def attach(post, names):
+    """Привязывает к посту теги по именам; возвращает список Tag."""
+    tags = _link(post, names)
+    if tags:
+        _changed(post)
+    return tags
+
+
+def detach(post, keep=()):
+    """Отвязывает от поста все теги, кроме имён keep; возвращает их id."""
+    tag_ids = _unlink(post, keep)
+    if tag_ids:
+        _changed(post, tag_ids)
+    return tag_ids
+
+
+def replace(post, names):
+    """Заменяет теги поста списком имён; артефакты сбрасываются один раз."""
+    names = [normalize(name) for name in names]
+    tag_ids = _unlink(post, keep=names)
+    tags = _link(post, names)
+    if tag_ids or tags:
+        _changed(post, tag_ids)
+    return tags
+
+
+def _link(post, names):
+    tags = list(resolve(names).values())
+    if tags:
+        TagPost.objects.bulk_create(
+            [TagPost(tag=tag, post=post, created=post.created)
+             for tag in tags],
+            ignore_conflicts=True,
+        )
+    return tags
+
+
+def _unlink(post, keep):
+    # один DELETE без выборки связей и сигнала на каждую
+    tag_ids = list(TagPost.objects.filter(post=post).exclude(
+        tag__name__in=keep).values_list('tag_id', flat=True))
+    if not tag_ids:
+        return tag_ids
+    table = connection.ops.quote_name(TagPost._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE post_id = %s AND tag_id IN '
+            f'({", ".join(["%s"] * len(tag_ids))})', [post.pk, *tag_ids])
+    return tag_ids
+
+
+def _changed(post, removed=()):
+    """Сбрасывает пост, ленты его тегов и все ленты с его карточкой.
+
+    Массовые вставка и удаление связей не шлют сигналов, а теги видны
+    на карточках главной, группы, профиля и подписок. Ленты текущих
+    тегов входят в post_feed_tags, снятых - перечисляются в removed.
+    """
+    invalidation.invalidate(
+        ('post', post.pk),
+        *(('tag', tag_id) for tag_id in removed),
+        *invalidation.post_feed_tags(post),
+    )
+
+
+def timeline(tag):
+    """Лента тега в виде queryset связей TagPost."""
+    return TagPost.objects.filter(tag=tag).select_related(
+        'post__author', 'post__group'
+    ).prefetch_related('post__tag')
+
+
+def links_to_posts(links):
+    return [link.post for link in links]
@@ -0,0 +1,46 @@
+"""Минимальная очередь фоновых задач.
+
+TASK_QUEUE = 'thread' - пул потоков процесса; задача ставится после
+коммита транзакции, чтобы воркер увидел сохранённые строки.
+TASK_QUEUE = 'sync' - локальная замена для тестов и отладки: задача
+выполняется сразу в вызывающем потоке.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger('yatube.tasks')
+_executor = None
+_lock = threading.Lock()
+
+
+def executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'TASK_WORKERS', 2),
+                thread_name_prefix='yatube-task',
+            )
+    return _executor
+
+
+def _run(func, args):
+    try:
+        func(*args)
+    except Exception:
+        logger.exception('Фоновая задача %s упала', func.__name__)
+    finally:
+        # у потока пула своё подключение к БД, его надо освобождать
+        close_old_connections()
+
+
+def enqueue(func, *args):
+    """Ставит func(*args) в очередь согласно TASK_QUEUE."""
+    if getattr(settings, 'TASK_QUEUE', 'thread') == 'sync':
+        func(*args)
+        return
+    transaction.on_commit(lambda: executor().submit(_run, func, args))
@@ -0,0 +1,206 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from posts import tags
+from posts.models import Comment, Follow, Group, Post, TagPost, User
+from yatube.settings import PAGE_LIMIT
+
+
+@override_settings(QUERY_BUDGET_RAISE=True)
+class PostApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {number}')
+            for number in range(PAGE_LIMIT + 3)
+        ]
+        for post in cls.posts:
+            tags.attach(post, ['кошки', 'собаки'])
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.author_client = APIClient()
+        self.author_client.force_authenticate(self.author)
+
+    def test_list_pages(self):
+        """Список постов листается курсором без N+1"""
+        url = reverse('api:post-list')
+        with self.assertNumQueries(2):
+            # посты с авторами и группами, теги
+            first = self.client.get(url).json()
+        expected = [post.pk for post in reversed(self.posts)]
+        self.assertEqual(
+            [post['id'] for post in first['results']], expected[:PAGE_LIMIT])
+        self.assertEqual(first['results'][0]['author'], 'author')
+        self.assertEqual(first['results'][0]['group'], 'group')
+        self.assertEqual(
+            first['results'][0]['tag'],
+            [{'name': 'кошки'}, {'name': 'собаки'}])
+        self.assertIsNone(first['previous'])
+        second = self.client.get(first['next']).json()
+        self.assertEqual(
+            [post['id'] for post in second['results']], expected[PAGE_LIMIT:])
+        self.assertIsNone(second['next'])
+
+    def test_sparse_fields(self):
+        """?fields= сужает ответ и не тянет теги"""
+        url = reverse('api:post-list')
+        with self.assertNumQueries(1):
+            data = self.client.get(url, {'fields': 'id,text'}).json()
+        self.assertEqual(set(data['results'][0]), {'id', 'text'})
+
+    def test_etag(self):
+        """Повтор запроса с If-None-Match получает 304"""
+        url = reverse('api:post-detail', args=[self.posts[0].pk])
+        response = self.client.get(url)
+        self.assertIn('ETag', response)
+        again = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.content, b'')
+
+    def test_not_modified_without_queries(self):
+        """304 по поколениям кеша отдаётся без запросов к БД"""
+        urls = (
+            reverse('api:post-list'),
+            reverse('api:post-detail', args=[self.posts[0].pk]),
+            reverse('api:comment-list', args=[self.posts[0].pk]),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                with self.assertNumQueries(0):
+                    again = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(again.status_code, 304)
+                self.assertEqual(again['ETag'], etag)
+
+    def test_etag_follows_changes(self):
+        """Пост, комментарий и теги меняют ETag"""
+        post = self.posts[-1]
+        urls = (
+            reverse('api:post-list'),
+            reverse('api:post-detail', args=[post.pk]),
+        )
+        changes = (
+            lambda: Comment.objects.create(
+                post=post, author=self.other, text='Комментарий'),
+            lambda: tags.detach(post, keep=['кошки']),
+            lambda: self.edit(post, 'Исправленный пост'),
+        )
+        for change in changes:
+            etags = {url: self.client.get(url)['ETag'] for url in urls}
+            change()
+            for url, etag in etags.items():
+                with self.subTest(url=url):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                    self.assertEqual(response.status_code, 200)
+
+    @staticmethod
+    def edit(post, text):
+        post.text = text
+        post.save()
+
+    def test_create_with_tags(self):
+        """Пост создаётся с тегами, существующие теги не дублируются"""
+        response = self.author_client.post(
+            reverse('api:post-list'),
+            {'text': 'Новый', 'group': 'group',
+             'tag': [{'name': '#Кошки'}, {'name': 'птицы'}]},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 201)
+        post = Post.objects.get(pk=response.json()['id'])
+        self.assertEqual(post.author, self.author)
+        self.assertEqual(
+            sorted(post.tag.values_list('name', flat=True)),
+            ['кошки', 'птицы'])
+
+    def test_update_replaces_tags(self):
+        """Правка заменяет список тегов целиком, снятые - одним DELETE"""
+        post = self.posts[0]
+        tags.attach(post, ['рыбы', 'кони'])
+        with CaptureQueriesContext(connection) as captured:
+            response = self.author_client.patch(
+                reverse('api:post-detail', args=[post.pk]),
+                {'tag': [{'name': 'птицы'}, {'name': 'кошки'}]},
+                format='json')
+        self.assertEqual(response.status_code, 200)
+        deletes = [
+            query['sql'] for query in captured.captured_queries
+            if query['sql'].startswith('DELETE FROM "posts_tagpost"')]
+        self.assertEqual(len(deletes), 1)
+        self.assertEqual(
+            sorted(TagPost.objects.filter(post=post).values_list(
+                'tag__name', flat=True)),
+            ['кошки', 'птицы'])
+
+    def test_permissions(self):
+        """Чужой пост не правится, аноним не пишет"""
+        other_client = APIClient()
+        other_client.force_authenticate(self.other)
+        url = reverse('api:post-detail', args=[self.posts[0].pk])
+        self.assertEqual(
+            other_client.patch(url, {'text': 'x'}).status_code, 403)
+        self.assertEqual(
+            self.client.post(
+                reverse('api:post-list'), {'text': 'x'}).status_code,
+            403)
+
+
+@override_settings(QUERY_BUDGET_RAISE=True)
+class CommentFollowApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.reader, text=str(number))
+            for number in range(3))
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def test_comments(self):
+        """Комментарии поста читаются и добавляются"""
+        url = reverse('api:comment-list', args=[self.post.pk])
+        with self.assertNumQueries(2):
+            # пост и комментарии с авторами
+            data = self.client.get(url).json()
+        self.assertEqual(len(data['results']), 3)
+        response = self.client.post(url, {'text': 'Ещё'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['author'], 'reader')
+
+    def test_follow(self):
+        """Подписка оформляется один раз и не на себя"""
+        url = reverse('api:follow-list')
+        response = self.client.post(url, {'following': 'author'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            self.client.post(url, {'following': 'author'}).status_code, 400)
+        self.assertEqual(
+            self.client.post(url, {'following': 'reader'}).status_code, 400)
+        self.assertEqual(
+            [row['following'] for row in self.client.get(url).json()[
+                'results']],
+            ['author'])
+        self.assertTrue(
+            Follow.objects.filter(user=self.reader, author=self.author)
+            .exists())
+
+    def test_follow_requires_login(self):
+        """Список подписок доступен только пользователю"""
+        response = APIClient().get(reverse('api:follow-list'))
+        self.assertEqual(response.status_code, 403)
@@ -0,0 +1,202 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from posts import comments, search
+from posts.models import Comment, Post, User, UserStats
+
+
+@override_settings(COMMENT_RATE_LIMIT={'capacity': 2, 'per_minute': 1},
+                   PAGE_CACHE_TIMEOUTS={})
+class CommentTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+        self.url = reverse('posts:add_comment', args=[self.post.pk])
+
+    def count(self, post=None):
+        return Post.objects.get(pk=(post or self.post).pk).comment_count
+
+    def test_add_comment(self):
+        """Комментарий пишется без чтения поста и сдвигает счётчик"""
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.post(self.url, {'text': 'Привет'})
+        self.assertRedirects(
+            response, reverse('posts:post_detail', args=[self.post.pk]))
+        self.assertFalse([
+            query for query in captured.captured_queries
+            if query['sql'].startswith('SELECT') and 'posts_post' in query[
+                'sql']])
+        self.assertEqual(self.count(), 1)
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk]))
+        self.assertContains(response, 'Привет')
+        response = self.client.post(
+            reverse('posts:add_comment', args=[0]), {'text': 'Нет поста'})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(Comment.objects.count(), 1)
+
+    def test_rate_limit(self):
+        """Третий комментарий подряд получает 429 и не пишется"""
+        for number in range(2):
+            self.client.post(self.url, {'text': f'Комментарий {number}'})
+        with self.assertNumQueries(2):
+            # только сессия и пользователь
+            response = self.client.post(self.url, {'text': 'Спам'})
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        api = APIClient()
+        api.force_authenticate(self.reader)
+        response = api.post(
+            reverse('api:comment-list', args=[self.post.pk]),
+            {'text': 'Спам'})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(Comment.objects.count(), 2)
+
+    def test_invalid_not_counted(self):
+        """Пустые комментарии не тратят лимит"""
+        api = APIClient()
+        api.force_authenticate(self.reader)
+        for _ in range(3):
+            self.client.post(self.url, {'text': ''})
+            api.post(reverse('api:comment-list', args=[self.post.pk]),
+                     {'text': ''})
+        response = self.client.post(self.url, {'text': 'Привет'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Comment.objects.count(), 1)
+
+    def test_signals_keep_count(self):
+        """Создание, скрытие и удаление через ORM тоже ведут счётчик"""
+        comment = Comment.objects.create(
+            post=self.post, author=self.reader, text='Один')
+        Comment.objects.create(post=self.post, author=self.reader, text='Два')
+        self.assertEqual(self.count(), 2)
+        comment.is_hidden = True
+        comment.save()
+        self.assertEqual(self.count(), 1)
+        comment.delete()
+        self.assertEqual(self.count(), 1)
+
+    def test_hide_and_unhide(self):
+        """Скрытые комментарии пропадают со страницы, из поиска и счётчика"""
+        for number in range(5):
+            Comment.objects.create(
+                post=self.post, author=self.reader, text=f'тюлень {number}')
+        queryset = Comment.objects.filter(text__endswith='3')
+        self.assertEqual(comments.hide(queryset), 1)
+        self.assertEqual(comments.hide(queryset), 0)
+        self.assertEqual(self.count(), 4)
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk]))
+        self.assertNotContains(response, 'тюлень 3')
+        self.assertEqual(comments.hide(Comment.objects.all(), 2), 4)
+        self.assertEqual(self.count(), 0)
+        self.assertEqual(search.get_backend().search('тюлень'), [])
+        self.assertEqual(comments.unhide(Comment.objects.all()), 5)
+        self.assertEqual(self.count(), 5)
+        self.assertTrue(search.get_backend().search('тюлень'))
+
+    def test_unhide_indexes_in_batches(self):
+        """Раскрытые комментарии пишутся в индекс одной записью на пачку"""
+        for number in range(6):
+            Comment.objects.create(
+                post=self.post, author=self.reader, text=f'нерпа {number}')
+        comments.hide(Comment.objects.all())
+        with CaptureQueriesContext(connection) as captured:
+            comments.unhide(Comment.objects.all(), batch_size=3)
+        inserts = [
+            query for query in captured.captured_queries
+            if 'INSERT INTO posts_search' in query['sql']]
+        self.assertEqual(len(inserts), 2)
+        self.assertTrue(search.get_backend().search('нерпа'))
+
+    def test_edit_keeps_count(self):
+        """Правка устаревшего экземпляра поста не затирает счётчик"""
+        stale = Post.objects.get(pk=self.post.pk)
+        comments.add(self.reader, self.post.pk, 'Первый')
+        stale.text = 'Исправленный пост'
+        stale.save()
+        self.assertEqual(self.count(), 1)
+        self.assertEqual(
+            Post.objects.get(pk=self.post.pk).text, 'Исправленный пост')
+
+    def test_bulk_delete(self):
+        """Удаление тысяч комментариев идёт пачками DELETE"""
+        other = Post.objects.create(author=self.author, text='Другой')
+        Comment.objects.bulk_create(
+            Comment(post=post, author=self.reader, text=f'к {number}')
+            for number in range(30) for post in (self.post, other))
+        call_command('reconcile_stats', stdout=StringIO())
+        with CaptureQueriesContext(connection) as captured:
+            deleted = comments.delete(
+                Comment.objects.filter(post=self.post), batch_size=7)
+        self.assertEqual(deleted, 30)
+        deletes = [
+            query for query in captured.captured_queries
+            if query['sql'].startswith('DELETE FROM "posts_comment"')]
+        self.assertEqual(len(deletes), 5)
+        self.assertEqual(self.count(), 0)
+        self.assertEqual(self.count(other), 30)
+        self.assertEqual(
+            UserStats.objects.get(user=self.reader).comments, 30)
+
+    def test_reconcile_counts(self):
+        """reconcile_stats чинит comment_count после массовой вставки"""
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=self.reader, text=str(number))
+            for number in range(3))
+        out = StringIO()
+        call_command('reconcile_stats', stdout=out)
+        self.assertIn('счётчиков комментариев: 1', out.getvalue())
+        self.assertEqual(self.count(), 3)
+
+
+class CommentAdminTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = get_user_model().objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        cls.post = Post.objects.create(author=cls.admin, text='Пост')
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.admin, text=str(number))
+            for number in range(4))
+        comments.recount()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+        self.url = reverse('admin:posts_comment_changelist')
+
+    def test_changelist(self):
+        """Список комментариев открывается, штатного удаления нет"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        actions = dict(response.context['action_form'].fields[
+            'action'].choices)
+        self.assertNotIn('delete_selected', actions)
+        self.assertIn('hide_comments', actions)
+
+    def test_actions(self):
+        """Действия скрывают и удаляют все выбранные комментарии"""
+        ids = list(Comment.objects.values_list('pk', flat=True))
+        self.client.post(self.url, {
+            'action': 'hide_comments', '_selected_action': ids[:2]})
+        self.assertEqual(Comment.objects.filter(is_hidden=True).count(), 2)
+        self.client.post(self.url, {
+            'action': 'delete_comments', '_selected_action': ids})
+        self.assertFalse(Comment.objects.exists())
+        self.assertEqual(Post.objects.get().comment_count, 0)
@@ -0,0 +1,134 @@
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import follows, tags
+from posts.models import Comment, Group, Post, User
+
+from .utils import run_commit_hooks
+
+
+# проверяются сами view, без кеша страниц перед ними
+@override_settings(PAGE_CACHE_TIMEOUTS={})
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def revalidate(self, url, client=None):
+        client = client or self.client
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_not_modified_without_queries(self):
+        """Неизменённые ленты отдают 304, не обращаясь к БД"""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=['group']),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                with self.assertNumQueries(0):
+                    again = self.client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(again.status_code, 304)
+
+    def test_detail_pages_one_query(self):
+        """Профиль и пост проверяются одним запросом по индексу"""
+        urls = (
+            reverse('posts:profile', args=['author']),
+            reverse('posts:post_detail', args=[self.post.pk]),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                with self.assertNumQueries(1):
+                    again = self.client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(again.status_code, 304)
+
+    def test_changes_invalidate(self):
+        """Новый пост или комментарий меняет валидаторы"""
+        index = reverse('posts:index')
+        detail = reverse('posts:post_detail', args=[self.post.pk])
+        etags = {
+            url: self.client.get(url)['ETag'] for url in (index, detail)}
+        Post.objects.create(author=self.author, text='Ещё')
+        Comment.objects.create(
+            post=self.post, author=self.author, text='Комментарий')
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_follow_invalidates_feeds(self):
+        """Подписка меняет значок на карточках ленты и группы"""
+        reader = User.objects.create_user(username='reader')
+        reader_client = Client()
+        reader_client.force_login(reader)
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=['group']),
+        )
+        etags = {url: reader_client.get(url)['ETag'] for url in urls}
+        follows.follow(reader, 'author')
+        run_commit_hooks()
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'вы подписаны')
+
+    def test_tags_invalidate_feeds(self):
+        """Привязка тега меняет карточки главной, группы и профиля"""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=['group']),
+            reverse('posts:profile', args=['author']),
+        )
+        etags = {url: self.client.get(url)['ETag'] for url in urls}
+        tags.attach(self.post, ['котики'])
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(
+                    response, reverse('posts:tag_posts', args=['котики']))
+
+    def test_viewer_and_cursor_in_etag(self):
+        """Страница зависит от зрителя и курсора"""
+        url = reverse('posts:index')
+        anonymous = self.client.get(url)['ETag']
+        self.assertNotEqual(self.author_client.get(url)['ETag'], anonymous)
+        self.assertNotEqual(
+            self.client.get(url, {'cursor': 'x'})['ETag'], anonymous)
+
+    def test_last_modified(self):
+        """If-Modified-Since тоже даёт 304"""
+        url = reverse('posts:group_list', args=['group'])
+        response = self.client.get(url)
+        again = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(again.status_code, 304)
+
+    def test_unknown_objects(self):
+        """Несуществующие профиль и пост по-прежнему дают 404"""
+        self.assertEqual(
+            self.client.get(
+                reverse('posts:profile', args=['nobody'])).status_code,
+            404)
+        self.assertEqual(
+            self.client.get(
+                reverse('posts:post_detail', args=[0])).status_code,
+            404)
@@ -0,0 +1,213 @@
+from importlib import import_module
+from io import StringIO
+
+from django.apps import apps
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from yatube.settings import PAGE_LIMIT
+
+from .. import feeds
+from ..models import FeedEntry, Follow, Post, User
+from ..utils import encode_cursor
+
+
+class FeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user('reader')
+        cls.author = User.objects.create_user('author')
+        cls.other = User.objects.create_user('other')
+        cls.old_post = Post.objects.create(
+            author=cls.author, text='старый пост')
+        Post.objects.create(author=cls.other, text='чужой пост')
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def feed_ids(self):
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        return [post.id for post in response.context['page_obj']]
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Подписка дозаполняет ленту, отписка вычищает"""
+        self.reader_client.get(
+            reverse('posts:profile_follow', args=(self.author.username,)))
+        self.assertEqual(self.feed_ids(), [self.old_post.id])
+        self.reader_client.get(
+            reverse('posts:profile_unfollow', args=(self.author.username,)))
+        self.assertEqual(self.feed_ids(), [])
+        self.assertFalse(FeedEntry.objects.filter(user=self.reader).exists())
+
+    def test_new_post_fans_out(self):
+        """Новый пост попадает в ленты подписчиков"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        new_post = Post.objects.create(author=self.author, text='новый')
+        self.assertEqual(self.feed_ids(), [new_post.id, self.old_post.id])
+
+    def test_feed_page_queries(self):
+        """Лента подписок читается одним запросом к постам"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        with self.assertNumQueries(5):
+            # сессия, пользователь, подписки для ключа фрагмента (граф
+            # при пустом кеше), лента, теги постов
+            self.reader_client.get(reverse('posts:follow_index'))
+
+    def test_rebuild_command(self):
+        """Команда rebuild_feeds восстанавливает ленты с нуля"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        FeedEntry.objects.all().delete()
+        call_command('rebuild_feeds', stdout=StringIO())
+        self.assertEqual(self.feed_ids(), [self.old_post.id])
+
+    def test_rebuild_queries(self):
+        """Пересборка читает посты пачкой подписок, а не по одной"""
+        for user in (self.reader, self.other):
+            Follow.objects.create(user=user, author=self.author)
+        Follow.objects.create(user=self.reader, author=self.other)
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEqual(feeds.rebuild(), 3)
+        # удаление, подписки, последние посты авторов, вставка
+        self.assertLessEqual(len(captured), 6)
+        self.assertEqual(FeedEntry.objects.count(), 3)
+
+    @override_settings(FEED_BACKFILL_LIMIT=2)
+    def test_migration_respects_limit(self):
+        """Миграция заполняет ленты не глубже FEED_BACKFILL_LIMIT"""
+        posts = [Post.objects.create(author=self.author, text=str(number))
+                 for number in range(3)]
+        Follow.objects.create(user=self.reader, author=self.author)
+        FeedEntry.objects.all().delete()
+        migration = import_module('posts.migrations.0009_feedentry')
+        migration.fill_feeds(apps, None)
+        self.assertEqual(
+            self.feed_ids(), [posts[2].id, posts[1].id])
+
+
+@override_settings(FEED_PULL_THRESHOLD=2, PAGE_CACHE_TIMEOUTS={})
+@override_settings(QUERY_BUDGET_RAISE=True)
+class HybridFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user('reader')
+        cls.fan = User.objects.create_user('fan')
+        cls.star = User.objects.create_user('star')
+        cls.author = User.objects.create_user('author')
+        for user in (cls.reader, cls.fan):
+            Follow.objects.create(user=user, author=cls.star)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.posts = [
+            Post.objects.create(
+                author=cls.star if number % 2 else cls.author,
+                text=f'пост {number}')
+            for number in range(PAGE_LIMIT + 3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        feeds.rebalance()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def expected(self):
+        return list(Post.objects.filter(
+            author__in=(self.star, self.author)).order_by(
+            '-created', '-id').values_list('id', flat=True))
+
+    def walk(self):
+        """Все посты ленты по ссылкам "Следующая" и обратно."""
+        url = reverse('posts:follow_index')
+        pages = [self.client.get(url).context['page_obj']]
+        while pages[-1].has_next():
+            pages.append(self.client.get(
+                url + pages[-1].next_link).context['page_obj'])
+        back = self.client.get(
+            url + pages[-1].previous_link).context['page_obj']
+        self.assertEqual(
+            [post.id for post in back], [post.id for post in pages[-2]])
+        return [post.id for page in pages for post in page]
+
+    def test_star_is_pulled(self):
+        """Посты автора выше порога не пишутся в ленты"""
+        self.assertEqual(feeds.pull_authors(), {self.star.pk})
+        self.assertFalse(
+            FeedEntry.objects.filter(author=self.star).exists())
+        Post.objects.create(author=self.star, text='новый')
+        self.assertFalse(
+            FeedEntry.objects.filter(author=self.star).exists())
+
+    def test_merge_pages(self):
+        """Материализованные и прочитанные посты сливаются по времени"""
+        self.assertEqual(self.walk(), self.expected())
+
+    @override_settings(FEED_BACKFILL_LIMIT=3)
+    def test_deeper_than_recent(self):
+        """За пределами кешированного списка посты читаются из БД"""
+        self.assertEqual(self.walk(), self.expected())
+
+    @override_settings(FEED_BACKFILL_LIMIT=0)
+    def test_no_recent(self):
+        """Без списков последних постов всё читается из БД"""
+        self.assertEqual(self.walk(), self.expected())
+
+    def test_cursor_wrong_key(self):
+        """Токен с чужим ключом отдаёт первую страницу ленты"""
+        url = reverse('posts:follow_index')
+        first = self.client.get(url).context['page_obj']
+        for values in ([1, 2], [1, 2, 3], ['x', 1]):
+            with self.subTest(values=values):
+                response = self.client.get(
+                    url, {'cursor': encode_cursor(values, 'n')})
+                self.assertEqual(
+                    list(response.context['page_obj']), list(first))
+
+    @override_settings(FEED_BACKFILL_LIMIT=3)
+    def test_queries_per_author(self):
+        """Число запросов не растёт с числом pull-авторов в ленте"""
+        url = reverse('posts:follow_index')
+        with CaptureQueriesContext(connection) as one:
+            self.client.get(url)
+        for name in ('star2', 'star3'):
+            star = User.objects.create_user(name)
+            for user in (self.reader, self.fan):
+                Follow.objects.create(user=user, author=star)
+            for number in range(4):
+                Post.objects.create(author=star, text=f'{name} {number}')
+        feeds.rebalance()
+        cache.clear()
+        with CaptureQueriesContext(connection) as many:
+            self.client.get(url)
+        self.assertEqual(len(feeds.pull_authors()), 3)
+        self.assertEqual(len(many), len(one))
+
+    def test_new_post_visible(self):
+        """Новый пост pull-автора сразу виден в закешированной ленте"""
+        self.walk()
+        post = Post.objects.create(author=self.star, text='свежий')
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['page_obj'][0].id, post.id)
+        self.assertContains(response, 'свежий')
+
+    def test_back_to_push(self):
+        """Когда подписчиков мало, автор возвращается в push"""
+        Follow.objects.filter(author=self.star).delete()
+        Follow.objects.create(user=self.reader, author=self.star)
+        feeds.rebalance(threshold=4)
+        self.assertEqual(feeds.pull_authors(), frozenset())
+        self.assertEqual(
+            FeedEntry.objects.filter(author=self.star).count(),
+            (PAGE_LIMIT + 3) // 2)
+        self.assertEqual(self.walk(), self.expected())
+
+    def test_rebalance_command(self):
+        """rebalance_feeds сообщает о переводах"""
+        out = StringIO()
+        call_command('rebalance_feeds', '--threshold=10', stdout=out)
+        self.assertIn('в push: 1', out.getvalue())
@@ -0,0 +1,238 @@
+import io
+import os
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from posts import feeds, follows, stats
+from posts.models import FeedEntry, Follow, Group, Post, User, UserStats
+
+from .utils import run_commit_hooks
+
+
+class FollowTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def follow_url(self, username):
+        return reverse('posts:profile_follow', args=[username])
+
+    def unfollow_url(self, username):
+        return reverse('posts:profile_unfollow', args=[username])
+
+    def test_follow_and_unfollow(self):
+        """Подписка и отписка ведут ленту и счётчики"""
+        response = self.client.get(self.follow_url('author'))
+        self.assertRedirects(
+            response, reverse('posts:profile', args=['author']))
+        self.assertTrue(Follow.objects.filter(
+            user=self.reader, author=self.author).exists())
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.reader, post=self.post).exists())
+        self.assertEqual(UserStats.objects.get(user=self.author).followers, 1)
+        self.client.get(self.unfollow_url('author'))
+        self.assertFalse(Follow.objects.exists())
+        self.assertFalse(FeedEntry.objects.filter(user=self.reader).exists())
+        self.assertEqual(UserStats.objects.get(user=self.author).followers, 0)
+
+    def test_repeat_is_one_statement(self):
+        """Повторная подписка и лишняя отписка - один запрос без изменений"""
+        follows.follow(self.reader, 'author')
+        queries = 3 if follows.supports_returning() else 4
+        with self.assertNumQueries(queries):
+            # savepoint, INSERT ... ON CONFLICT DO NOTHING, release
+            self.assertIsNone(follows.follow(self.reader, 'author'))
+        follows.unfollow(self.reader, 'author')
+        with self.assertNumQueries(queries):
+            self.assertIsNone(follows.unfollow(self.reader, 'author'))
+        self.assertEqual(UserStats.objects.get(user=self.author).followers, 0)
+
+    def test_unknown_and_self(self):
+        """Неизвестный автор и подписка на себя ничего не создают"""
+        for username in ('nobody', 'reader'):
+            with self.subTest(username=username):
+                response = self.client.get(self.follow_url(username))
+                self.assertEqual(response.status_code, 302)
+                response = self.client.get(self.unfollow_url(username))
+                self.assertEqual(response.status_code, 302)
+        self.assertFalse(Follow.objects.exists())
+
+
+class BulkFollowTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author{number}')
+            for number in range(5)
+        ]
+        for author in cls.authors:
+            Post.objects.create(author=author, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_bulk_follow(self):
+        """Пачки пропускают дубли, себя и уже существующие подписки"""
+        Follow.objects.create(user=self.reader, author=self.authors[0])
+        pairs = [(self.reader.pk, author.pk) for author in self.authors]
+        pairs += [(self.reader.pk, self.reader.pk), pairs[1]]
+        self.assertEqual(follows.bulk_follow(pairs, batch_size=2), 4)
+        self.assertEqual(follows.bulk_follow(pairs, batch_size=2), 0)
+        self.assertEqual(
+            Follow.objects.filter(user=self.reader).count(), 5)
+        self.assertEqual(
+            FeedEntry.objects.filter(user=self.reader).count(), 5)
+        self.assertEqual(
+            UserStats.objects.get(user=self.reader).following, 5)
+        self.assertEqual(
+            UserStats.objects.get(user=self.authors[3]).followers, 1)
+
+    def test_batch_queries(self):
+        """Число запросов пачки не зависит от числа подписок в ней"""
+        readers = [
+            User.objects.create_user(username=f'reader{number}')
+            for number in range(2)
+        ]
+        counts = []
+        feeds.pull_authors()
+        for reader, authors in zip(readers, (self.authors[:2], self.authors)):
+            stats.for_user(reader)
+            with CaptureQueriesContext(connection) as captured:
+                follows.bulk_follow(
+                    (reader.pk, author.pk) for author in authors)
+            counts.append(len(captured))
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(
+            FeedEntry.objects.filter(user=readers[1]).count(), 5)
+
+    def test_concurrent_rows_not_counted(self):
+        """Строки, вставленные в обход bulk_follow, не сдвигают счётчики"""
+        author = self.authors[0]
+        stats.for_user(author)
+        Follow.objects.bulk_create(
+            [Follow(user=self.reader, author=author)])
+        self.assertEqual(
+            follows.bulk_follow([(self.reader.pk, author.pk)]), 0)
+        self.assertEqual(UserStats.objects.get(user=author).followers, 0)
+
+    def test_without_returning(self):
+        """Без RETURNING вставленные строки определяются построчно"""
+        Follow.objects.create(user=self.reader, author=self.authors[0])
+        pairs = [(self.reader.pk, author.pk) for author in self.authors]
+        with mock.patch.object(
+                follows, 'supports_returning', return_value=False):
+            self.assertEqual(follows.bulk_follow(pairs), 4)
+        self.assertEqual(
+            UserStats.objects.get(user=self.reader).following, 5)
+
+    def test_api(self):
+        """POST /api/v1/follow/bulk/ подписывает на список имён"""
+        client = APIClient()
+        client.force_authenticate(self.reader)
+        url = reverse('api:follow-bulk')
+        response = client.post(
+            url, {'following': ['author1', 'author2', 'nobody']},
+            format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'created': 2})
+        response = client.post(url, {'following': []}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            APIClient().post(url, {'following': ['author1']},
+                             format='json').status_code,
+            403)
+
+    def test_command(self):
+        """import_follows читает CSV и пропускает неизвестные имена"""
+        rows = '\n'.join(
+            [f'reader,{author.username}' for author in self.authors]
+            + ['author0,author1', 'reader,nobody', 'broken'])
+        path = self.csv_file(rows)
+        out = io.StringIO()
+        call_command('import_follows', path, '--batch-size=3', stdout=out)
+        self.assertIn('Создано подписок: 6, пропущено строк: 2',
+                      out.getvalue())
+        self.assertEqual(Follow.objects.count(), 6)
+
+    def csv_file(self, content):
+        handle = tempfile.NamedTemporaryFile(
+            'w', suffix='.csv', delete=False)
+        self.addCleanup(os.remove, handle.name)
+        with handle:
+            handle.write(content)
+        return handle.name
+
+
+@override_settings(PAGE_CACHE_TIMEOUTS={})
+class CardFollowStateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.authors = [
+            User.objects.create_user(username=f'author{number}')
+            for number in range(4)
+        ]
+        for author in cls.authors:
+            Post.objects.create(
+                author=author, group=cls.group, text=f'Пост {author}')
+        Follow.objects.create(user=cls.reader, author=cls.authors[0])
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_cards_show_follow_state(self):
+        """Карточки index, группы и поиска знают о подписках зрителя"""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=['group']),
+            reverse('posts:search') + '?q=Пост',
+        )
+        follow_link = reverse('posts:profile_follow', args=['author1'])
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(
+                    set(response.context['followed_authors']),
+                    {self.authors[0].pk})
+                self.assertContains(response, 'вы подписаны', count=1)
+                self.assertContains(response, follow_link)
+
+    def test_no_follow_queries_per_card(self):
+        """Подписки зрителя читаются не больше одного раза на страницу"""
+        with CaptureQueriesContext(connection) as cold:
+            self.client.get(reverse('posts:index'))
+        with CaptureQueriesContext(connection) as warm:
+            self.client.get(reverse('posts:group_list', args=['group']))
+        for captured, expected in ((cold, 1), (warm, 0)):
+            follow_queries = [
+                query for query in captured.captured_queries
+                if 'posts_follow' in query['sql']]
+            self.assertEqual(len(follow_queries), expected)
+
+    def test_follow_refreshes_cached_cards(self):
+        """После подписки закешированный фрагмент ленты перестраивается"""
+        url = reverse('posts:index')
+        self.assertContains(self.client.get(url), 'вы подписаны', count=1)
+        follows.follow(self.reader, 'author2')
+        run_commit_hooks()
+        self.assertContains(self.client.get(url), 'вы подписаны', count=2)
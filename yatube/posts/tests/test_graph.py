@@ -0,0 +1,177 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError, transaction
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from posts import follows, graph
+from posts.models import Follow, User
+
+from .utils import run_commit_hooks
+
+
+class FollowGraphTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = {
+            name: User.objects.create_user(username=name)
+            for name in ('me', 'friend', 'star', 'fan', 'other')
+        }
+        pairs = (
+            ('me', 'friend'), ('friend', 'me'), ('me', 'star'),
+            ('friend', 'star'), ('friend', 'other'), ('star', 'other'),
+            ('fan', 'me'),
+        )
+        for user, author in pairs:
+            Follow.objects.create(
+                user=cls.users[user], author=cls.users[author])
+
+    def setUp(self):
+        cache.clear()
+
+    def id(self, name):
+        return self.users[name].pk
+
+    def test_lists_and_flags(self):
+        """Массивы отсортированы, флаги и пересечения по ним"""
+        me = self.id('me')
+        self.assertEqual(
+            list(graph.following(me)),
+            sorted([self.id('friend'), self.id('star')]))
+        self.assertEqual(
+            graph.follows_you(me, [self.id('friend'), self.id('star')]),
+            {self.id('friend')})
+        self.assertEqual(graph.mutual(me), [self.id('friend')])
+        self.assertEqual(
+            graph.followed_by_followings(me, self.id('other')),
+            sorted([self.id('friend'), self.id('star')]))
+        self.assertEqual(
+            graph.suggestions(me), [(self.id('other'), 2)])
+
+    def test_cached_reads(self):
+        """Загруженные массивы читаются без запросов к БД"""
+        graph.following(self.id('me'))
+        with self.assertNumQueries(0):
+            graph.following(self.id('me'))
+        graph.rebuild()
+        with self.assertNumQueries(0):
+            graph.followers(self.id('other'))
+            graph.following(self.id('other'))
+
+    def test_incremental_updates(self):
+        """После коммита подписки правят массивы обеих сторон"""
+        me, fan = self.id('me'), self.id('fan')
+        graph.followers(me)
+        graph.following(fan)
+        follow = Follow.objects.get(user_id=fan, author_id=me)
+        follow.delete()
+        # до коммита в кеше прежние массивы
+        self.assertIn(fan, graph.followers(me))
+        run_commit_hooks()
+        self.assertNotIn(fan, graph.followers(me))
+        follows.follow(self.users['fan'], 'me')
+        follows.bulk_follow([(fan, self.id('star'))])
+        run_commit_hooks()
+        with self.assertNumQueries(0):
+            self.assertIn(fan, graph.followers(me))
+            self.assertEqual(
+                list(graph.following(fan)), sorted([me, self.id('star')]))
+
+    def test_conflict_drops_array(self):
+        """Массив, который правит другой процесс, сбрасывается"""
+        me, fan = self.id('me'), self.id('fan')
+        graph.followers(me)
+        key = graph.graph_key(graph.FOLLOWERS, me)
+        cache.add(graph.lock_key(key), 1)
+        Follow.objects.get(user_id=fan, author_id=me).delete()
+        run_commit_hooks()
+        self.assertIsNone(cache.get(key))
+        self.assertNotIn(fan, graph.followers(me))
+
+    def test_load_racing_follow(self):
+        """Загрузка, разминувшаяся с подпиской, не остаётся в кеше"""
+        fan, star = self.id('fan'), self.id('star')
+        query = graph._query
+
+        def racing(kind, user_ids):
+            rows = query(kind, user_ids)
+            follows.follow(self.users['fan'], 'star')
+            run_commit_hooks()
+            return rows
+
+        with mock.patch.object(graph, '_query', racing):
+            self.assertNotIn(star, graph.following(fan))
+        self.assertIsNone(cache.get(graph.graph_key(graph.FOLLOWING, fan)))
+        self.assertIn(star, graph.following(fan))
+
+    def test_rollback_keeps_cache(self):
+        """Откаченная подписка не попадает в кеш"""
+        fan = self.id('fan')
+        graph.following(fan)
+        with self.assertRaises(DatabaseError):
+            with transaction.atomic():
+                follows.follow(self.users['fan'], 'other')
+                raise DatabaseError
+        run_commit_hooks()
+        self.assertEqual(list(graph.following(fan)), [self.id('me')])
+
+    def test_rebuild_command(self):
+        """rebuild_follow_graph загружает все связи"""
+        out = StringIO()
+        call_command('rebuild_follow_graph', stdout=out)
+        self.assertIn('подписок: 7', out.getvalue())
+
+    def test_paginator(self):
+        """Курсор листает массив id от новых к старым и обратно"""
+        ids = list(range(1, 8))
+        paginator = graph.GraphPaginator(ids, 3)
+        first = paginator.get_page(None)
+        self.assertEqual(first.object_list, [7, 6, 5])
+        second = paginator.get_page(first.next_cursor)
+        self.assertEqual(second.object_list, [4, 3, 2])
+        last = paginator.get_page(second.next_cursor)
+        self.assertEqual(last.object_list, [1])
+        self.assertFalse(last.has_next())
+        self.assertEqual(
+            paginator.get_page(last.previous_cursor).object_list, [4, 3, 2])
+
+    @override_settings(PAGE_CACHE_TIMEOUTS={})
+    def test_pages(self):
+        """Страницы подписчиков и подписок, флаги на профиле"""
+        client = Client()
+        client.force_login(self.users['me'])
+        response = client.get(
+            reverse('posts:profile_followers', args=['me']))
+        self.assertEqual(
+            [user.username for user in response.context['page_obj']],
+            ['fan', 'friend'])
+        self.assertEqual(
+            response.context['you_follow'], {self.id('friend')})
+        self.assertEqual(
+            response.context['follows_you'],
+            {self.id('fan'), self.id('friend')})
+        response = client.get(reverse('posts:profile', args=['friend']))
+        self.assertTrue(response.context['following'])
+        self.assertTrue(response.context['follows_you'])
+        response = client.get(reverse('posts:profile', args=['other']))
+        self.assertEqual(
+            response.context['known'],
+            sorted([self.id('friend'), self.id('star')]))
+        self.assertEqual(
+            self.client.get(reverse(
+                'posts:profile_following', args=['nobody'])).status_code,
+            404)
+
+    def test_api(self):
+        """Взаимные подписки и рекомендации в API"""
+        client = APIClient()
+        client.force_authenticate(self.users['me'])
+        response = client.get(reverse('api:follow-mutual'))
+        self.assertEqual(response.json()['results'], ['friend'])
+        response = client.get(reverse('api:follow-suggestions'))
+        self.assertEqual(
+            response.json(), [{'username': 'other', 'followed_by': 2}])
@@ -0,0 +1,80 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from ..caching import generation
+from ..invalidation import tags_for
+from ..models import Comment, Follow, Group, Post, Tag, TagPost, User
+
+
+class InvalidationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user('author')
+        cls.reader = User.objects.create_user('reader')
+        cls.group = Group.objects.create(title='Группа', slug='first')
+        cls.group_2 = Group.objects.create(title='Группа 2', slug='second')
+        cls.post = Post.objects.create(
+            author=cls.author, text='пост', group=cls.group)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def assertBumped(self, tags, action):
+        before = {tag: generation(*tag) for tag in tags}
+        action()
+        for tag in tags:
+            with self.subTest(tag=tag):
+                self.assertNotEqual(generation(*tag), before[tag])
+
+    def test_post_edit(self):
+        """Правка поста сдвигает обе группы, ленты и страницу поста"""
+        post = Post.objects.get(pk=self.post.pk)
+
+        def move():
+            post.group = self.group_2
+            post.save()
+
+        self.assertBumped([
+            ('index',), ('group', 'first'), ('group', 'second'),
+            ('profile', self.author.pk), ('author', self.author.pk),
+            ('post', post.pk), ('counters', self.author.pk),
+        ], move)
+
+    def test_post_edit_not_per_follower(self):
+        """Правка поста не сдвигает ленты подписчиков по одной"""
+        for number in range(3):
+            Follow.objects.create(
+                user=User.objects.create_user(f'fan{number}'),
+                author=self.author)
+        post = Post.objects.get(pk=self.post.pk)
+        with self.assertNumQueries(2):
+            # слаги групп и теги поста, без списка подписчиков
+            tags = tags_for(post)
+        self.assertFalse([tag for tag in tags if tag[0] == 'follow'])
+
+    def test_comment(self):
+        """Комментарий сдвигает страницу поста и счётчики"""
+        self.assertBumped(
+            [('post', self.post.pk), ('counters', self.reader.pk)],
+            lambda: Comment.objects.create(
+                post=self.post, author=self.reader, text='к'),
+        )
+
+    def test_follow(self):
+        """Подписка сдвигает ленту читателя и счётчики обоих"""
+        other = User.objects.create_user('other')
+        self.assertBumped(
+            [('follow', other.pk), ('counters', other.pk),
+             ('counters', self.author.pk)],
+            lambda: Follow.objects.create(user=other, author=self.author),
+        )
+
+    def test_tagpost(self):
+        """Тег поста сдвигает страницу поста и его ленты"""
+        tag = Tag.objects.create(name='тег')
+        self.assertBumped(
+            [('post', self.post.pk), ('index',), ('group', 'first')],
+            lambda: TagPost.objects.create(tag=tag, post=self.post),
+        )
@@ -0,0 +1,45 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts import query_plans
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username='author')
+        reader = User.objects.create_user(username='reader')
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        Follow.objects.create(user=reader, author=author)
+        for number in range(3):
+            post = Post.objects.create(
+                author=author, group=group, text=f'Пост {number}')
+            Comment.objects.create(post=post, author=reader, text='Ок')
+
+    def test_feeds_use_indexes(self):
+        """Ни одна лента не читает таблицу целиком и не сортирует"""
+        for name, (plan, problems) in query_plans.check().items():
+            with self.subTest(feed=name):
+                self.assertEqual(problems, [], plan)
+
+    def test_problems_detected(self):
+        """Полный просмотр и временное B-дерево считаются проблемой"""
+        plan = (
+            '2 0 0 SCAN posts_post\n'
+            '5 0 0 SCAN TABLE posts_post USING INDEX post_created_idx\n'
+            '9 0 0 USE TEMP B-TREE FOR ORDER BY'
+        )
+        self.assertEqual(
+            query_plans.problems(plan, 'sqlite'),
+            ['2 0 0 SCAN posts_post', '9 0 0 USE TEMP B-TREE FOR ORDER BY'],
+        )
+
+    def test_command(self):
+        """Команда explain_feeds проходит на текущей схеме"""
+        out = StringIO()
+        call_command('explain_feeds', stdout=out)
+        self.assertIn('по индексам', out.getvalue())
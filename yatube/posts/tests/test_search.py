@@ -0,0 +1,131 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import search
+from posts.models import Comment, Group, Post, Tag, TagPost, User
+from posts.search.sqlite import SQLiteSearch
+from posts.search.stemmer import stem
+from yatube.settings import PAGE_LIMIT
+
+
+class StemmerTests(TestCase):
+    def test_snowball(self):
+        """Словоформы сводятся к одной основе"""
+        cases = {
+            'вагонов': 'вагон',
+            'важнейшими': 'важн',
+            'красивая': 'красив',
+            'гуляя': 'гул',
+            'Ёлки': 'елк',
+            'Python': 'python',
+        }
+        for word, expected in cases.items():
+            with self.subTest(word=word):
+                self.assertEqual(stem(word), expected)
+
+
+@override_settings(QUERY_BUDGET_RAISE=True)
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.tag = Tag.objects.create(name='кошки')
+        cls.cats = Post.objects.create(
+            author=cls.author, group=cls.group,
+            text='Мои кошки любят гулять по крыше')
+        TagPost.objects.create(tag=cls.tag, post=cls.cats)
+        cls.dogs = Post.objects.create(
+            author=cls.other, text='Собака гуляла в парке')
+        cls.commented = Post.objects.create(
+            author=cls.other, text='Просто пост без слов из запроса')
+        Comment.objects.create(
+            post=cls.commented, author=cls.author, text='А у меня кошка')
+
+    def setUp(self):
+        cache.clear()
+
+    def found(self, **params):
+        response = self.client.get(reverse('posts:search'), params)
+        return [post.pk for post in response.context['page_obj']]
+
+    def test_russian_forms(self):
+        """Разные формы слова находят одни и те же посты"""
+        self.assertEqual(set(self.found(q='кошкам')),
+                         {self.cats.pk, self.commented.pk})
+        self.assertEqual(set(self.found(q='гулять')),
+                         {self.cats.pk, self.dogs.pk})
+
+    def test_post_outranks_comment(self):
+        """Совпадение в тексте поста выше совпадения в комментарии"""
+        self.assertEqual(self.found(q='кошка'),
+                         [self.cats.pk, self.commented.pk])
+
+    def test_filters(self):
+        """Фильтры по группе, автору и тегу"""
+        self.assertEqual(self.found(q='гулять', group='group'),
+                         [self.cats.pk])
+        self.assertEqual(self.found(q='гулять', author='other'),
+                         [self.dogs.pk])
+        self.assertEqual(self.found(q='гулять', tag='кошки'),
+                         [self.cats.pk])
+        self.assertEqual(self.found(q='гулять', tag='нет-такого'), [])
+
+    def test_index_follows_changes(self):
+        """Индекс обновляется при правке и удалении"""
+        dogs = Post.objects.get(pk=self.dogs.pk)
+        dogs.text = 'Теперь про попугаев'
+        dogs.save()
+        self.assertEqual(self.found(q='собака'), [])
+        self.assertEqual(self.found(q='попугай'), [dogs.pk])
+        Comment.objects.filter(post=self.commented).delete()
+        self.assertEqual(self.found(q='кошка'), [self.cats.pk])
+        Post.objects.get(pk=self.cats.pk).delete()
+        self.assertEqual(self.found(q='кошка'), [])
+
+    def test_garbage_query(self):
+        """Операторы FTS в запросе не ломают поиск"""
+        for query in ('"', 'AND OR NOT', '*', 'кош"ка NEAR(', ''):
+            with self.subTest(query=query):
+                response = self.client.get(
+                    reverse('posts:search'), {'q': query})
+                self.assertEqual(response.status_code, 200)
+
+    def test_rebuild_batches(self):
+        """Пересборка пишет индекс пачками, без index() на документ"""
+        single = mock.patch.object(
+            SQLiteSearch, 'index', side_effect=AssertionError)
+        with single:
+            self.assertEqual(search.rebuild(batch_size=2), 4)
+        self.assertEqual(
+            set(self.found(q='кошки')), {self.cats.pk, self.commented.pk})
+
+    def test_cursor_pages(self):
+        """Курсор обходит всю выдачу без повторов"""
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Пост с кошками {number}')
+            for number in range(PAGE_LIMIT + 3)
+        )
+        search.rebuild()
+        client = Client()
+        seen = []
+        url = reverse('posts:search_api')
+        params = {'q': 'кошки'}
+        while True:
+            data = client.get(url, params).json()
+            seen.extend(row['id'] for row in data['results'])
+            if not data['next']:
+                break
+            params['cursor'] = data['next']
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertEqual(len(seen), PAGE_LIMIT + 3 + 2)
+        ranks = client.get(url, {'q': 'кошки'}).json()['results']
+        self.assertEqual(
+            [row['rank'] for row in ranks],
+            sorted((row['rank'] for row in ranks), reverse=True),
+        )
@@ -0,0 +1,78 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import TestCase
+from django.urls import reverse
+
+from .. import stats
+from ..models import Comment, Follow, Post, User, UserStats
+
+
+class UserStatsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user('author')
+        cls.reader = User.objects.create_user('reader')
+
+    def setUp(self):
+        cache.clear()
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_counters_follow_changes(self):
+        """Счётчики меняются вместе с постами, подписками, комментариями"""
+        post = Post.objects.create(author=self.author, text='пост')
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        Comment.objects.create(post=post, author=self.reader, text='к')
+        self.assertEqual(self.stats(self.author).posts, 1)
+        self.assertEqual(self.stats(self.author).followers, 1)
+        self.assertEqual(self.stats(self.reader).following, 1)
+        self.assertEqual(self.stats(self.reader).comments, 1)
+        follow.delete()
+        post.delete()
+        self.assertEqual(self.stats(self.author).posts, 0)
+        self.assertEqual(self.stats(self.author).followers, 0)
+        self.assertEqual(self.stats(self.reader).following, 0)
+        self.assertEqual(self.stats(self.reader).comments, 0)
+
+    def test_counter_in_write_transaction(self):
+        """Сбой сдвига счётчика откатывает и саму запись"""
+        failing = mock.patch.object(
+            stats, 'change', side_effect=DatabaseError)
+        with failing, self.assertRaises(DatabaseError):
+            Post.objects.create(author=self.author, text='без счётчика')
+        self.assertFalse(Post.objects.filter(text='без счётчика').exists())
+        post = Post.objects.create(author=self.author, text='пост')
+        with failing, self.assertRaises(DatabaseError):
+            Comment.objects.create(post=post, author=self.reader, text='к')
+        self.assertFalse(Comment.objects.exists())
+
+    def test_profile_uses_stats(self):
+        """Профиль берёт счётчики из UserStats без COUNT по постам"""
+        Post.objects.create(author=self.author, text='пост')
+        Follow.objects.create(user=self.reader, author=self.author)
+        with self.assertNumQueries(3):
+            # пользователь вместе со статистикой, страница постов, теги
+            response = self.client.get(
+                reverse('posts:profile', args=(self.author.username,)))
+        self.assertEqual(response.context['count'], 1)
+        self.assertEqual(response.context['followers'], 1)
+
+    def test_reconcile_command(self):
+        """reconcile_stats чинит расхождения после массовой вставки"""
+        Post.objects.bulk_create(
+            Post(author=self.author, text=str(number))
+            for number in range(3)
+        )
+        UserStats.objects.filter(user=self.reader).delete()
+        out = StringIO()
+        call_command('reconcile_stats', stdout=out)
+        self.assertEqual(self.stats(self.author).posts, 3)
+        self.assertTrue(UserStats.objects.filter(user=self.reader).exists())
+        call_command('reconcile_stats', '--dry-run', stdout=out)
+        self.assertIn('Найдено строк: 0', out.getvalue())
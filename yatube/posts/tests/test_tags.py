@@ -0,0 +1,101 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts import tags
+from posts.models import Post, Tag, TagPost, User
+from yatube.settings import PAGE_LIMIT
+
+
+class NormalizeTests(TestCase):
+    def test_normalize(self):
+        """Имя тега приводится к одной форме"""
+        cases = {
+            '  #Котики  Дня ': 'котики дня',
+            'Python': 'python',
+            '#': '',
+            'x' * 40: 'x' * 32,
+        }
+        for name, expected in cases.items():
+            with self.subTest(name=name):
+                self.assertEqual(tags.normalize(name), expected)
+
+    def test_model_saves_normal_form(self):
+        """Tag.save хранит нормальную форму имени"""
+        self.assertEqual(Tag.objects.create(name='#Кошки').name, 'кошки')
+
+
+class ResolveTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        Tag.objects.create(name='кошки')
+
+    def test_existing_in_one_query(self):
+        """Существующие теги находятся одним запросом"""
+        with self.assertNumQueries(1):
+            found = tags.resolve(['#Кошки', 'кошки '])
+        self.assertEqual(list(found), ['кошки'])
+
+    def test_missing_created_in_bulk(self):
+        """Недостающие теги создаются одной пачкой"""
+        with self.assertNumQueries(3):
+            found = tags.resolve(['кошки', 'собаки', 'птицы', ''])
+        self.assertEqual(set(found), {'кошки', 'собаки', 'птицы'})
+        self.assertEqual(Tag.objects.count(), 3)
+
+    def test_attach(self):
+        """Привязка не дублирует связи и копирует дату поста"""
+        post = Post.objects.create(author=self.author, text='Текст')
+        tags.attach(post, ['Кошки', 'собаки'])
+        tags.attach(post, ['#кошки'])
+        links = TagPost.objects.filter(post=post)
+        self.assertEqual(links.count(), 2)
+        self.assertEqual({link.created for link in links}, {post.created})
+
+
+@override_settings(QUERY_BUDGET_RAISE=True)
+class TagFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.posts = [
+            Post.objects.create(author=cls.author, text=f'Пост {number}')
+            for number in range(PAGE_LIMIT + 2)
+        ]
+        for post in cls.posts:
+            tags.attach(post, ['кошки'])
+        cls.untagged = Post.objects.create(author=cls.author, text='Без')
+        cls.tag = Tag.objects.get(name='кошки')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feed_pages(self):
+        """Лента тега листается курсором от новых постов к старым"""
+        url = reverse('posts:tag_posts', args=['#Кошки'])
+        first = self.client.get(url).context['page_obj']
+        expected = [post.pk for post in reversed(self.posts)]
+        self.assertEqual([post.pk for post in first], expected[:PAGE_LIMIT])
+        second = self.client.get(first.next_link).context['page_obj']
+        self.assertEqual([post.pk for post in second], expected[PAGE_LIMIT:])
+
+    def test_unknown_tag(self):
+        """Неизвестный тег даёт 404"""
+        response = self.client.get(
+            reverse('posts:tag_posts', args=['собаки']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_cards_link_tags(self):
+        """Карточки в лентах ссылаются на ленты своих тегов"""
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(
+            response, reverse('posts:tag_posts', args=['кошки']))
+
+    def test_new_link_resets_cache(self):
+        """Новая привязка сбрасывает закешированную ленту тега"""
+        url = reverse('posts:tag_posts', args=['кошки'])
+        self.client.get(url)
+        tags.attach(self.untagged, ['кошки'])
+        response = self.client.get(url)
+        self.assertContains(response, 'Без')
@@ -0,0 +1,130 @@
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts.models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def image_file(name='image.jpg', size=(200, 100), color=(200, 10, 10)):
+    buffer = io.BytesIO()
+    exif = Image.Exif()
+    exif[0x010F] = 'Камера'
+    Image.new('RGB', size, color).save(buffer, 'JPEG', exif=exif)
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/jpeg')
+
+
+def storage_name(url):
+    return url[len(settings.MEDIA_URL):]
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, TASK_QUEUE='sync')
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def create_post(self, text='Пост с картинкой', **kwargs):
+        self.client.post(reverse('posts:post_create'), data={
+            'text': text, 'image': image_file(**kwargs)})
+        return Post.objects.get(text=text)
+
+    def test_renditions_built_on_create(self):
+        """После сохранения формы есть все ширины и форматы без EXIF"""
+        post = self.create_post()
+        self.assertEqual(
+            set(post.renditions), set(settings.POST_RENDITION_FORMATS))
+        with default_storage.open(storage_name(post.image_card)) as card:
+            image = Image.open(card)
+            self.assertEqual(image.size, settings.POST_CARD_SIZE)
+            self.assertEqual(len(image.getexif()), 0)
+        for fmt, urls in post.renditions.items():
+            with self.subTest(fmt=fmt):
+                self.assertEqual(
+                    [width for width, _ in urls],
+                    sorted(settings.POST_RENDITION_WIDTHS),
+                )
+                for _, url in urls:
+                    self.assertTrue(
+                        default_storage.exists(storage_name(url)))
+
+    def test_duplicates_share_files(self):
+        """Одинаковые загрузки ссылаются на одни и те же файлы"""
+        first = self.create_post('Первый')
+        second = self.create_post('Второй', name='copy.jpg')
+        self.assertNotEqual(first.image.name, second.image.name)
+        self.assertEqual(first.renditions, second.renditions)
+
+    def test_feed_renders_without_pillow(self):
+        """Лента подставляет готовые URL и не трогает Pillow"""
+        post = self.create_post()
+        with mock.patch.object(Image, 'open', side_effect=AssertionError):
+            response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, post.image_card)
+        self.assertContains(response, 'type="image/webp"')
+
+    def test_picture_tag(self):
+        """Тег выводит srcset по ширинам и запасной исходный файл"""
+        post = self.create_post()
+        template = Template('{% load post_images %}{% post_picture post %}')
+        html = template.render(Context({'post': post}))
+        webp = post.renditions['webp']
+        self.assertIn(f'{webp[0][1]} {webp[0][0]}w', html)
+        self.assertIn(f'src="{post.image_card}"', html)
+        Post.objects.filter(pk=post.pk).update(
+            image_card='', image_renditions='')
+        post.refresh_from_db()
+        html = template.render(Context({'post': post}))
+        self.assertIn(f'src="{post.image.url}"', html)
+        self.assertNotIn('<picture>', html)
+
+    def test_edit_and_prune(self):
+        """Новая картинка - новые копии; старые убирает prune"""
+        post = self.create_post()
+        old = storage_name(post.image_card)
+        self.client.post(
+            reverse('posts:post_edit', args=(post.pk,)),
+            data={'text': post.text, 'image': image_file(color=(1, 2, 3))},
+        )
+        post.refresh_from_db()
+        self.assertNotEqual(storage_name(post.image_card), old)
+        call_command('regenerate_thumbnails', workers=1, missing_only=True,
+                     prune=True, stdout=io.StringIO())
+        self.assertFalse(default_storage.exists(old))
+        self.assertTrue(default_storage.exists(storage_name(post.image_card)))
+
+    def test_regenerate_command(self):
+        """Команда восстанавливает потерянные копии"""
+        post = self.create_post()
+        name = storage_name(post.image_card)
+        os.remove(default_storage.path(name))
+        Post.objects.filter(pk=post.pk).update(
+            image_card='', image_renditions='')
+        call_command('regenerate_thumbnails', workers=1, missing_only=True,
+                     stdout=io.StringIO())
+        post.refresh_from_db()
+        self.assertTrue(default_storage.exists(name))
+        self.assertEqual(post.image_card, default_storage.url(name))
@@ -0,0 +1,84 @@
+import io
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts import uploads
+from posts.models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def image_file(name='image.png', size=(200, 100), fmt='PNG'):
+    buffer = io.BytesIO()
+    Image.effect_noise(size, 64).convert('RGB').save(buffer, fmt)
+    return SimpleUploadedFile(name, buffer.getvalue(), f'image/{fmt}')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, TASK_QUEUE='sync')
+class UploadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def upload(self, image, text='Пост с картинкой'):
+        return self.client.post(reverse('posts:post_create'), data={
+            'text': text, 'image': image})
+
+    def assertRejected(self, response, message):
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(message, response.context['form'].errors['image'][0])
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(POST_IMAGE_MAX_BYTES=1000)
+    def test_oversize_file(self):
+        """Файл сверх лимита обрывается и даёт ошибку поля"""
+        self.assertRejected(self.upload(image_file()), 'Файл больше')
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=100 * 99)
+    def test_too_many_pixels(self):
+        """Число пикселей проверяется по заголовку"""
+        self.assertRejected(
+            self.upload(image_file()), 'Слишком большое изображение')
+
+    def test_unsupported_format(self):
+        """Форматы вне списка не принимаются"""
+        self.assertRejected(
+            self.upload(image_file('image.bmp', fmt='BMP')),
+            'не поддерживается',
+        )
+
+    @override_settings(POST_IMAGE_MAX_SIDE=50)
+    def test_downsample(self):
+        """Большой оригинал сохраняется уменьшенным"""
+        self.upload(image_file('photo.jpg', fmt='JPEG'))
+        post = Post.objects.get()
+        with post.image.open() as stored:
+            self.assertEqual(Image.open(stored).size, (50, 25))
+
+    def test_daily_quota(self):
+        """Суточный лимит считается по сохранённым байтам"""
+        self.upload(image_file(), text='Первый')
+        used = uploads.quota_used(self.user.pk)
+        self.assertEqual(used, Post.objects.get().image.size)
+        with override_settings(POST_UPLOAD_DAILY_QUOTA=used + 10):
+            response = self.upload(image_file(), text='Второй')
+        self.assertIn(
+            'лимит', response.context['form'].errors['image'][0])
+        self.assertEqual(Post.objects.count(), 1)
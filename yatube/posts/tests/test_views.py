@@ -5,12 +5,15 @@ from django import forms
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from posts.models import Post, Group, Follow, User
+from posts.models import Comment, Post, Group, Follow, User
 from posts.forms import PostForm
-from yatube.settings import PAGE_LIMIT
+from posts.utils import encode_cursor
+from yatube.settings import COMMENTS_PAGE_LIMIT, PAGE_LIMIT
 
 NUMBER_OF_POSTS = 13
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -162,6 +165,7 @@ class PostTests(TestCase):
         self.assertNotContains(response, 'комментарий от гостя')
 
 
+@override_settings(QUERY_BUDGET_RAISE=True)
 class PaginatorViewsTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -207,6 +211,72 @@ class PaginatorViewsTest(TestCase):
                         len(response.context.get('page_obj').object_list
                             ), lenght)
 
+    def test_cursor_paginator(self):
+        """Курсорные ссылки обходят ленту без пропусков и повторов"""
+        list_urls = (
+            ('posts:index', None,),
+            ('posts:group_list', (self.group.slug,)),
+            ('posts:profile', (self.author.username,)),
+        )
+        expected = list(Post.objects.order_by(
+            '-created', '-id').values_list('id', flat=True))
+        for name, args in list_urls:
+            with self.subTest(url=name):
+                url = reverse(name, args=args)
+                first = self.authorized_client.get(url).context['page_obj']
+                self.assertFalse(first.has_previous())
+                self.assertTrue(first.has_next())
+                second = self.authorized_client.get(
+                    url + first.next_link).context['page_obj']
+                self.assertFalse(second.has_next())
+                seen = [post.id for post in first] + [
+                    post.id for post in second]
+                self.assertEqual(seen, expected)
+                back = self.authorized_client.get(
+                    url + second.previous_link).context['page_obj']
+                self.assertEqual(
+                    [post.id for post in back], expected[:PAGE_LIMIT])
+
+    def test_cursor_garbage(self):
+        """Испорченный курсор отдаёт первую страницу"""
+        response = self.authorized_client.get(
+            reverse('posts:index') + '?cursor=мусор')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            len(response.context['page_obj'].object_list), PAGE_LIMIT)
+
+    def test_cursor_wrong_key(self):
+        """Корректный токен с чужим ключом считается отсутствующим"""
+        Follow.objects.create(user=self.author, author=self.user)
+        tokens = (
+            encode_cursor([1, 2], 'n'),
+            encode_cursor([1, 2, 3], 'n'),
+            encode_cursor(['x', 1], 'p'),
+            encode_cursor([True], 'n'),
+        )
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile_followers', args=(self.user.username,)),
+            reverse('api:post-list'),
+        )
+        for url in urls:
+            for token in tokens:
+                with self.subTest(url=url, token=token):
+                    response = self.authorized_client.get(
+                        url, {'cursor': token})
+                    self.assertEqual(response.status_code, 200)
+
+    def test_cursor_page_indexes(self):
+        """Курсор не выдаёт положение записей, которого не знает"""
+        page = self.authorized_client.get(
+            reverse('posts:index')).context['page_obj']
+        self.assertIsNone(page.paginator.count)
+        last = self.authorized_client.get(
+            reverse('posts:index') + page.next_link).context['page_obj']
+        self.assertEqual(
+            (last.start_index(), last.end_index()), (None, None))
+
 
 class CacheTests(TestCase):
     @classmethod
@@ -226,15 +296,69 @@ class CacheTests(TestCase):
     def test_cache_index(self):
         """Кэширование страницы index.html"""
         first_state = self.authorized_client.get(reverse('posts:index'))
-        post_1 = Post.objects.get(id=self.post.id)
-        post_1.text = 'Измененный текст'
-        post_1.save()
+        # update() не шлёт сигналов, поэтому кеш об изменении не знает
+        Post.objects.filter(id=self.post.id).update(text='Измененный текст')
         second_state = self.authorized_client.get(reverse('posts:index'))
         self.assertEqual(first_state.content, second_state.content)
         cache.clear()
         third_state = self.authorized_client.get(reverse('posts:index'))
         self.assertNotEqual(first_state.content, third_state.content)
 
+    def test_cache_invalidated_on_edit(self):
+        """Правка и удаление поста сразу видны в закешированных лентах"""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:profile', args=(self.user.username,)),
+        )
+        for url in urls:
+            self.authorized_client.get(url)
+        post_1 = Post.objects.get(id=self.post.id)
+        post_1.text = 'Измененный текст'
+        post_1.save()
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(
+                    self.authorized_client.get(url), 'Измененный текст')
+        post_1.delete()
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertNotContains(
+                    self.authorized_client.get(url), 'Измененный текст')
+
+    def test_cache_key_varies_by_user_and_feed(self):
+        """Лента подписок не получает закешированную главную"""
+        self.authorized_client.get(reverse('posts:index'))
+        reader = User.objects.create_user('reader')
+        reader_client = Client()
+        reader_client.force_login(reader)
+        response = reader_client.get(reverse('posts:follow_index'))
+        self.assertNotContains(response, self.post.text)
+        Follow.objects.create(user=reader, author=self.user)
+        response = reader_client.get(reverse('posts:follow_index'))
+        self.assertContains(response, self.post.text)
+
+    def test_cached_fragment_skips_feed_queries(self):
+        """При попадании во фрагмент посты ленты не выбираются"""
+        reader = User.objects.create_user('reader')
+        Follow.objects.create(user=reader, author=self.user)
+        reader_client = Client()
+        reader_client.force_login(reader)
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:profile', args=(self.user.username,)),
+            reverse('posts:follow_index'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                reader_client.get(url)
+                with CaptureQueriesContext(connection) as captured:
+                    response = reader_client.get(url)
+                self.assertContains(response, self.post.text)
+                self.assertFalse([
+                    query['sql'] for query in captured.captured_queries
+                    if 'FROM "posts_post"' in query['sql']
+                    or 'FROM "posts_feedentry"' in query['sql']])
+
 
 class FollowTests(TestCase):
     @classmethod
@@ -300,3 +424,49 @@ class FollowTests(TestCase):
             reverse('posts:follow_index'))
         lenght = len(response.context.get('page_obj').object_list)
         self.assertEqual(lenght, 0)
+
+
+@override_settings(QUERY_BUDGET_RAISE=True)
+class PostDetailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user('author')
+        cls.group = Group.objects.create(title='Группа', slug='slug')
+        cls.post = Post.objects.create(
+            author=cls.author, text='пост', group=cls.group)
+        commenters = [
+            User.objects.create_user(f'commenter{number}')
+            for number in range(COMMENTS_PAGE_LIMIT + 5)
+        ]
+        for number, commenter in enumerate(commenters):
+            Comment.objects.create(
+                post=cls.post, author=commenter, text=f'комментарий {number}')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_missing_post_404(self):
+        """Несуществующий пост отдаёт 404, а не 500"""
+        response = self.client.get(
+            reverse('posts:post_detail', args=(self.post.id + 100,)))
+        self.assertEqual(response.status_code, 404)
+
+    def test_comments_without_n_plus_one(self):
+        """Пост, автор, группа и комментарии читаются постоянным числом
+        запросов независимо от числа комментаторов"""
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                reverse('posts:post_detail', args=(self.post.id,)))
+        comments = response.context['comments']
+        self.assertEqual(len(comments.object_list), COMMENTS_PAGE_LIMIT)
+        self.assertEqual(
+            comments[0].text, f'комментарий {COMMENTS_PAGE_LIMIT + 4}')
+
+    def test_older_comments(self):
+        """Ссылка на более старые комментарии отдаёт остаток"""
+        url = reverse('posts:post_detail', args=(self.post.id,))
+        first = self.client.get(url).context['comments']
+        older = self.client.get(url + first.next_link).context['comments']
+        self.assertEqual(len(older.object_list), 5)
+        self.assertEqual(older[4].text, 'комментарий 0')
@@ -0,0 +1,8 @@
+from django.db import connection
+
+
+def run_commit_hooks():
+    """Выполняет колбэки on_commit, которые TestCase держит до отката."""
+    callbacks, connection.run_on_commit = connection.run_on_commit, []
+    for _, callback in callbacks:
+        callback()
@@ -0,0 +1,171 @@
+"""Адаптивные копии картинок постов, подготовленные заранее.
+
+После сохранения поста (в фоне, см. posts.tasks) картинка режется по
+пропорциям POST_CARD_SIZE в каждую ширину из POST_RENDITION_WIDTHS и в
+каждый формат из POST_RENDITION_FORMATS. Метаданные (EXIF, ICC) не
+переносятся, качество задаёт POST_RENDITION_QUALITY. Имена файлов
+строятся из хеша содержимого и параметров, так что одинаковые загрузки
+делят одни и те же файлы. URL копий лежат в Post.image_renditions,
+URL основной JPEG-карточки - в Post.image_card; рендеринг лент только
+подставляет готовые URL и не обращается к Pillow.
+"""
+import hashlib
+import io
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+from PIL import Image, ImageOps
+
+from .models import Post
+
+RENDITION_DIR = 'posts/r'
+PIL_FORMATS = {'jpeg': 'JPEG', 'webp': 'WEBP'}
+MIME_TYPES = {'jpeg': 'image/jpeg', 'webp': 'image/webp'}
+
+
+def spec():
+    """Параметры нарезки; входят в адрес, чтобы их смена давала новые."""
+    return {
+        'size': list(settings.POST_CARD_SIZE),
+        'widths': sorted(settings.POST_RENDITION_WIDTHS),
+        'formats': list(settings.POST_RENDITION_FORMATS),
+        'quality': settings.POST_RENDITION_QUALITY,
+    }
+
+
+def content_key(data):
+    signature = json.dumps(spec(), sort_keys=True).encode()
+    return hashlib.sha256(data + signature).hexdigest()
+
+
+def rendition_name(key, width, fmt):
+    extension = 'jpg' if fmt == 'jpeg' else fmt
+    return f'{RENDITION_DIR}/{key[:2]}/{key}-{width}.{extension}'
+
+
+def crop(source):
+    """Кадр с пропорциями POST_CARD_SIZE по центру, без метаданных."""
+    with Image.open(source) as image:
+        image.seek(0)
+        image = ImageOps.exif_transpose(image).convert('RGB')
+    width, height = settings.POST_CARD_SIZE
+    return ImageOps.fit(
+        image, (width, height), Image.LANCZOS, centering=(0.5, 0.5))
+
+
+def encode(image, width, fmt):
+    size = (width, round(width * image.height / image.width))
+    resized = image if size == image.size else image.resize(
+        size, Image.LANCZOS)
+    buffer = io.BytesIO()
+    options = {'quality': settings.POST_RENDITION_QUALITY[fmt]}
+    if fmt == 'jpeg':
+        options.update(optimize=True, progressive=True)
+    else:
+        options.update(method=6)
+    resized.save(buffer, PIL_FORMATS[fmt], **options)
+    return buffer.getvalue()
+
+
+def render(data, force=False):
+    """Создаёт недостающие копии; возвращает {формат: [[ширина, URL]]}."""
+    key = content_key(data)
+    renditions = {}
+    image = None
+    for fmt in settings.POST_RENDITION_FORMATS:
+        renditions[fmt] = []
+        for width in sorted(settings.POST_RENDITION_WIDTHS):
+            name = rendition_name(key, width, fmt)
+            if force or not default_storage.exists(name):
+                if image is None:
+                    image = crop(io.BytesIO(data))
+                if default_storage.exists(name):
+                    default_storage.delete(name)
+                default_storage.save(
+                    name, ContentFile(encode(image, width, fmt)))
+            renditions[fmt].append([width, default_storage.url(name)])
+    return renditions
+
+
+def build_renditions(post_id, force=False):
+    """Нарезает копии картинки поста; возвращает URL карточки или ''."""
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None or not post.image:
+        return ''
+    try:
+        with post.image.open('rb') as source:
+            renditions = render(source.read(), force)
+    except (OSError, ValueError):
+        # файла нет или это не картинка: останется исходный URL
+        return ''
+    fallback = 'jpeg' if 'jpeg' in renditions else next(iter(renditions))
+    card = renditions[fallback][-1][1]
+    encoded = json.dumps(renditions)
+    if (post.image_card, post.image_renditions) != (card, encoded):
+        post.image_card = card
+        post.image_renditions = encoded
+        # картинку могли заменить, пока шла нарезка; save, а не
+        # update, чтобы сигнал сбросил закешированные ленты
+        current = Post.objects.filter(pk=post.pk, image=post.image.name)
+        if current.exists():
+            post.save(update_fields=['image_card', 'image_renditions'])
+    return card
+
+
+def _build_in_thread(post_id, force):
+    try:
+        return build_renditions(post_id, force)
+    finally:
+        close_old_connections()
+
+
+def regenerate(queryset=None, workers=None, missing_only=False,
+               force=False):
+    """Параллельно пересобирает копии; возвращает число готовых постов.
+
+    При workers=1 всё выполняется в текущем потоке.
+    """
+    if queryset is None:
+        queryset = Post.objects.all()
+    queryset = queryset.exclude(image='')
+    if missing_only:
+        queryset = queryset.filter(image_renditions='')
+    ids = list(queryset.order_by().values_list('pk', flat=True))
+    flags = [force] * len(ids)
+    if workers == 1:
+        return sum(1 for url in map(build_renditions, ids, flags) if url)
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        return sum(
+            1 for url in pool.map(_build_in_thread, ids, flags) if url)
+
+
+def _stored_names(directory):
+    directories, files = default_storage.listdir(directory)
+    for file_name in files:
+        yield f'{directory}/{file_name}'
+    for child in directories:
+        yield from _stored_names(f'{directory}/{child}')
+
+
+def prune():
+    """Удаляет копии, на которые не ссылается ни один пост."""
+    prefix = default_storage.url(RENDITION_DIR)
+    used = set()
+    for encoded in Post.objects.exclude(image_renditions='').values_list(
+            'image_renditions', flat=True).iterator():
+        for urls in json.loads(encoded).values():
+            used.update(url for _, url in urls)
+    if not default_storage.exists(RENDITION_DIR):
+        return 0
+    removed = 0
+    for name in _stored_names(RENDITION_DIR):
+        url = default_storage.url(name)
+        if url.startswith(prefix) and url not in used:
+            default_storage.delete(name)
+            removed += 1
+    return removed
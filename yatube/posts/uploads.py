@@ -0,0 +1,122 @@
+"""Приём картинок постов с ограничением памяти и объёма.
+
+Файл пишется на диск кусками (FILE_UPLOAD_HANDLERS), байты сверх
+POST_IMAGE_MAX_BYTES не сохраняются вовсе. Формат и число пикселей
+проверяются по заголовку до декодирования, слишком большие оригиналы
+уменьшаются до POST_IMAGE_MAX_SIDE, а суточный объём загрузок
+пользователя считается счётчиком в кеше.
+"""
+import io
+import os
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import InMemoryUploadedFile
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from PIL import Image, ImageOps
+
+# чем сохранять уменьшенный оригинал
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 90, 'optimize': True},
+    'PNG': {'optimize': True},
+    'WEBP': {'quality': 90},
+    'GIF': {},
+}
+
+
+class BoundedUploadHandler(TemporaryFileUploadHandler):
+    """Пишет загрузку во временный файл и обрывает её на лимите.
+
+    Превысивший лимит файл помечается oversize=True, его содержимое
+    обрезано; PostForm превращает это в ошибку поля.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.oversize = False
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.POST_IMAGE_MAX_BYTES:
+            self.oversize = True
+            return None
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        uploaded = super().file_complete(file_size)
+        uploaded.oversize = self.oversize
+        return uploaded
+
+
+def inspect(uploaded):
+    """Формат и размер по заголовку; пиксели не декодируются."""
+    uploaded.seek(0)
+    with Image.open(uploaded) as image:
+        return image.format, image.size
+
+
+def check(uploaded):
+    """Текст ошибки для неподходящей картинки или None."""
+    if getattr(uploaded, 'oversize', False):
+        limit = settings.POST_IMAGE_MAX_BYTES // 2 ** 20
+        return f'Файл больше {limit} МБ'
+    fmt, (width, height) = inspect(uploaded)
+    if fmt not in settings.POST_IMAGE_FORMATS:
+        return f'Формат {fmt} не поддерживается'
+    if width * height > settings.POST_IMAGE_MAX_PIXELS:
+        return f'Слишком большое изображение: {width}x{height}'
+    return None
+
+
+def downsample(uploaded):
+    """Уменьшает оригинал до POST_IMAGE_MAX_SIDE по большей стороне.
+
+    Для JPEG draft декодирует сразу в уменьшенном масштабе, поэтому в
+    память не попадает полноразмерный растр.
+    """
+    fmt, size = inspect(uploaded)
+    side = settings.POST_IMAGE_MAX_SIDE
+    if max(size) <= side:
+        uploaded.seek(0)
+        return uploaded
+    uploaded.seek(0)
+    with Image.open(uploaded) as image:
+        image.draft('RGB', (side, side))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((side, side), Image.LANCZOS)
+        if fmt == 'JPEG' and image.mode != 'RGB':
+            image = image.convert('RGB')
+        # после уменьшения файл невелик, его можно держать в памяти
+        buffer = io.BytesIO()
+        image.save(buffer, fmt, **SAVE_OPTIONS.get(fmt, {}))
+    uploaded.close()
+    return InMemoryUploadedFile(
+        buffer, 'image', os.path.basename(uploaded.name),
+        uploaded.content_type, buffer.tell(), uploaded.charset,
+    )
+
+
+def quota_key(user_id, day=None):
+    return f'upload-quota:{user_id}:{(day or date.today()).isoformat()}'
+
+
+def quota_used(user_id):
+    return cache.get(quota_key(user_id), 0)
+
+
+def quota_left(user_id):
+    return max(settings.POST_UPLOAD_DAILY_QUOTA - quota_used(user_id), 0)
+
+
+def charge(user_id, size):
+    """Добавляет size байт к суточному счётчику пользователя."""
+    key = quota_key(user_id)
+    cache.add(key, 0, timeout=60 * 60 * 24)
+    try:
+        return cache.incr(key, size)
+    except ValueError:
+        # ключ успел истечь между add и incr
+        cache.set(key, size, timeout=60 * 60 * 24)
+        return size
@@ -8,6 +8,7 @@ app_name = 'posts'
 urlpatterns = [
     path('', views.index, name="index"),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
+    path('tag/<path:name>/', views.tag_posts, name='tag_posts'),
     path('profile/<str:username>/', views.profile, name='profile'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path('create/', views.post_create, name='post_create'),
@@ -18,6 +19,18 @@ urlpatterns = [
         name='add_comment'
     ),
     path('follow/', views.follow_index, name='follow_index'),
+    path('search/', views.search, name='search'),
+    path('search/api/', views.search_api, name='search_api'),
+    path(
+        'profile/<str:username>/followers/',
+        views.profile_followers,
+        name='profile_followers'
+    ),
+    path(
+        'profile/<str:username>/following/',
+        views.profile_following,
+        name='profile_following'
+    ),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
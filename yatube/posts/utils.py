@@ -1,10 +1,236 @@
-from django.core.paginator import Paginator
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.core.exceptions import FieldDoesNotExist
+from django.core.paginator import Page, Paginator
+from django.db import models
+from django.db.models import Q
+from django.http import QueryDict
+from django.utils.dateparse import parse_datetime
 
 from yatube.settings import PAGE_LIMIT
 
+CURSOR_PARAM = 'cursor'
+LEGACY_PAGE_PARAM = 'page'
+
+
+def encode_cursor(values, direction):
+    """Упаковывает значения ключа и направление в непрозрачный токен."""
+    raw = json.dumps(
+        {'v': [_dump_value(value) for value in values], 'd': direction},
+        separators=(',', ':'),
+    )
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Возвращает (значения ключа, направление) или None для мусора."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        data = json.loads(raw.decode())
+        values = [_load_value(value) for value in data['v']]
+        direction = data['d']
+    except (ValueError, KeyError, TypeError, binascii.Error):
+        return None
+    if direction not in (CursorPaginator.NEXT, CursorPaginator.PREVIOUS):
+        return None
+    return values, direction
+
+
+def _dump_value(value):
+    if hasattr(value, 'isoformat'):
+        return {'t': value.isoformat()}
+    return value
+
+
+def _load_value(value):
+    if isinstance(value, dict):
+        parsed = parse_datetime(value['t'])
+        if parsed is None:
+            raise ValueError('bad datetime in cursor')
+        return parsed
+    if not isinstance(value, (int, float, str)):
+        raise ValueError('bad value in cursor')
+    return value
+
+
+def key_type(field):
+    """Какого типа значение ключа-поля может прийти в курсоре."""
+    field = getattr(field, 'target_field', None) or field
+    if isinstance(field, models.DateTimeField):
+        return datetime
+    if isinstance(field, (models.AutoField, models.IntegerField)):
+        return int
+    if isinstance(field, models.FloatField):
+        return (int, float)
+    return str
+
+
+def _unknown_index():
+    return None
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинация по (created, id) без COUNT(*) и OFFSET.
+
+    Страница выбирается условием по ключу последней показанной записи,
+    поэтому глубина листания не влияет на стоимость запроса. Страницы
+    остаются обычными Page: номер 1 или 2 и num_pages описывают только
+    наличие соседних страниц, а ссылки на них лежат в атрибутах
+    next_link/previous_link.
+    """
+    NEXT = 'n'
+    PREVIOUS = 'p'
+    is_cursor = True
+    # типы значений ключа; None - взять по полям модели object_list
+    key_types = None
+
+    def __init__(self, object_list, per_page, keys=('created', 'id'),
+                 cursor_param=CURSOR_PARAM, query=None, transform=None):
+        super().__init__(object_list, per_page)
+        self.keys = keys
+        self.transform = transform
+        self.cursor_param = cursor_param
+        self.query = query
+        self._number = 1
+        self._has_next = False
+
+    def _check_object_list_is_ordered(self):
+        # порядок задаёт сам пагинатор
+        pass
+
+    @property
+    def count(self):
+        """Общее число записей неизвестно: COUNT(*) не выполняется."""
+        return None
+
+    @property
+    def num_pages(self):
+        return self._number + 1 if self._has_next else self._number
+
+    def get_page(self, cursor=None):
+        return self.page(cursor)
+
+    def types(self):
+        if self.key_types is not None:
+            return self.key_types
+        model = getattr(self.object_list, 'model', None)
+        if model is None:
+            return None
+        try:
+            return tuple(
+                key_type(model._meta.get_field(key)) for key in self.keys)
+        except FieldDoesNotExist:
+            # ключ из annotate(): проверяется только число значений
+            return None
+
+    def clean(self, position):
+        """Позиция курсора или None, если она не подходит к ключу."""
+        if position is None:
+            return None
+        values, direction = position
+        if len(values) != len(self.keys):
+            return None
+        for value, expected in zip(values, self.types() or ()):
+            if isinstance(value, bool) or not isinstance(value, expected):
+                return None
+        return values, direction
+
+    def page(self, cursor=None):
+        position = self.clean(decode_cursor(cursor))
+        rows, has_more, direction = self.fetch(position)
+        came_from_cursor = position is not None
+        if direction == self.NEXT:
+            has_next, has_previous = has_more, came_from_cursor
+        else:
+            has_next, has_previous = came_from_cursor, has_more
+        self._has_next = has_next and bool(rows)
+        self._number = 2 if has_previous and rows else 1
+        objects = rows if self.transform is None else self.transform(rows)
+        page = Page(objects, self._number, self)
+        page.next_cursor = page.previous_cursor = None
+        if page.has_next():
+            page.next_cursor = encode_cursor(self.key_of(rows[-1]), self.NEXT)
+        if page.has_previous():
+            page.previous_cursor = encode_cursor(
+                self.key_of(rows[0]), self.PREVIOUS)
+        # номер страницы - 1 или 2, положение записей в ленте неизвестно
+        page.start_index = page.end_index = _unknown_index
+        page.first_link = self.link(None)
+        page.next_link = self.link(page.next_cursor)
+        page.previous_link = self.link(page.previous_cursor)
+        return page
+
+    def key_of(self, obj):
+        return [getattr(obj, key) for key in self.keys]
+
+    def link(self, cursor):
+        query = self.query.copy() if self.query is not None else QueryDict(
+            mutable=True)
+        query.pop(LEGACY_PAGE_PARAM, None)
+        query.pop(self.cursor_param, None)
+        if cursor is not None:
+            query[self.cursor_param] = cursor
+        return f'?{query.urlencode()}'
+
+    def queryset(self, position):
+        """Запрос одной страницы (на запись больше) от позиции курсора."""
+        head, tail = self.keys
+        queryset = self.object_list
+        direction = self.NEXT if position is None else position[1]
+        if position is not None:
+            head_value, tail_value = position[0]
+            if direction == self.NEXT:
+                queryset = queryset.filter(
+                    Q(**{f'{head}__lte': head_value})
+                    & (Q(**{f'{head}__lt': head_value})
+                       | Q(**{f'{tail}__lt': tail_value}))
+                )
+            else:
+                queryset = queryset.filter(
+                    Q(**{f'{head}__gte': head_value})
+                    & (Q(**{f'{head}__gt': head_value})
+                       | Q(**{f'{tail}__gt': tail_value}))
+                )
+        if direction == self.NEXT:
+            queryset = queryset.order_by(f'-{head}', f'-{tail}')
+        else:
+            queryset = queryset.order_by(head, tail)
+        return queryset[:self.per_page + 1]
+
+    def fetch(self, position):
+        """Возвращает (записи, есть_ли_ещё, направление)."""
+        direction = self.NEXT if position is None else position[1]
+        rows = list(self.queryset(position))
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == self.PREVIOUS:
+            rows.reverse()
+        return rows, has_more, direction
+
+
+def paginator(request, posts, limit=PAGE_LIMIT, keys=('created', 'id'),
+              cursor_param=CURSOR_PARAM, transform=None,
+              legacy_param=LEGACY_PAGE_PARAM):
+    """Пагинатор для лент.
 
-def paginator(request, posts, limit=PAGE_LIMIT):
-    paginator = Paginator(posts, limit)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    return page_obj
+    По умолчанию работает по курсору (?cursor=); старые ссылки вида
+    ?page=N продолжают обслуживаться обычным Paginator (legacy_param=None
+    отключает этот режим). transform превращает выбранные строки в то,
+    что увидит шаблон (например, записи ленты подписок в посты).
+    """
+    page_number = request.GET.get(legacy_param) if legacy_param else None
+    if page_number is not None and cursor_param not in request.GET:
+        ordered = posts.order_by(*(f'-{key}' for key in keys))
+        page_obj = Paginator(ordered, limit).get_page(page_number)
+        if transform is not None:
+            page_obj.object_list = transform(list(page_obj.object_list))
+        return page_obj
+    cursor_paginator = CursorPaginator(
+        posts, limit, keys=keys, cursor_param=cursor_param,
+        query=request.GET, transform=transform)
+    return cursor_paginator.get_page(request.GET.get(cursor_param))
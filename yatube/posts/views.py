@@ -1,80 +1,192 @@
 """View-функции для приложения posts."""
 from django.contrib.auth.decorators import login_required
+from django.http import Http404, HttpResponse, JsonResponse
 from django.shortcuts import redirect
 from django.shortcuts import render, get_object_or_404
+from django.utils.functional import SimpleLazyObject
 
-from .utils import paginator
+from yatube.settings import COMMENTS_PAGE_LIMIT, PAGE_LIMIT
+
+from . import comments, feeds, follows, graph, stats, tags
+from .caching import feed_cache, fragment_cached
+from .conditional import conditional
+from .search import SearchPaginator
+from .utils import CURSOR_PARAM, paginator
 from .forms import PostForm, CommentForm
-from .models import Post, Group, Comment, Follow, User
+from .models import Post, Group, Tag, User
+
+
+def viewer_tags(request):
+    """Артефакты, от которых страница зависит через зрителя."""
+    if request.user.is_authenticated:
+        yield ('follow', request.user.pk)
+
+
+def profile_author(request, username):
+    """Автор профиля; запрос один на валидаторы и view."""
+    if not hasattr(request, '_profile_author'):
+        request._profile_author = User.objects.select_related(
+            'stats').filter(username=username).first()
+    return request._profile_author
+
+
+def detail_post(request, post_id):
+    """Пост страницы; запрос один на валидаторы и view."""
+    if not hasattr(request, '_detail_post'):
+        request._detail_post = Post.objects.select_related(
+            'author__stats', 'group').filter(id=post_id).first()
+    return request._detail_post
+
+
+def feed_page(feed, get_page, *args, **kwargs):
+    """Страница ленты для шаблона с фрагментом {% cache %} по feed.
+
+    Если фрагмент уже в кеше, шаблон страницу не читает: она выбирается
+    лениво, только при обращении, и запросов к постам нет.
+    """
+    if fragment_cached(feed):
+        return SimpleLazyObject(lambda: get_page(*args, **kwargs))
+    return get_page(*args, **kwargs)
+
+
+def followed_authors(request, page_obj):
+    """Авторы карточек страницы, на которых подписан зритель.
+
+    Множество строится по массиву подписок из графа в кеше один раз на
+    страницу и лениво: если фрагмент ленты взят из кеша, граф не
+    читается вовсе.
+    """
+    if not request.user.is_authenticated:
+        return frozenset()
+    return SimpleLazyObject(lambda: graph.followed_among(
+        request.user.pk, {post.author_id for post in page_obj}))
+
+
+def index_tags(request):
+    # карточки показывают, подписан ли зритель на автора
+    return [('index',), *viewer_tags(request)]
+
 
+def group_tags(request, slug):
+    return [('group', slug), *viewer_tags(request)]
 
+
+def profile_tags(request, username):
+    author = profile_author(request, username)
+    if author is None:
+        return None
+    return [('profile', author.pk), ('counters', author.pk),
+            *viewer_tags(request)]
+
+
+def detail_tags(request, post_id):
+    post = detail_post(request, post_id)
+    if post is None:
+        return None
+    return [('post', post.pk), ('counters', post.author_id)]
+
+
+@conditional(index_tags)
 def index(request):
     post_list = Post.objects.select_related(
-        'group', 'author').all()
-    page_obj = paginator(request, post_list)
+        'group', 'author').prefetch_related('tag')
+    feed = feed_cache(request, 'index')
+    page_obj = feed_page(feed, paginator, request, post_list)
     context = {
         'page_obj': page_obj,
+        'feed_cache': feed,
+        'followed_authors': followed_authors(request, page_obj),
     }
     return render(request, 'posts/index.html', context)
 
 
+@conditional(group_tags)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
     post_list = group.posts.select_related(
-        'group', 'author').all()
-    page_obj = paginator(request, post_list)
+        'group', 'author').prefetch_related('tag')
+    feed = feed_cache(request, 'group', group.slug)
+    page_obj = feed_page(feed, paginator, request, post_list)
     context = {
         'group': group,
         'page_obj': page_obj,
+        'feed_cache': feed,
+        'followed_authors': followed_authors(request, page_obj),
     }
     return render(request, 'posts/group_list.html', context)
 
 
+def follow_relations(request, author):
+    """Подписан ли зритель на автора, автор на зрителя и общие связи.
+
+    Всё берётся из графа в кеше (posts.graph); зависимость от подписок
+    обеих сторон уже учтена артефактами counters и follow.
+    """
+    viewer = request.user
+    if not viewer.is_authenticated or viewer == author:
+        return {'following': False, 'follows_you': False, 'known': []}
+    own = graph.following(viewer.pk)
+    lists = graph.adjacency(graph.FOLLOWERS, [viewer.pk, author.pk])
+    return {
+        'following': graph.contains(own, author.pk),
+        'follows_you': graph.contains(lists[viewer.pk], author.pk),
+        'known': graph.intersect(own, lists[author.pk]),
+    }
+
+
+@conditional(profile_tags)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    postes = author.posts.select_related('group').all()
-    count = postes.count()
-    page_obj = paginator(request, postes)
-    followers = Follow.objects.filter(author=author).count()
-    if request.user.is_authenticated:
-        following = Follow.objects.filter(
-            user=request.user, author=author
-        ).exists()
-    else:
-        # к сожалению, если удалить else в этом месте, то тесты выдают ошибку
-        # local variable 'following' referenced before assignment
-        # Мне кажется, что это из-за того, что following не объявляется.
-        # С else все тесты проходят
-        following = False
+    author = profile_author(request, username)
+    if author is None:
+        raise Http404
+    postes = author.posts.select_related('group').prefetch_related('tag')
+    author_stats = stats.for_user(author)
+    feed = feed_cache(request, 'profile', author.pk)
+    page_obj = feed_page(feed, paginator, request, postes)
+    relations = follow_relations(request, author)
     context = {
-        'count': count,
+        'count': author_stats.posts,
         'author': author,
         'page_obj': page_obj,
-        'following': following,
-        'followers': followers,
+        'followers': author_stats.followers,
+        'followings': author_stats.following,
+        **relations,
+        'feed_cache': feed,
     }
     return render(request, 'posts/profile.html', context)
 
 
+@conditional(detail_tags)
 def post_detail(request, post_id):
-    comment_post = Post.objects.get(id=post_id)
-    comments = Comment.objects.filter(post=comment_post)
+    post = detail_post(request, post_id)
+    if post is None:
+        raise Http404
+    comments = paginator(
+        request,
+        post.comments.filter(is_hidden=False).select_related('author'),
+        limit=COMMENTS_PAGE_LIMIT,
+        cursor_param='comments',
+        legacy_param=None,
+    )
     form = CommentForm(request.POST or None)
     context = {
-        'post': comment_post,
+        'post': post,
         'form': form,
         'comments': comments,
+        'count': stats.for_user(post.author).posts,
     }
     return render(request, 'posts/post_detail.html', context)
 
 
 @login_required
 def post_create(request):
-    form = PostForm(request.POST or None)
+    form = PostForm(
+        request.POST or None,
+        files=request.FILES or None,
+        instance=Post(author=request.user),
+    )
     if form.is_valid():
-        post = form.save(commit=False)
-        post.author = request.user
-        post.save()
+        form.save()
         return redirect('posts:profile', username=request.user.username)
     context = {
         'form': form
@@ -103,45 +215,162 @@ def post_edit(request, post_id):
 
 @login_required
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
-    if form.is_valid():
-        comment = form.save(commit=False)
-        comment.author = request.user
-        comment.post = post
-        comment.save()
+    if not form.is_valid():
+        return redirect('posts:post_detail', post_id=post_id)
+    # лимит тратят только годные комментарии; всплеск отсекается до
+    # обращений к БД
+    wait = comments.throttle(request.user)
+    if wait:
+        response = HttpResponse(
+            'Слишком много комментариев, попробуйте позже',
+            status=429, content_type='text/plain; charset=utf-8')
+        response['Retry-After'] = int(wait) + 1
+        return response
+    if comments.add(
+            request.user, post_id, form.cleaned_data['text']) is None:
+        raise Http404
     return redirect('posts:post_detail', post_id=post_id)
 
 
+def tag_posts(request, name):
+    tag = get_object_or_404(Tag, name=tags.normalize(name))
+    feed = feed_cache(request, 'tag', tag.pk)
+    page_obj = feed_page(
+        feed,
+        paginator,
+        request,
+        tags.timeline(tag),
+        keys=('created', 'post_id'),
+        transform=tags.links_to_posts,
+    )
+    context = {
+        'tag': tag,
+        'page_obj': page_obj,
+        'feed_cache': feed,
+        'followed_authors': followed_authors(request, page_obj),
+    }
+    return render(request, 'posts/tag_list.html', context)
+
+
 @login_required
 def follow_index(request):
-    list_of_posts = Post.objects.filter(author__following__user=request.user)
-    page_obj = paginator(request, list_of_posts)
+    # старые ссылки ?page=N ведут на первую страницу: лента не сводится
+    # к одному queryset, и листается только курсором
+    pages = feeds.FeedPaginator(request.user, PAGE_LIMIT, query=request.GET)
+    feed = feed_cache(
+        request, 'follow', request.user.pk,
+        extra=[('author', author_id)
+               for author_id in graph.following(request.user.pk)])
+    page_obj = feed_page(
+        feed, pages.get_page, request.GET.get(CURSOR_PARAM))
     context = {
         'page_obj': page_obj,
+        'feed_cache': feed,
+        # в ленте подписок все авторы - те, на кого подписан зритель
+        'followed_authors': SimpleLazyObject(
+            lambda: {post.author_id for post in page_obj}),
     }
     return render(request, 'posts/follow.html', context)
 
 
+def follow_list(request, username, kind):
+    """Подписчики или подписки пользователя, новые аккаунты первыми."""
+    author = get_object_or_404(User, username=username)
+    page_obj = graph.GraphPaginator(
+        graph.adjacency(kind, [author.pk])[author.pk], PAGE_LIMIT,
+        query=request.GET, transform=graph.users,
+    ).get_page(request.GET.get(CURSOR_PARAM))
+    follows_you = you_follow = ()
+    if request.user.is_authenticated:
+        ids = [user.pk for user in page_obj]
+        follows_you = graph.follows_you(request.user.pk, ids)
+        own = graph.following(request.user.pk)
+        you_follow = {user_id for user_id in ids
+                      if graph.contains(own, user_id)}
+    context = {
+        'author': author,
+        'kind': kind,
+        'page_obj': page_obj,
+        'follows_you': follows_you,
+        'you_follow': you_follow,
+    }
+    return render(request, 'posts/follow_list.html', context)
+
+
+def profile_followers(request, username):
+    return follow_list(request, username, graph.FOLLOWERS)
+
+
+def profile_following(request, username):
+    return follow_list(request, username, graph.FOLLOWING)
+
+
 @login_required
 def profile_follow(request, username):
-    user = request.user
-    author = User.objects.get(username=username)
-    is_follower = Follow.objects.filter(user=user, author=author)
-    if user != author and not is_follower.exists():
-        Follow.objects.create(user=user, author=author)
+    # неизвестный автор ничего не меняет, профиль сам ответит 404
+    follows.follow(request.user, username)
     return redirect('posts:profile', username=username)
 
 
 @login_required
 def profile_unfollow(request, username):
-    author = get_object_or_404(User, username=username)
-    is_follower = Follow.objects.filter(user=request.user, author=author)
-    if is_follower:
-        is_follower.delete()
+    follows.unfollow(request.user, username)
     return redirect('posts:profile', username=username)
 
 
+def search_page(request):
+    """Страница выдачи по ?q= с фильтрами group, author и tag."""
+    query = request.GET.get('q', '').strip()
+    filters = {}
+    lookups = (
+        ('group', 'group_id', Group.objects, 'slug'),
+        ('author', 'author_id', User.objects, 'username'),
+        ('tag', 'tag_id', Tag.objects, 'name'),
+    )
+    for param, key, manager, field in lookups:
+        value = request.GET.get(param)
+        if param == 'tag':
+            value = tags.normalize(value)
+        if value:
+            # неизвестное значение фильтра даёт пустую выдачу, а не 404
+            filters[key] = manager.filter(**{field: value}).values_list(
+                'pk', flat=True).first() or -1
+    pages = SearchPaginator(
+        query, PAGE_LIMIT, filters=filters, query=request.GET)
+    return query, pages.get_page(request.GET.get(CURSOR_PARAM))
+
+
+def search(request):
+    query, page_obj = search_page(request)
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'followed_authors': followed_authors(request, page_obj),
+    }
+    return render(request, 'posts/search.html', context)
+
+
+def search_api(request):
+    query, page_obj = search_page(request)
+    return JsonResponse({
+        'query': query,
+        'results': [
+            {
+                'id': post.pk,
+                'text': post.text,
+                'author': post.author.username,
+                'group': post.group.slug if post.group else None,
+                'created': post.created.isoformat(),
+                'rank': post.rank,
+            }
+            for post in page_obj
+        ],
+        'next': page_obj.next_cursor,
+        'previous': page_obj.previous_cursor,
+    })
+
+
 def page_not_found(request, exception):
     # Переменная exception содержит отладочную информацию,
     # выводить её в шаблон пользователской страницы 404 мы не станем
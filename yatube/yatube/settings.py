@@ -4,7 +4,7 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 SECRET_KEY = '0&-99ua@y3*k9r-!+##as55km_fm8jav3cc+2-%drvx_c*dbmj'
 
-DEBUG = True
+DEBUG = os.getenv('YATUBE_DEBUG', '1') == '1'
 
 ALLOWED_HOSTS = [
     'localhost',
@@ -24,9 +24,12 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'sorl.thumbnail',
+    'rest_framework',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.QueryInstrumentationMiddleware',
+    'core.page_cache.AnonymousPageCacheMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -38,12 +41,23 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'yatube.urls'
 
+# Вне отладки (или с YATUBE_TEMPLATE_CACHE=1) разобранные шаблоны
+# хранятся в памяти процесса и не читаются с диска на каждый рендер
+template_loaders = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+if os.getenv('YATUBE_TEMPLATE_CACHE', '0' if DEBUG else '1') == '1':
+    template_loaders = [
+        ('django.template.loaders.cached.Loader', template_loaders),
+    ]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': template_loaders,
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -101,13 +115,141 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 PAGE_LIMIT = 10
 
+COMMENTS_PAGE_LIMIT = 20
+
+# REST API (posts.api): списки листаются курсором по PAGE_LIMIT записей
+REST_FRAMEWORK = {
+    'DEFAULT_PERMISSION_CLASSES': [
+        'rest_framework.permissions.IsAuthenticatedOrReadOnly',
+    ],
+    'DEFAULT_PAGINATION_CLASS': 'posts.pagination.CursorPagination',
+}
+
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+# Загрузка картинок (posts.uploads): файл сразу пишется на диск и
+# обрывается на лимите размера, затем проверяются формат и пиксели
+FILE_UPLOAD_HANDLERS = ['posts.uploads.BoundedUploadHandler']
+POST_IMAGE_MAX_BYTES = 10 * 2 ** 20
+POST_IMAGE_MAX_PIXELS = 40_000_000
+POST_IMAGE_MAX_SIDE = 2560
+POST_IMAGE_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+POST_UPLOAD_DAILY_QUOTA = 100 * 2 ** 20
+
+# Копии картинок постов (posts.thumbnails): пропорции и ширина карточки,
+# ширины для srcset, форматы и их качество
+POST_CARD_SIZE = (960, 339)
+POST_RENDITION_WIDTHS = (320, 640, 960)
+POST_RENDITION_FORMATS = ('webp', 'jpeg')
+POST_RENDITION_QUALITY = {'webp': 75, 'jpeg': 80}
+
+# Фоновые задачи (posts.tasks): 'thread' - пул потоков, 'sync' - сразу
+TASK_QUEUE = os.getenv('YATUBE_TASK_QUEUE', 'thread')
+TASK_WORKERS = int(os.getenv('YATUBE_TASK_WORKERS', 2))
+
+# Уровень кеша: locmem - отдельный кеш в каждом процессе (разработка и
+# тесты); sqlite - общий файл на одной машине; redis - общий сервер.
+# Для общих уровней default - двухуровневый кеш с L1 в памяти воркера.
+CACHE_TIER = os.getenv('YATUBE_CACHE', 'locmem')
+
+SHARED_CACHES = {
+    'sqlite': {
+        'BACKEND': 'core.cache_backends.sqlite.SQLiteCache',
+        'LOCATION': os.getenv(
+            'YATUBE_CACHE_PATH', os.path.join(BASE_DIR, 'cache.sqlite3')),
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+    'redis': {
+        'BACKEND': 'core.cache_backends.redis.RedisCache',
+        'LOCATION': os.getenv('YATUBE_REDIS_URL', 'redis://127.0.0.1:6379/0'),
+    },
+}
+
+if CACHE_TIER in SHARED_CACHES:
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache_backends.tiered.TwoLevelCache',
+            'OPTIONS': {
+                'L2': 'shared',
+                'L1_TIMEOUT': 5,
+                'L1_MAX_ENTRIES': 1000,
+                # L1_BYPASS по умолчанию - все ключи, сбрасываемые delete
+            },
+        },
+        'shared': SHARED_CACHES[CACHE_TIER],
     }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Сколько последних постов автора попадает в ленту при подписке
+FEED_BACKFILL_LIMIT = 1000
+
+# Лимит комментариев пользователя (core.ratelimit): всплеск до
+# capacity подряд, дальше per_minute в минуту; None - без ограничения
+COMMENT_RATE_LIMIT = {'capacity': 5, 'per_minute': 6}
+
+# С какого числа подписчиков посты автора не раскладываются по лентам, а
+# читаются при показе (posts.feeds, команда rebalance_feeds); None -
+# всегда раскладывать
+FEED_PULL_THRESHOLD = 10000
+
+# Граф подписок в кеше (posts.graph): время жизни массивов (подписки
+# правят их сразу, срок лишь ограничивает устаревание после гонки) и
+# сколько подписок смотреть для рекомендаций
+FOLLOW_GRAPH_TIMEOUT = 60 * 60
+FOLLOW_SUGGESTION_FANOUT = 200
+
+# Время жизни закешированных фрагментов лент, в секундах. Устаревание
+# обеспечивают поколения ключей (posts.caching), а не короткий TTL.
+FEED_CACHE_TIMEOUTS = {
+    'index': 60 * 15,
+    'group': 60 * 15,
+    'profile': 60 * 15,
+    'follow': 60 * 5,
+    'tag': 60 * 15,
+}
+
+# Кеш целых страниц для анонимов (core.page_cache), по имени view.
+# Устаревание - по суррогатным ключам, TTL лишь ограничивает объём.
+PAGE_CACHE_TIMEOUTS = {
+    'posts:index': 60 * 15,
+    'posts:group_list': 60 * 15,
+    'posts:profile': 60 * 15,
+    'posts:post_detail': 60 * 15,
+    'about:author': 60 * 60,
+    'about:tech': 60 * 60,
+}
+
+# Поиск (posts.search): вес совпадений в комментариях относительно
+# текста поста и словарь PostgreSQL
+SEARCH_COMMENT_WEIGHT = 0.5
+SEARCH_CONFIG = 'russian'
+
+# Бюджеты SQL-запросов на view (core.middleware). Превышение пишется
+# предупреждением в yatube.queries; с QUERY_BUDGET_RAISE (включают тесты
+# через override_settings) поднимается исключение. Запас в два запроса
+# на сессию и пользователя и до восьми на первый пересчёт UserStats;
+# профилю и ленте подписок - ещё по два на граф подписок и список
+# pull-авторов при пустом кеше, лентам с карточками - один на подписки
+# зрителя. Ленте подписок с pull-авторами - запрос на списки их
+# последних постов и ещё один на дочитывание за ними, общие для всех
+# авторов.
+QUERY_BUDGETS = {
+    'posts:index': 6,
+    'posts:group_list': 7,
+    'posts:profile': 16,
+    'posts:post_detail': 14,
+    'posts:follow_index': 9,
+    'posts:tag_posts': 7,
+    'posts:search': 8,
 }
+QUERY_BUDGET_DEFAULT = None
+QUERY_BUDGET_RAISE = False
+QUERY_INSTRUMENTATION_HEADERS = DEBUG
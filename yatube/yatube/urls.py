@@ -10,6 +10,7 @@ urlpatterns = [
     path('auth/', include('users.urls')),
     path('auth/', include('django.contrib.auth.urls')),
     path('about/', include('about.urls', namespace='about')),
+    path('api/', include('posts.api_urls', namespace='api')),
 ]
 
 handler404 = 'core.views.page_not_found'